@@ -27,137 +27,776 @@ import sys
 import os
 import shutil
 import argparse
-from datetime import datetime
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+# column added into amendment tables with sortable form of DATUM_VZNIKU
+DATE_ISO_COLUMN = 'DATUM_VZNIKU_ISO'
+
+# number of SQLite virtual machine instructions between checks of cancellation
+PROGRESS_HANDLER_STEPS = 100000
+
+# number of classified ids whose rows are inserted by one statement, progress is reported after each chunk
+IDS_PER_CHUNK = 50000
+
+# pragmas set on the output database while changes are applied, the output is a scratch copy
+# of the main database until the run is finished, so durability is traded for speed
+SESSION_PROFILES = {
+    'default': [],
+    'performance': [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'OFF'),
+        ('cache_size', -262144),        # in KiB, i.e. 256 MiB
+        ('temp_store', 'MEMORY'),
+        ('mmap_size', 268435456)
+    ],
+    # without journal the transaction can not be rolled back, output is removed on failure
+    'scratch': [
+        ('journal_mode', 'OFF'),
+        ('synchronous', 'OFF'),
+        ('cache_size', -262144),
+        ('temp_store', 'MEMORY'),
+        ('mmap_size', 268435456)
+    ]
+}
+DEFAULT_SESSION_PROFILE = 'performance'
+
+# table of the output database with ids of layers whose geometry may be changed
+GEOMETRY_CHANGES_TABLE = 'vfk_geometry_changes'
+
+# changed table -> (layer, column with id of layer feature, table linking the column to the id)
+GEOMETRY_SOURCES = {
+    'PAR': [('PAR', 'ID', None)],
+    'HP': [('PAR', 'PAR_ID_1', None), ('PAR', 'PAR_ID_2', None)],
+    'BUD': [('BUD', 'ID', None)],
+    'OB': [('BUD', 'BUD_ID', None)],
+    'SBP': [('PAR', 'HP_ID', ('HP', 'PAR_ID_1')), ('PAR', 'HP_ID', ('HP', 'PAR_ID_2')),
+            ('BUD', 'OB_ID', ('OB', 'BUD_ID'))]
+}
+
+# pragmas restored on the output database before it is handed over
+DURABLE_SETTINGS = [
+    ('journal_mode', 'DELETE'),
+    ('synchronous', 'FULL')
+]
+
+_vfkDateCache = {}
+_VFK_DATE_CACHE_LIMIT = 100000
+
+
+def vfkDateToIso(value):
+    """
+    Convert VFK date 'dd.mm.yyyy hh:mm:ss' into sortable ISO string 'yyyy-mm-dd hh:mm:ss'.
+    Results are memoized, VFK data contain only a small number of distinct dates.
+    :param value: Date in VFK format
+    :type value: str
+    :return: Date in ISO format or None if value can not be parsed
+    :rtype: str
+    """
+    if value is None:
+        return None
+
+    try:
+        return _vfkDateCache[value]
+    except KeyError:
+        pass
+
+    parts = value.strip().split(' ')
+    try:
+        day, month, year = parts[0].split('.')
+        time_parts = parts[1].split(':') if len(parts) > 1 else []
+        time_parts += ['0'] * (3 - len(time_parts))
+        hour, minute, second = time_parts[:3]
+        iso = '{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}'.format(int(year), int(month), int(day),
+                                                                 int(hour), int(minute), int(second))
+    except ValueError:
+        iso = None
+
+    if len(_vfkDateCache) >= _VFK_DATE_CACHE_LIMIT:
+        _vfkDateCache.clear()
+    _vfkDateCache[value] = iso
+
+    return iso
+
+
+class SchemaCatalog(object):
+    """
+    Table and column metadata of databases attached to one connection. Metadata of each
+    schema are loaded in one pass and reused for the whole run.
+    """
+
+    def __init__(self, cursor, schemas=('main', 'db2')):
+        """
+        :type cursor: sqlite3.Cursor
+        :type schemas: tuple
+        """
+        self.__schemas = schemas
+        # {schema: {table name in lower case: [column names in table order]}}
+        self.__tables = {}
 
-from PyQt4.QtGui import QWidget, QApplication
-from PyQt4.QtCore import qDebug, pyqtSignal, SIGNAL
+        for schema in schemas:
+            self.__tables[schema] = self.__load(cursor, schema)
 
+    @staticmethod
+    def __load(cursor, schema):
+        """
+        :type cursor: sqlite3.Cursor
+        :type schema: str
+        :return: Columns of all tables in given schema
+        :rtype: dict
+        """
+        tables = {}
+
+        try:
+            cursor.execute('SELECT m.name, p.name '
+                           'FROM {schema}.sqlite_master m, pragma_table_info(m.name, \'{schema}\') p '
+                           'WHERE m.type = \'table\' '
+                           'ORDER BY m.name, p.cid'.format(schema=schema))
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError:
+            # table-valued pragma functions are not available before SQLite 3.16
+            rows = []
+            cursor.execute('SELECT name FROM {}.sqlite_master WHERE type = \'table\''.format(schema))
+            for (table,) in cursor.fetchall():
+                cursor.execute('PRAGMA {}.table_info(\'{}\')'.format(schema, table))
+                rows.extend((table, row[1]) for row in cursor.fetchall())
+
+        for table, column in rows:
+            tables.setdefault(str(table).lower(), []).append(str(column))
 
-class ApplyChanges(QWidget):
-    # signals
-    maxRangeProgressBar = pyqtSignal(int)
-    updateStatus = pyqtSignal(int, str)
-    finishedStatus = pyqtSignal()
-    preprocessingDatabase = pyqtSignal()
+        return tables
 
-    def __init__(self):
-        QWidget.__init__(self)
+    def columns(self, table, schema=None):
+        """
+        Get list of columns of given table.
+        :param table: Table name
+        :param schema: Name of schema, first schema containing the table if not given
+        :type table: str
+        :type schema: str
+        :return: list
+        """
+        for name in ([schema] if schema else self.__schemas):
+            columns = self.__tables.get(name, {}).get(table.lower())
+            if columns is not None:
+                return list(columns)
+
+        return []
+
+    def hasColumn(self, table, column, schema=None):
+        """
+        :type table: str
+        :type column: str
+        :type schema: str
+        :rtype: bool
+        """
+        return column.lower() in [c.lower() for c in self.columns(table, schema)]
+
+    def commonColumns(self, table, source='db2', target='main'):
+        """
+        Columns of target table which exist in source table too, in order of target table.
+        :type table: str
+        :type source: str
+        :type target: str
+        :return: list
+        """
+        source_columns = set(c.lower() for c in self.columns(table, source))
+        return [c for c in self.columns(table, target) if c.lower() in source_columns]
+
+    def addColumn(self, table, column, schema):
+        """
+        Register column added by ALTER TABLE.
+        :type table: str
+        :type column: str
+        :type schema: str
+        """
+        self.__tables[schema].setdefault(table.lower(), []).append(column)
+
+
+class ApplyChangesCancelled(Exception):
+    pass
+
+
+class ApplyChangesListener(object):
+    """
+    Progress interface of ApplyChangesEngine. All methods are called from the thread
+    running the engine, subclasses override the ones they are interested in.
+    """
+
+    def preprocessing(self):
+        """
+        Output database is being prepared.
+        """
+        pass
+
+    def started(self, rows_total):
+        """
+        :param rows_total: Number of rows (ids) which will be processed.
+        :type rows_total: int
+        """
+        pass
+
+    def progress(self, rows_applied, table):
+        """
+        :param rows_applied: Number of already processed rows (ids).
+        :param table: Name of currently processed table.
+        :type rows_applied: int
+        :type table: str
+        """
+        pass
+
+    def finished(self):
+        pass
+
+    def cancelled(self):
+        pass
 
+    def error(self, message):
+        """
+        :type message: str
+        """
+        pass
+
+
+class ApplyChangesEngine(object):
+    """
+    Applies changes from amendment VFK database to main VFK database. The engine does not
+    depend on Qt, progress is reported through ApplyChangesListener.
+    """
+
+    def __init__(self, listener=None, profile=DEFAULT_SESSION_PROFILE):
+        """
+        :param listener: Receiver of progress of the process.
+        :param profile: Name of session profile from SESSION_PROFILES.
+        :type listener: ApplyChangesListener
+        :type profile: str
+        """
+        if profile not in SESSION_PROFILES:
+            raise ValueError('Unknown session profile: {}'.format(profile))
+
+        self.__listener = listener if listener else ApplyChangesListener()
+        self.__profile = profile
         self.__conn = None
         self.__cur = None
+        self.__catalog = None
         self.__use_debug = False
+        self.__cancelled = False
+        self.__rows_total = 0
+        self.__rows_applied = 0
+        self.__ids_count = {}
+
+    def cancel(self):
+        """
+        Request cancellation of running process, all changes are rolled back.
+        It is safe to call it from another thread.
+        """
+        self.__cancelled = True
 
-    def run(self, db_full, db_amendment, db_updated, use_debug=False):
+    def run(self, db_full, db_amendment, db_updated, use_debug=False, rebuild_geometry=False):
         """
 
         :param db_full: Path to the main database.
         :param db_amendment: Path to the database with changes to process.
         :param db_updated: Path to the database for export.
         :param use_debug: True if queries will be debugged.
+        :param rebuild_geometry: True if geometries of changed parcels and buildings will be rebuilt.
         :type db_full: str
         :type db_amendment: str
         :type db_updated: str
+        :type rebuild_geometry: bool
+        :return: True if changes were applied, False if process was cancelled
+        :rtype: bool
         """
-        self.emit(SIGNAL('preprocessingDatabase'))
+        self.__listener.preprocessing()
 
         db_full = os.path.abspath(db_full)
         db_amendment = os.path.abspath(db_amendment)
         db_updated = os.path.abspath(db_updated)
 
         self.__use_debug = use_debug
+        self.__cancelled = False
 
-        qDebug('(VFK) Preparing databases..')
-        # copy main database
-        shutil.copy2(db_full, db_updated)
-
-        # create connection to main database
-        self.__conn = sqlite3.connect(db_updated)
+        try:
+            logger.debug('(VFK) Preparing databases..')
+            # copy main database
+            shutil.copy2(db_full, db_updated)
 
-        with self.__conn:
+            # create connection to main database, transaction is handled explicitly
+            # so the whole process can be rolled back
+            self.__conn = sqlite3.connect(db_updated, isolation_level=None)
+            self.__conn.create_function('vfk_date_iso', 1, vfkDateToIso)
             self.__cur = self.__conn.cursor()
 
+            # pragmas can not be changed inside of transaction
+            self.__setPragmas(SESSION_PROFILES[self.__profile])
+
             # attach database with amendment data
             query = 'ATTACH DATABASE "{}" as db2'.format(db_amendment)
             self.__doQuery(query)
+            self.__catalog = SchemaCatalog(self.__cur)
+
+            # long bulk statements are interrupted when cancellation is requested
+            self.__conn.set_progress_handler(lambda: self.__cancelled, PROGRESS_HANDLER_STEPS)
 
+            self.__doQuery('BEGIN')
             self.__applyChanges()
+            self.__doQuery('COMMIT')
+
+            self.__conn.set_progress_handler(None, 0)
+            self.__doQuery('ANALYZE main')
+            self.__setPragmas(DURABLE_SETTINGS)
+        except ApplyChangesCancelled:
+            self.__cancelRun(db_updated)
+            return False
+        except Exception as e:
+            # any failure has to be reported, otherwise the caller waits for the result forever
+            if self.__cancelled and isinstance(e, sqlite3.OperationalError):
+                # statement was interrupted by progress handler
+                self.__cancelRun(db_updated)
+                return False
+
+            self.__rollback()
+            self.__close()
+            if ('journal_mode', 'OFF') in SESSION_PROFILES[self.__profile] and os.path.exists(db_updated):
+                os.remove(db_updated)
+            self.__listener.error('{}'.format(e))
+            raise
+
+        self.__close()
+
+        if rebuild_geometry:
+            self.__rebuildGeometry(db_updated)
+
+        self.__listener.finished()
+        return True
+
+    def __cancelRun(self, db_updated):
+        """
+        Method rolls back cancelled run and removes incomplete output database.
+        :type db_updated: str
+        """
+        logger.debug('(VFK) Applying changes cancelled, rolling back..')
+        self.__rollback()
+        self.__close()
+        os.remove(db_updated)
+        self.__listener.cancelled()
+
+    def __rebuildGeometry(self, db_updated):
+        """
+        Method rebuilds geometries of parcels and buildings recorded in GEOMETRY_CHANGES_TABLE.
+        Rebuild is skipped if GDAL is not available, recorded ids are kept for later rebuild.
+        :type db_updated: str
+        """
+        try:
+            from publicvfk import VFKGeometryRefresher
+        except ImportError as e:
+            logger.warning('(VFK) Geometries can not be rebuilt: {}'.format(e))
+            return
+
+        logger.debug('(VFK) Rebuilding geometries of changed parcels and buildings..')
+        try:
+            refresher = VFKGeometryRefresher(db_updated)
+            try:
+                refresher.refresh_changes(GEOMETRY_CHANGES_TABLE)
+            finally:
+                refresher.close()
+
+            for layer, ids in sorted(refresher.not_found.items()):
+                if ids:
+                    logger.warning('(VFK) {} features of layer {} were not found, their geometry was not '
+                                   'rebuilt: {}'.format(len(ids), layer, ', '.join(str(i) for i in ids)))
+        except Exception as e:
+            # changes are already applied, only geometries are not up to date
+            self.__listener.error('{}'.format(e))
+            raise
+
+    def __setPragmas(self, pragmas):
+        """
+        Method sets given pragmas on the output database.
+        :param pragmas: Pairs of pragma name and value.
+        :type pragmas: list
+        """
+        for name, value in pragmas:
+            # temp_store can not be qualified by schema name
+            schema = '' if name == 'temp_store' else 'main.'
+            self.__doQuery('PRAGMA {schema}{name} = {value}'.format(schema=schema, name=name, value=value))
+
+    def dryRun(self, db_full, db_amendment, report_path=None):
+        """
+        Method computes how much of the main database would be touched by applying changes.
+        No database is copied or modified.
+
+        :param db_full: Path to the main database.
+        :param db_amendment: Path to the database with changes to process.
+        :param report_path: Path to the JSON file for the report, report is only returned if not given.
+        :type db_full: str
+        :type db_amendment: str
+        :type report_path: str
+        :return: Report with per table counts of updated, inserted and deleted ids.
+        :rtype: dict
+        """
+        db_full = os.path.abspath(db_full)
+        db_amendment = os.path.abspath(db_amendment)
+
+        # sqlite would silently create missing database files
+        for db in (db_full, db_amendment):
+            if not os.path.isfile(db):
+                raise IOError('Database {} does not exist'.format(db))
+
+        report = {
+            'main_database': db_full,
+            'amendment_database': db_amendment,
+            'main_size_bytes': os.path.getsize(db_full),
+            'tables': {}
+        }
+        totals = {'updated': 0, 'inserted': 0, 'deleted': 0, 'unchanged': 0, 'estimated_bytes': 0}
+
+        try:
+            self.__conn = sqlite3.connect(db_full, isolation_level=None)
+            self.__cur = self.__conn.cursor()
+
+            query = 'ATTACH DATABASE "{}" as db2'.format(db_amendment)
+            self.__doQuery(query)
+            self.__catalog = SchemaCatalog(self.__cur)
+            self.__doQuery('PRAGMA query_only = ON')
+
+            for table in sorted(self.__findTablesWithChanges()):
+                counts = self.__countChanges(table)
+                report['tables'][table] = counts
+                for key in totals:
+                    totals[key] += counts[key]
+        finally:
+            self.__close()
+
+        report['total'] = totals
+        report['estimated_output_size_bytes'] = max(0, report['main_size_bytes'] + totals['estimated_bytes'])
+
+        if report_path:
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+        return report
+
+    def __countChanges(self, table):
+        """
+        Method counts ids of given table which would be updated, inserted and deleted.
+        :type table: str
+        :return: Counts and estimated change of size in bytes
+        :rtype: dict
+        """
+        query = 'SELECT ' \
+                'ifnull(sum(m.id IS NOT NULL AND c.has_change AND c.has_current), 0), ' \
+                'ifnull(sum(m.id IS NULL AND c.has_current), 0), ' \
+                'ifnull(sum(m.id IS NOT NULL AND c.has_change AND NOT c.has_current), 0), ' \
+                'ifnull(sum(m.id IS NOT NULL AND NOT c.has_change), 0) ' \
+                'FROM ({changes}) c ' \
+                'LEFT JOIN (SELECT DISTINCT id FROM main.{table}) m ON m.id = c.id'.format(
+                    changes=self.__changesQuery(table), table=table)
+        self.__doQuery(query)
+        updated, inserted, deleted, unchanged = self.__cur.fetchone()
+
+        # size is estimated from average length of current rows in amendment table
+        columns = [c for c in self.__catalog.columns(table, 'db2') if c != DATE_ISO_COLUMN]
+        row_length = ' + '.join('ifnull(length({}), 0)'.format(c) for c in columns)
+        query = 'SELECT ifnull(avg({length}), 0) FROM db2.{table} WHERE {live}'.format(
+            length=row_length, table=table, live=self.__liveCondition(table))
+        self.__doQuery(query)
+        avg_row_bytes = self.__cur.fetchone()[0]
+
+        return {
+            'updated': updated,
+            'inserted': inserted,
+            'deleted': deleted,
+            'unchanged': unchanged,
+            'estimated_bytes': int((inserted - deleted) * avg_row_bytes)
+        }
+
+    def __changesQuery(self, table):
+        """
+        Query classifying ids of given amendment table in one pass. 'has_current' is true if the id
+        has row to insert into main table, 'has_change' is false if the id is present only as context
+        of changes (PRIZNAK_KONTEXTU 1), i.e. it is not changed.
 
-        self.emit(SIGNAL('finishedStatus'))
+        New, changed and deleted ids all have 'has_change' set, deleted ones have no current row.
+        :type table: str
+        :rtype: str
+        """
+        if self.__catalog.hasColumn(table, 'PRIZNAK_KONTEXTU', 'db2'):
+            has_change = 'max(ifnull(PRIZNAK_KONTEXTU, 0) <> 1)'
+        else:
+            has_change = '1'
+
+        return 'SELECT id, max({live}) has_current, {has_change} has_change ' \
+               'FROM db2.{table} WHERE id IS NOT NULL GROUP BY id'.format(
+                   table=table, live=self.__liveCondition(table), has_change=has_change)
+
+    def __liveCondition(self, table):
+        """
+        Condition on rows of amendment table which are current after the change.
+        Stav dat: 0
+        Kontext zmen: other than 2 (deleted)
+        :type table: str
+        :rtype: str
+        """
+        conditions = []
+        if self.__catalog.hasColumn(table, 'STAV_DAT', 'db2'):
+            conditions.append('stav_dat = 0')
+        if self.__catalog.hasColumn(table, 'PRIZNAK_KONTEXTU', 'db2'):
+            conditions.append('ifnull(PRIZNAK_KONTEXTU, 0) <> 2')
+
+        return ' AND '.join(conditions) if conditions else '1'
+
+    def __rollback(self):
+        """
+        Method rolls back opened transaction, if any.
+        """
+        if not self.__conn:
+            return
+
+        try:
+            self.__conn.execute('ROLLBACK')
+        except sqlite3.Error:
+            pass
+
+    def __close(self):
+        """
+        Method closes connection to the database.
+        """
+        if self.__conn:
+            self.__conn.close()
+            self.__conn = None
 
     def __applyChanges(self):
         """
         Method updates rows in main database by rows from databse with amendment data.
         """
         table_names = self.__findTablesWithChanges()
-        self.emit(SIGNAL("maxRangeProgressBar"), len(table_names))
+        self.__preprocessDates(table_names)
+
+        # ids of features with changed geometry are collected for the whole run
+        query = 'CREATE TABLE IF NOT EXISTS main.{} (' \
+                'layer TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (layer, id))'.format(GEOMETRY_CHANGES_TABLE)
+        self.__doQuery(query)
+        self.__doQuery('DELETE FROM main.{}'.format(GEOMETRY_CHANGES_TABLE))
+
+        # progress is reported in number of processed ids
+        self.__ids_count = dict((table, self.__getNumberOfIds(table)) for table in table_names)
+        self.__rows_total = sum(self.__ids_count.values())
+        self.__rows_applied = 0
+        self.__listener.started(self.__rows_total)
 
         # process all relevant tables
-        for i, table in enumerate(table_names):
-            self.emit(SIGNAL("updateStatus"), i+1, table)
+        for table in table_names:
+            self.__checkCancelled()
+            self.__listener.progress(self.__rows_applied, table)
+
+            # ids are classified once, both operations are driven by the classification
+            self.__doQuery('DROP TABLE IF EXISTS temp.vfk_changes')
+            self.__doQuery('CREATE TEMP TABLE vfk_changes '
+                           '(id INTEGER PRIMARY KEY, has_current INTEGER, has_change INTEGER)')
+            self.__doQuery('INSERT INTO temp.vfk_changes {}'.format(self.__changesQuery(table)))
+
+            self.__recordGeometryChanges(table)
+            self.__doDeleteOperation(table)
+            self.__doInsertOperation(table)
+
+            self.__doQuery('DROP TABLE temp.vfk_changes')
+
+    def __checkCancelled(self):
+        """
+        :raises ApplyChangesCancelled: if cancellation was requested
+        """
+        if self.__cancelled:
+            raise ApplyChangesCancelled()
 
-            # Delete data which are in both databases --> there are updates in amendment database
-            query = 'DELETE FROM main.{table} ' \
-                    'WHERE id IN (' \
-                    'SELECT DISTINCT t1.id FROM main.{table} t1 ' \
-                    'JOIN db2.{table} t2 ON t1.id = t2.id)'.format(table=table)
+    def __rowsApplied(self, count, table):
+        """
+        Method counts processed rows and reports progress.
+        :type count: int
+        :type table: str
+        """
+        self.__rows_applied += count
+        self.__checkCancelled()
+        self.__listener.progress(self.__rows_applied, table)
 
+    def __preprocessDates(self, table_names):
+        """
+        Method converts 'DATUM_VZNIKU' of amendment tables into sortable ISO column, so the newest
+        row can be selected inside SQLite. Conversion is done only once, already converted rows
+        are skipped.
+        :type table_names: set
+        """
+        for table in table_names:
+            if not self.__catalog.hasColumn(table, 'DATUM_VZNIKU', 'db2'):
+                continue
+
+            if not self.__catalog.hasColumn(table, DATE_ISO_COLUMN, 'db2'):
+                query = 'ALTER TABLE db2.{table} ADD COLUMN {iso} TEXT'.format(table=table, iso=DATE_ISO_COLUMN)
+                self.__doQuery(query)
+                self.__catalog.addColumn(table, DATE_ISO_COLUMN, 'db2')
+
+            # well-formed dates are converted by SQL, the rest by memoized parser
+            query = 'UPDATE db2.{table} SET {iso} = CASE ' \
+                    'WHEN DATUM_VZNIKU GLOB \'[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9] ' \
+                    '[0-9][0-9]:[0-9][0-9]:[0-9][0-9]\' ' \
+                    'THEN substr(DATUM_VZNIKU, 7, 4) || \'-\' || substr(DATUM_VZNIKU, 4, 2) || \'-\' || ' \
+                    'substr(DATUM_VZNIKU, 1, 2) || \' \' || substr(DATUM_VZNIKU, 12, 8) ' \
+                    'ELSE vfk_date_iso(DATUM_VZNIKU) END ' \
+                    'WHERE {iso} IS NULL AND DATUM_VZNIKU IS NOT NULL'.format(table=table, iso=DATE_ISO_COLUMN)
             self.__doQuery(query)
 
-            self.__doInsertOperation(table)
+    def __recordGeometryChanges(self, table):
+        """
+        Method records ids of parcels and buildings whose boundary is affected by changed ids of given
+        table. Both previous rows from main table and new rows from amendment table are used, so it has
+        to be called before the rows are deleted.
+        :type table: str
+        """
+        for layer, column, link in GEOMETRY_SOURCES.get(table, []):
+            values = self.__changedValuesQuery(table, column, 'SELECT id FROM temp.vfk_changes WHERE has_change')
+            if link:
+                link_table, link_column = link
+                values = self.__changedValuesQuery(link_table, link_column, values)
+            if not values:
+                continue
+
+            query = 'INSERT OR IGNORE INTO main.{changes} (layer, id) ' \
+                    'SELECT \'{layer}\', v FROM ({values}) WHERE v IS NOT NULL'.format(
+                        changes=GEOMETRY_CHANGES_TABLE, layer=layer, values=values)
+            self.__doQuery(query)
+
+    def __changedValuesQuery(self, table, column, ids):
+        """
+        Query selecting values of column of given table from both databases for rows with given ids.
+        :param ids: Query selecting ids of rows.
+        :type table: str
+        :type column: str
+        :type ids: str
+        :return: Query with values in column 'v', None if no database contains the column
+        :rtype: str
+        """
+        if not ids:
+            return None
+
+        queries = []
+        for schema in ('main', 'db2'):
+            if self.__catalog.hasColumn(table, column, schema):
+                queries.append('SELECT {column} v FROM {schema}.{table} WHERE id IN ({ids})'.format(
+                    column=column, schema=schema, table=table, ids=ids))
+
+        return ' UNION '.join(queries) if queries else None
+
+    def __doDeleteOperation(self, table):
+        """
+        Method will delete changed and deleted ids from main table, rows of changed ids are
+        inserted again by INSERT operation. Ids which are only context of changes are kept.
+        :type table: str
+        """
+        query = 'DELETE FROM main.{table} ' \
+                'WHERE id IN (SELECT id FROM temp.vfk_changes WHERE has_change)'.format(table=table)
+        self.__doQuery(query)
 
     def __doInsertOperation(self, table):
         """
-        Method will apply operation INSERT into main table.
+        Method will apply operation INSERT into main table. Current row is inserted for every
+        classified id which is not present in main table, i.e. new and changed ids and context
+        ids missing in main table. Rows are inserted in chunks of ids and progress is reported
+        after each chunk.
         Stav dat: 0
-        Kontext zmen: 3
+        Kontext zmen: 1, 3
         :type table: str
         :return:
         """
-        max_fid = self.__getMaxOgrFid(table)
-        ids = self.__getListOfIds(table)
+        # columns are matched by name, so their order may differ between both databases
+        columns = self.__catalog.commonColumns(table)
+        target_cols = ", ".join(columns)
+
+        logger.debug('(VFK) Processing table {}..'.format(table))
+
+        # newest rows are selected once, chunks of ids are looked up by primary key
+        self.__doQuery('DROP TABLE IF EXISTS temp.vfk_newest')
+        self.__doQuery('CREATE TEMP TABLE vfk_newest (id INTEGER PRIMARY KEY, ogr_fid INTEGER)')
+        query = 'INSERT INTO temp.vfk_newest (id, ogr_fid) ' \
+                'SELECT id, ogr_fid FROM ({selected}) WHERE id IS NOT NULL'.format(
+                    selected=self.__selectNewestRows(table))
+        self.__doQuery(query)
 
-        columns = self.__getColumnNames(table)
-        # if 'ogr_fid' in columns:
-        #     columns.remove('ogr_fid')
+        self.__doQuery('DROP TABLE IF EXISTS temp.vfk_fid_allocation')
+        self.__doQuery('CREATE TEMP TABLE vfk_fid_allocation (rn INTEGER PRIMARY KEY, src_fid INTEGER)')
 
-        cols = ", ".join(columns)    # create string from list
+        for first_id, last_id, count in self.__idChunks():
+            # rows of previous chunks are already inserted, so numbering continues after them
+            max_fid = self.__getMaxOgrFid(table)
+            cols = ", ".join('t.{}'.format(c) if c != 'ogr_fid' else '{} + f.rn'.format(max_fid) for c in columns)
 
-        qDebug('(VFK) Processing table {}..'.format(table))
+            # new ogr_fid is allocated to all selected rows of the chunk at once, numbering follows order of ids
+            query = 'INSERT INTO temp.vfk_fid_allocation (src_fid) ' \
+                    'SELECT n.ogr_fid FROM temp.vfk_newest n ' \
+                    'WHERE n.id BETWEEN {first_id} AND {last_id} ' \
+                    'AND n.id NOT IN (SELECT id FROM main.{table} WHERE id IS NOT NULL) ' \
+                    'ORDER BY n.id'.format(first_id=first_id, last_id=last_id, table=table)
+            self.__doQuery(query)
 
-        for id in ids:
-            # get all rows for given ID
-            query = 'SELECT * FROM db2.{table} WHERE stav_dat=0 AND id={id}'.format(table=table, id=id)
+            query = 'INSERT INTO main.{table} ({target_columns}) ' \
+                    'SELECT {columns} FROM temp.vfk_fid_allocation f ' \
+                    'JOIN db2.{table} t ON t.ogr_fid = f.src_fid ' \
+                    'ORDER BY f.rn'.format(table=table, columns=cols, target_columns=target_cols)
             self.__doQuery(query)
-            result = self.__cur.fetchall()
-
-            if len(result) > 0:
-                # create list of dictionaries from returned rows
-                data_rows = []
-                for row in result:
-                    tmp = []
-                    for item in row:
-                        tmp.append(item)
-
-                    data_rows.append(dict(zip(columns, tmp)))
-
-                # sort data according to the date 'DATUM_VZNIKU'
-                if 'DATUM_VZNIKU' in data_rows[0]:
-                    data_rows.sort(key=lambda x: datetime.strptime(x['DATUM_VZNIKU'], '%d.%m.%Y %H:%M:%S'), reverse=True)
-
-                # insert new data into main table
-                selected_ogr_fid = data_rows[0]['ogr_fid']
-
-                query = 'INSERT INTO main.{table} ' \
-                        'SELECT {columns} FROM db2.{table} ' \
-                        'WHERE ogr_fid={selected_ogr_fid} ' \
-                        'AND stav_dat=0 ' \
-                        'AND id = {id};'.format(table=table,
-                                          columns=cols.replace('ogr_fid', '\'{ogr_fid}\''.format(ogr_fid=max_fid + 1)),
-                                          selected_ogr_fid=selected_ogr_fid,
-                                          id=id)
+            self.__doQuery('DELETE FROM temp.vfk_fid_allocation')
 
-                self.__doQuery(query)
-                max_fid += 1
+            self.__rowsApplied(count, table)
+
+        self.__doQuery('DROP TABLE temp.vfk_fid_allocation')
+        self.__doQuery('DROP TABLE temp.vfk_newest')
+
+    def __idChunks(self):
+        """
+        Method splits classified ids into ranges of at most IDS_PER_CHUNK ids.
+        :return: Ranges as tuples (first id, last id, number of ids) in order of ids.
+        :rtype: generator
+        """
+        condition = ''
+        while True:
+            query = 'SELECT min(id), max(id), count(*) FROM (' \
+                    'SELECT id FROM temp.vfk_changes {condition}ORDER BY id LIMIT {limit})'.format(
+                        condition=condition, limit=IDS_PER_CHUNK)
+            self.__doQuery(query)
+            first_id, last_id, count = self.__cur.fetchone()
+            if not count:
+                return
+
+            yield first_id, last_id, count
+            condition = 'WHERE id > {} '.format(last_id)
+
+    def __selectNewestRows(self, table):
+        """
+        Query selecting 'id' and 'ogr_fid' of the newest live row of each id in amendment table.
+        The newest row is selected according to the date 'DATUM_VZNIKU', ties by lowest 'ogr_fid'.
+        :type table: str
+        :rtype: str
+        """
+        has_date = self.__catalog.hasColumn(table, DATE_ISO_COLUMN, 'db2')
+        live = self.__liveCondition(table)
+
+        if sqlite3.sqlite_version_info >= (3, 25, 0):
+            order_by = '{} DESC, ogr_fid'.format(DATE_ISO_COLUMN) if has_date else 'ogr_fid'
+            return 'SELECT id, ogr_fid FROM (' \
+                   'SELECT id, ogr_fid, ROW_NUMBER() OVER (PARTITION BY id ORDER BY {order_by}) rn ' \
+                   'FROM db2.{table} WHERE {live}) ' \
+                   'WHERE rn = 1'.format(table=table, order_by=order_by, live=live)
+
+        # window functions are not available, newest date is found by aggregation first
+        if has_date:
+            newest = 'SELECT id, max({iso}) iso FROM db2.{table} WHERE {live} GROUP BY id'.format(
+                table=table, iso=DATE_ISO_COLUMN, live=live)
+            return 'SELECT t.id, min(t.ogr_fid) ogr_fid FROM db2.{table} t ' \
+                   'JOIN ({newest}) n ON n.id = t.id ' \
+                   'AND (t.{iso} = n.iso OR (t.{iso} IS NULL AND n.iso IS NULL)) ' \
+                   'WHERE {live} GROUP BY t.id'.format(table=table, newest=newest, iso=DATE_ISO_COLUMN, live=live)
+
+        return 'SELECT id, min(ogr_fid) ogr_fid FROM db2.{table} ' \
+               'WHERE {live} GROUP BY id'.format(table=table, live=live)
 
     def __findTablesWithChanges(self):
         """
@@ -175,31 +814,12 @@ class ApplyChanges(QWidget):
             table = str(table[0])
 
             # find amendment tables
-            columns = self.__getColumnNames(table)
-            if 'STAV_DAT' in columns or 'PRIZNAK_KONTEXTU' in columns:
+            if self.__catalog.hasColumn(table, 'STAV_DAT') or self.__catalog.hasColumn(table, 'PRIZNAK_KONTEXTU'):
                 tables.add(table)
 
-        qDebug('(VFK) Tables with changes: {}'.format(', '.join(x for x in tables)))
+        logger.debug('(VFK) Tables with changes: {}'.format(', '.join(x for x in tables)))
         return tables
 
-    def __getColumnNames(self, table):
-        """
-        Get list of columns of given table.
-        :param table: Table name
-        :type table: str
-        :return: list
-        """
-        columns = []
-
-        query = 'PRAGMA table_info(\'{table}\')'.format(table=table)
-        self.__doQuery(query)
-        result = self.__cur.fetchall()
-
-        for row in result:
-            columns.append(str(row[1]))
-
-        return columns
-
     def __getMaxOgrFid(self, table, schema='main'):
         """
         Get max org_fid from given table.
@@ -216,26 +836,20 @@ class ApplyChanges(QWidget):
 
         return 0 if result[0] is None else result[0]
 
-    def __getListOfIds(self, table, schema='db2'):
+    def __getNumberOfIds(self, table, schema='db2'):
         """
-        Get list of ids for given table.
+        Get number of distinct ids for given table.
         :param table: Table name
         :param schema: Name of schema
         :type schema: str
         :type table: str
-        :return: List of ids
-        :rtype: list
+        :return: Number of ids
+        :rtype: int
         """
-        ids = []
-
-        query = 'SELECT DISTINCT id FROM {schema}.{table}'.format(table=table, schema=schema)
+        query = 'SELECT count(DISTINCT id) FROM {schema}.{table}'.format(table=table, schema=schema)
         self.__doQuery(query)
-        result = self.__cur.fetchall()
-
-        for id in result:
-            ids.append(id[0])
 
-        return ids
+        return self.__cur.fetchone()[0]
 
     def __doQuery(self, query):
         """
@@ -243,14 +857,27 @@ class ApplyChanges(QWidget):
         :param query: Query
         """
         if self.__use_debug:
-            qDebug('(VFK) Apply changes query: {}'.format(query))
+            logger.debug('(VFK) Apply changes query: {}'.format(query))
 
         self.__cur.execute(query)
 
 
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
+class ConsoleListener(ApplyChangesListener):
+    """
+    Prints progress of applying changes to the standard output.
+    """
+
+    def __init__(self):
+        self.__rows_total = 0
+
+    def started(self, rows_total):
+        self.__rows_total = rows_total
 
+    def progress(self, rows_applied, table):
+        print('{}: {}/{}'.format(table, rows_applied, self.__rows_total))
+
+
+if __name__ == '__main__':
     # load arguments from command line
     description = 'Script applies changes from amendment VFK database to ' \
                   'main VFK database. In this process new database is created.'
@@ -259,20 +886,36 @@ if __name__ == '__main__':
     parser.add_argument('-v', '--version', action='version', version='%(prog)s 2.1')
     parser.add_argument('-i', '--input', help='Path to the main database.', required=True)
     parser.add_argument('-c', '--changes', help='Path to the database with changes.', required=True)
-    parser.add_argument('-o', '--output', help='Path to the new database which will be created.', required=True)
+    parser.add_argument('-o', '--output', help='Path to the new database which will be created.')
     parser.add_argument('-d', '--debug', help='Enables debug mode.', action='store_true')
+    parser.add_argument('-n', '--dry-run', help='Only report what would be changed, no database is created.',
+                        action='store_true')
+    parser.add_argument('-r', '--report', help='Path to the JSON file with dry-run report.')
+    parser.add_argument('-g', '--rebuild-geometry', help='Rebuilds geometries of changed parcels and buildings.',
+                        action='store_true')
+    parser.add_argument('-p', '--profile', help='SQLite session profile used for the new database.',
+                        choices=sorted(SESSION_PROFILES), default=DEFAULT_SESSION_PROFILE)
 
     args = parser.parse_args()
 
+    if not args.dry_run and not args.output:
+        parser.error('argument -o/--output is required')
+
     if args.debug:
         use_debug = args.debug
+        logging.basicConfig(level=logging.DEBUG)
     else:
         use_debug = False
 
+    if args.dry_run:
+        report = ApplyChangesEngine().dryRun(args.input, args.changes, args.report)
+        print(json.dumps(report, indent=2, sort_keys=True))
+        sys.exit(0)
+
     print('Applying changes..')
     print('------------------')
-    changes = ApplyChanges()
-    changes.run(args.input, args.changes, args.output, use_debug)
+    changes = ApplyChangesEngine(ConsoleListener(), args.profile)
+    changes.run(args.input, args.changes, args.output, use_debug, args.rebuild_geometry)
 
     print('--------------------------------')
     print('All changes successfully applied.')
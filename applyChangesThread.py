@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt4.QtCore import QObject, QThread, pyqtSignal, SIGNAL, qDebug
+
+from applyChanges import ApplyChangesEngine, ApplyChangesListener, DEFAULT_SESSION_PROFILE
+
+
+class ApplyChanges(QObject):
+    """
+    Qt adapter of ApplyChangesEngine, progress of the engine is emitted as signals.
+    """
+    # signals
+    maxRangeProgressBar = pyqtSignal(int)
+    updateStatus = pyqtSignal(int, str)
+    finishedStatus = pyqtSignal()
+    cancelledStatus = pyqtSignal()
+    errorStatus = pyqtSignal(str)
+    preprocessingDatabase = pyqtSignal()
+
+    class SignalListener(ApplyChangesListener):
+
+        def __init__(self, adapter):
+            """
+            :type adapter: ApplyChanges
+            """
+            self.__adapter = adapter
+
+        def preprocessing(self):
+            self.__adapter.emit(SIGNAL('preprocessingDatabase'))
+
+        def started(self, rows_total):
+            self.__adapter.emit(SIGNAL('maxRangeProgressBar'), rows_total)
+
+        def progress(self, rows_applied, table):
+            self.__adapter.emit(SIGNAL('updateStatus'), rows_applied, table)
+
+        def finished(self):
+            self.__adapter.emit(SIGNAL('finishedStatus'))
+
+        def cancelled(self):
+            self.__adapter.emit(SIGNAL('cancelledStatus'))
+
+        def error(self, message):
+            self.__adapter.emit(SIGNAL('errorStatus'), message)
+
+    def __init__(self, profile=DEFAULT_SESSION_PROFILE):
+        """
+        :param profile: Name of SQLite session profile used by the engine.
+        :type profile: str
+        """
+        QObject.__init__(self)
+
+        self.__engine = ApplyChangesEngine(self.SignalListener(self), profile)
+
+    def cancel(self):
+        self.__engine.cancel()
+
+    def run(self, db_full, db_amendment, db_updated, use_debug=False, rebuild_geometry=False):
+        """
+        :type db_full: str
+        :type db_amendment: str
+        :type db_updated: str
+        :type use_debug: bool
+        :type rebuild_geometry: bool
+        :return: True if changes were applied, False if process was cancelled
+        :rtype: bool
+        """
+        return self.__engine.run(db_full, db_amendment, db_updated, use_debug, rebuild_geometry)
+
+
+class ApplyChangesThread(QThread):
+
+    def __init__(self, changes, db_full, db_amendment, db_updated):
+        """
+        Class for applying changes outside of the GUI thread
+        :type changes: ApplyChanges
+        :type db_full: str
+        :type db_amendment: str
+        :type db_updated: str
+        :return:
+        """
+        QThread.__init__(self)
+
+        self.changes = changes
+        self.db_full = db_full
+        self.db_amendment = db_amendment
+        self.db_updated = db_updated
+
+    def __del__(self):
+        self.wait()
+
+    def cancel(self):
+        self.changes.cancel()
+
+    def run(self):
+        try:
+            self.changes.run(self.db_full, self.db_amendment, self.db_updated)
+        except Exception as e:
+            # error is reported by ApplyChanges.errorStatus signal
+            qDebug('(VFK) Applying changes failed: {}'.format(e))
@@ -0,0 +1,461 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+Benchmark of applying changes from amendment VFK database to main VFK database.
+
+Synthetic main and amendment databases in the layout of GDAL VFK driver are generated,
+changes are applied by ApplyChangesEngine and throughput, peak memory and wall time of
+each phase are recorded. Every measurement runs in its own process, so peak memory is
+not affected by previous scenarios.
+
+Example:
+    python benchmark/benchmarkApplyChanges.py -s 10000 100000 -l 0.1 0.9 -o results.json
+    python benchmark/benchmarkApplyChanges.py -s 10000 100000 -l 0.1 0.9 -b results.json
+"""
+
+import sqlite3
+import sys
+import os
+import shutil
+import argparse
+import json
+import random
+import struct
+import subprocess
+import tempfile
+import time
+import platform
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from applyChanges import ApplyChangesEngine, ApplyChangesListener, SESSION_PROFILES, DEFAULT_SESSION_PROFILE
+
+# attribute columns of generated tables, geometry column is added to tables with features
+TABLES = {
+    'PAR': [
+        ('ID', 'INTEGER'),
+        ('STAV_DAT', 'INTEGER'),
+        ('DATUM_VZNIKU', 'TEXT'),
+        ('DATUM_ZANIKU', 'TEXT'),
+        ('PRIZNAK_KONTEXTU', 'INTEGER'),
+        ('RIZENI_ID_VZNIKU', 'INTEGER'),
+        ('KATUZE_KOD', 'INTEGER'),
+        ('KMENOVE_CISLO_PAR', 'INTEGER'),
+        ('PODDELENI_CISLA_PAR', 'INTEGER'),
+        ('VYMERA_PARCELY', 'INTEGER'),
+        ('TEL_ID', 'INTEGER'),
+        ('DRUPOZ_KOD', 'INTEGER')
+    ],
+    'BUD': [
+        ('ID', 'INTEGER'),
+        ('STAV_DAT', 'INTEGER'),
+        ('DATUM_VZNIKU', 'TEXT'),
+        ('DATUM_ZANIKU', 'TEXT'),
+        ('PRIZNAK_KONTEXTU', 'INTEGER'),
+        ('RIZENI_ID_VZNIKU', 'INTEGER'),
+        ('TYPBUD_KOD', 'INTEGER'),
+        ('CAOBCE_KOD', 'INTEGER'),
+        ('CISLO_DOMOVNI', 'INTEGER'),
+        ('TEL_ID', 'INTEGER'),
+        ('ZPVYBU_KOD', 'INTEGER')
+    ],
+    'TEL': [
+        ('ID', 'INTEGER'),
+        ('STAV_DAT', 'INTEGER'),
+        ('DATUM_VZNIKU', 'TEXT'),
+        ('DATUM_ZANIKU', 'TEXT'),
+        ('PRIZNAK_KONTEXTU', 'INTEGER'),
+        ('RIZENI_ID_VZNIKU', 'INTEGER'),
+        ('KATUZE_KOD', 'INTEGER'),
+        ('CISLO_TEL', 'INTEGER')
+    ]
+}
+GEOMETRY_TABLES = ('PAR', 'BUD')
+
+# share of rows of main database per table
+TABLE_SHARES = {'PAR': 0.6, 'BUD': 0.2, 'TEL': 0.2}
+
+INSERT_BATCH = 10000
+
+
+class TimingListener(ApplyChangesListener):
+    """
+    Listener measuring wall time of phases of applying changes.
+    """
+
+    def __init__(self):
+        self.rows_total = 0
+        self.phases = {'prepare': 0.0, 'tables': {}, 'finalize': 0.0}
+        self.__start = None
+        self.__last = None
+
+    def preprocessing(self):
+        self.__start = self.__last = time.time()
+
+    def started(self, rows_total):
+        now = time.time()
+        self.rows_total = rows_total
+        self.phases['prepare'] = now - self.__start
+        self.__last = now
+
+    def progress(self, rows_applied, table):
+        # progress is reported before and after each table
+        now = time.time()
+        self.phases['tables'][table] = self.phases['tables'].get(table, 0.0) + now - self.__last
+        self.__last = now
+
+    def finished(self):
+        self.phases['finalize'] = time.time() - self.__last
+
+
+def peakRss():
+    """
+    :return: Peak resident set size of current process in KiB, None if it is not available.
+    :rtype: int
+    """
+    if resource is None:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def vfkDate(rnd):
+    """
+    :type rnd: random.Random
+    :return: Random date in VFK format 'dd.mm.yyyy hh:mm:ss'
+    :rtype: str
+    """
+    return '{:02d}.{:02d}.{:04d} {:02d}:{:02d}:{:02d}'.format(
+        rnd.randint(1, 28), rnd.randint(1, 12), rnd.randint(2000, 2018),
+        rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))
+
+
+def polygon(rnd):
+    """
+    :type rnd: random.Random
+    :return: WKB of small square polygon in S-JTSK coordinates
+    :rtype: buffer
+    """
+    x = rnd.uniform(-900000, -430000)
+    y = rnd.uniform(-1230000, -930000)
+    size = rnd.uniform(5, 200)
+    points = (x, y, x + size, y, x + size, y + size, x, y + size, x, y)
+    return sqlite3.Binary(struct.pack('<BIII10d', 1, 3, 1, 5, *points))
+
+
+def createDatabase(path):
+    """
+    Creates empty database with generated tables and 'vfk_tables' metadata table.
+    :type path: str
+    :rtype: sqlite3.Connection
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+
+    conn.execute('CREATE TABLE vfk_tables (file_name TEXT, file_size INTEGER, table_name TEXT, '
+                 'num_records INTEGER, num_features INTEGER, num_geometries INTEGER, table_defn TEXT)')
+    for table, columns in TABLES.items():
+        definition = ', '.join('{} {}'.format(name, type) for name, type in columns)
+        if table in GEOMETRY_TABLES:
+            definition += ', geometry BLOB'
+        conn.execute('CREATE TABLE {table} (ogr_fid INTEGER PRIMARY KEY, {definition})'.format(
+            table=table, definition=definition))
+
+    return conn
+
+
+def attributes(table, rnd):
+    """
+    :return: Random values of attribute columns after 'RIZENI_ID_VZNIKU' and geometry, if any
+    :rtype: list
+    """
+    values = [rnd.randint(600000, 800000)]
+    values += [rnd.randint(1, 99999) for c in TABLES[table][6:]]
+    if table in GEOMETRY_TABLES:
+        values.append(polygon(rnd))
+
+    return values
+
+
+def insertRows(conn, table, rows):
+    """
+    Inserts rows into given table in batches.
+    :type conn: sqlite3.Connection
+    :type table: str
+    :param rows: Iterable of rows without ogr_fid
+    :return: Number of inserted rows
+    :rtype: int
+    """
+    columns = [name for name, type in TABLES[table]]
+    if table in GEOMETRY_TABLES:
+        columns.append('geometry')
+    query = 'INSERT INTO {table} ({columns}) VALUES ({values})'.format(
+        table=table, columns=', '.join(columns), values=', '.join('?' * len(columns)))
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_BATCH:
+            conn.executemany(query, batch)
+            count += len(batch)
+            batch = []
+    conn.executemany(query, batch)
+    count += len(batch)
+
+    conn.execute('INSERT INTO vfk_tables (file_name, table_name, num_records, num_features) VALUES (?, ?, ?, ?)',
+                 ('benchmark.vfk', table, count, count if table in GEOMETRY_TABLES else 0))
+    return count
+
+
+def generateDatabases(db_main, db_amendment, scale, overlap, changes, seed):
+    """
+    Generates main database with given number of rows and amendment database with changes of it.
+    :param scale: Number of rows in main database.
+    :param overlap: Share of changed ids which already exist in main database.
+    :param changes: Number of changed ids relative to scale.
+    :type scale: int
+    :type overlap: float
+    :type changes: float
+    :type seed: int
+    :return: Number of rows in amendment database
+    :rtype: int
+    """
+    rnd = random.Random(seed)
+
+    conn = createDatabase(db_main)
+    sizes = {}
+    for table in sorted(TABLES):
+        sizes[table] = max(1, int(scale * TABLE_SHARES[table]))
+        rows = ([id, 0, vfkDate(rnd), None, None] + attributes(table, rnd) for id in range(1, sizes[table] + 1))
+        insertRows(conn, table, rows)
+    conn.commit()
+    conn.close()
+
+    def amendmentRows(table):
+        changed = max(1, int(sizes[table] * changes))
+        existing = int(changed * overlap)
+
+        ids = rnd.sample(range(1, sizes[table] + 1), min(existing, sizes[table]))
+        ids += range(sizes[table] + 1, sizes[table] + 1 + changed - len(ids))
+
+        for id in ids:
+            ending = vfkDate(rnd)
+            if id <= sizes[table]:
+                # existing id is ended in the context of the change
+                yield [id, 1, vfkDate(rnd), ending, 2] + attributes(table, rnd)
+                if rnd.random() < 0.1:
+                    # id removed by the change
+                    continue
+
+            for i in range(rnd.randint(1, 2)):
+                yield [id, 0, vfkDate(rnd), None, 3] + attributes(table, rnd)
+            if rnd.random() < 0.2:
+                yield [id, 0, vfkDate(rnd), None, 1] + attributes(table, rnd)
+
+    conn = createDatabase(db_amendment)
+    count = 0
+    for table in sorted(TABLES):
+        count += insertRows(conn, table, amendmentRows(table))
+    conn.commit()
+    conn.close()
+
+    return count
+
+
+def measure(db_main, db_amendment, db_updated, profile):
+    """
+    Applies changes and measures it.
+    :return: Measured values
+    :rtype: dict
+    """
+    listener = TimingListener()
+    engine = ApplyChangesEngine(listener, profile)
+
+    start = time.time()
+    engine.run(db_main, db_amendment, db_updated)
+    wall_time = time.time() - start
+
+    return {
+        'wall_time': wall_time,
+        'ids': listener.rows_total,
+        'phases': listener.phases,
+        'peak_rss_kib': peakRss(),
+        'output_size_bytes': os.path.getsize(db_updated)
+    }
+
+
+def runScenario(workdir, scale, overlap, changes, profile, repeat, seed):
+    """
+    Generates databases of the scenario and measures applying changes in separate processes.
+    The fastest run is kept.
+    :rtype: dict
+    """
+    name = 'scale={}, overlap={}, changes={}'.format(scale, overlap, changes)
+    db_main = os.path.join(workdir, 'main_{}_{}_{}.db'.format(scale, overlap, changes))
+    db_amendment = os.path.join(workdir, 'amendment_{}_{}_{}.db'.format(scale, overlap, changes))
+    db_updated = os.path.join(workdir, 'updated.db')
+
+    start = time.time()
+    amendment_rows = generateDatabases(db_main, db_amendment, scale, overlap, changes, seed)
+    generate_time = time.time() - start
+
+    best = None
+    for i in range(repeat):
+        # amendment database is modified by the engine, every run starts from the same state
+        db_run = db_amendment + '.run'
+        shutil.copy2(db_amendment, db_run)
+
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                          '--measure', db_main, db_run, db_updated, '--profile', profile])
+        result = json.loads(output.decode('utf-8'))
+        os.remove(db_run)
+        os.remove(db_updated)
+
+        if best is None or result['wall_time'] < best['wall_time']:
+            best = result
+
+    best.update({
+        'name': name,
+        'scale': scale,
+        'overlap': overlap,
+        'changes': changes,
+        'amendment_rows': amendment_rows,
+        'rows_per_second': amendment_rows / best['wall_time'] if best['wall_time'] else None,
+        'generate_time': generate_time
+    })
+
+    os.remove(db_main)
+    os.remove(db_amendment)
+
+    return best
+
+
+def compareWithBaseline(results, baseline, tolerance):
+    """
+    Compares throughput of scenarios with the same name.
+    :type results: dict
+    :type baseline: dict
+    :param tolerance: Allowed relative slowdown.
+    :type tolerance: float
+    :return: Descriptions of regressions
+    :rtype: list
+    """
+    regressions = []
+    previous = dict((s['name'], s) for s in baseline['scenarios'])
+
+    for scenario in results['scenarios']:
+        if scenario['name'] not in previous or not previous[scenario['name']]['rows_per_second']:
+            continue
+
+        ratio = scenario['rows_per_second'] / previous[scenario['name']]['rows_per_second']
+        if ratio < 1 - tolerance:
+            regressions.append('{}: {:.0f} rows/s, baseline {:.0f} rows/s ({:+.1f} %)'.format(
+                scenario['name'], scenario['rows_per_second'],
+                previous[scenario['name']]['rows_per_second'], (ratio - 1) * 100))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    description = 'Benchmark of applying changes from amendment VFK database to main VFK database ' \
+                  'on generated data.'
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-s', '--scale', help='Numbers of rows in main database.', type=int, nargs='+',
+                        default=[10000, 100000])
+    parser.add_argument('-l', '--overlap', help='Shares of changed ids which exist in main database.',
+                        type=float, nargs='+', default=[0.5])
+    parser.add_argument('-c', '--changes', help='Number of changed ids relative to scale.', type=float,
+                        default=0.1)
+    parser.add_argument('-p', '--profile', help='SQLite session profile of the engine.',
+                        choices=sorted(SESSION_PROFILES), default=DEFAULT_SESSION_PROFILE)
+    parser.add_argument('-n', '--repeat', help='Number of runs of each scenario, the fastest is kept.',
+                        type=int, default=3)
+    parser.add_argument('-o', '--output', help='Path to the JSON file with results.')
+    parser.add_argument('-b', '--baseline', help='Path to the JSON file with results to compare with.')
+    parser.add_argument('-t', '--tolerance', help='Allowed slowdown against baseline, default is 0.2.',
+                        type=float, default=0.2)
+    parser.add_argument('-w', '--workdir', help='Directory for generated databases.')
+    parser.add_argument('--seed', help='Seed of generated data.', type=int, default=1)
+    parser.add_argument('--measure', help=argparse.SUPPRESS, nargs=3)
+
+    args = parser.parse_args()
+
+    if args.measure:
+        # single measurement in child process
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.measure[2], args.profile)))
+        sys.exit(0)
+
+    workdir = args.workdir if args.workdir else tempfile.mkdtemp(prefix='vfk_benchmark_')
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+
+    results = {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'profile': args.profile,
+        'scenarios': []
+    }
+
+    try:
+        for scale in args.scale:
+            for overlap in args.overlap:
+                scenario = runScenario(workdir, scale, overlap, args.changes, args.profile, args.repeat,
+                                       args.seed)
+                results['scenarios'].append(scenario)
+                print('{name}: {rows_per_second:.0f} rows/s, {wall_time:.2f} s, '
+                      'peak RSS {peak_rss_kib} KiB'.format(**scenario))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compareWithBaseline(results, baseline, args.tolerance)
+        if regressions:
+            print('Regressions against baseline:')
+            for regression in regressions:
+                print('  ' + regression)
+            sys.exit(1)
+
+        print('No regressions against baseline.')
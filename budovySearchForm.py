@@ -23,12 +23,14 @@
 """
 
 from PyQt4.QtGui import *
-from PyQt4.QtCore import QAbstractItemModel
+from PyQt4.QtCore import QAbstractItemModel, SIGNAL, pyqtSignal
 
 from ui_budovysearchform import *
 
 
 class BudovySearchForm(QWidget):
+    # signals
+    searchChanged = pyqtSignal()
 
     def __init__(self, parent=None):
         super(BudovySearchForm, self).__init__(parent)
@@ -39,6 +41,15 @@ class BudovySearchForm(QWidget):
 
         self.__mZpusobVyuzitiModel = QAbstractItemModel
 
+        self.connect(self.ui.cisloDomovniLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.naParceleLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.lvBudovyLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.mZpVyuzitiCombo, SIGNAL(
+            "activated(int)"), self.__searchChanged)
+
     def domovniCislo(self):
         return unicode(self.ui.cisloDomovniLineEdit.text()).strip()
 
@@ -64,3 +75,6 @@ class BudovySearchForm(QWidget):
             return u''
         else:
             return u"{}".format(self.ui.mZpVyuzitiCombo.model().data(index))
+
+    def __searchChanged(self):
+        self.searchChanged.emit()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from collections import OrderedDict
+
+from PyQt4.QtSql import QSqlDatabase, QSqlQuery
+from PyQt4.QtCore import qDebug
+
+# code tables read by CodeLists
+CODE_LIST_TABLES = ['drupoz', 'zpvybu', 'zpvyje', 'typrav', 'zpochn', 'charos', 'typbud']
+
+
+class CodeLists(object):
+    """
+    Code tables of VFK read once per connection, rows of a table are kept in a dict by their code.
+    """
+
+    # code lists shared by all users of a connection, connection name -> CodeLists
+    __codeLists = {}
+
+    def __init__(self, connectionName):
+        """
+
+        :type connectionName: str
+        """
+        # table -> OrderedDict(code -> row), row is dict(column -> value)
+        self.__mTables = {}
+
+        for table in CODE_LIST_TABLES:
+            self.__mTables[table] = self.__readTable(connectionName, table)
+
+    @classmethod
+    def forConnection(cls, connectionName):
+        """
+        Code tables are read on the first call for the connection only.
+
+        :type connectionName: str
+        :return: CodeLists
+        """
+        codeLists = cls.__codeLists.get(connectionName)
+        if codeLists is None:
+            codeLists = CodeLists(connectionName)
+            cls.__codeLists[connectionName] = codeLists
+
+        return codeLists
+
+    @classmethod
+    def clear(cls, connectionName=None):
+        """
+        Drops code lists of given connection, code lists of all connections if it is not given.
+        Code lists have to be dropped when data of the connection are changed.
+
+        :type connectionName: str
+        """
+        if connectionName is None:
+            cls.__codeLists.clear()
+        else:
+            cls.__codeLists.pop(connectionName, None)
+
+    @staticmethod
+    def __readTable(connectionName, table):
+        """
+
+        :type connectionName: str
+        :type table: str
+        :return: OrderedDict
+        """
+        rows = OrderedDict()
+
+        query = QSqlQuery(QSqlDatabase.database(connectionName))
+        query.setForwardOnly(True)
+        if not query.exec_(u"SELECT * FROM {};".format(table)):
+            qDebug(u"\n(VFK) Code list {} cannot be read: {}".format(table, query.lastError().text()))
+            return rows
+
+        record = query.record()
+        columns = [unicode(record.fieldName(i)).lower() for i in xrange(record.count())]
+
+        while query.next():
+            row = {}
+            for i, column in enumerate(columns):
+                # NULL is returned as None or QPyNullVariant depending on the sip API
+                row[column] = u'' if query.isNull(i) else unicode(query.value(i))
+            rows.setdefault(row.get(u'kod', u''), row)
+
+        query.finish()
+        return rows
+
+    def rows(self, table):
+        """
+
+        :type table: str
+        :return: rows of the table in order of the table
+        :rtype: list
+        """
+        return self.__mTables.get(table, {}).values()
+
+    def row(self, table, kod):
+        """
+
+        :type table: str
+        :type kod: str
+        :return: dict, None if there is no row of the code
+        """
+        return self.__mTables.get(table, {}).get(unicode(kod))
+
+    def value(self, table, kod, column):
+        """
+
+        :type table: str
+        :type kod: str
+        :type column: str
+        :return: str, empty string if there is no row of the code
+        """
+        row = self.row(table, kod)
+        if row is None:
+            return u''
+
+        return row.get(column, u'')
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import urllib
+
 from PyQt4.QtCore import qDebug, QObject
 
 from vfkDocument import *
 from vfkTableModel import *
+from codeLists import CodeLists
 from htmlDocument import *
 from domains import *
 
@@ -17,6 +20,12 @@ class Coordinates(object):
 
 class DocumentBuilder:
 
+    # number of rows of long lists rendered at once by paged documents
+    PAGE_ROWS = 200
+
+    # keys of the task selecting page of search results
+    SEARCH_PAGE_KEYS = (u"offset", u"limit")
+
     def __init__(self, connectionName=''):
         """
         :type connectionName: str
@@ -26,11 +35,21 @@ class DocumentBuilder:
         self.__mCurrentPageBudIds = []
         self.__mCurrentDefinitionPoint = Coordinates()
         self.__mDocument = None
+        self.__mPaged = False
+        # part of the current page not rendered yet, (method, arguments)
+        self.__mPendingPart = None
+        # model of the pending part with rows not read yet
+        self.__mPendingModel = None
+        # result of search outside of the builder, (task, ids, complete, error)
+        self.__mSearchResult = None
+        # task of the current document
+        self.__mTaskMap = {}
 
         # constructor depended decision
         if connectionName:
             self.__mHasConnection = True
             self.__mConnectionName = connectionName
+            self.__mCodeLists = CodeLists.forConnection(connectionName)
             self.__mDveRadyCislovani = False
             self.__mStringBezZapisu = u"Bez zápisu."
             self.initKatUzemi()
@@ -46,16 +65,132 @@ class DocumentBuilder:
     def currentDefinitionPoint(self):
         return self.__mCurrentDefinitionPoint
 
-    def buildHtml(self, document, taskMap):
+    def setSearchResult(self, taskMap, ids, complete=True):
+        """
+        Sets ids found by SearchThread, they are used instead of evaluating the search
+        when the search page of the task is built.
+
+        :type taskMap: dict
+        :type ids: list
+        :param complete: False if ids are found so far only, the search is still running
+        :type complete: bool
+        """
+        self.__mSearchResult = (self.__searchTask(taskMap), ids, complete, None)
+
+    def setSearchError(self, taskMap, message):
+        """
+        Sets error of SearchThread, the search page of the task shows it and the search
+        is not evaluated again.
+
+        :type taskMap: dict
+        :type message: str
+        """
+        self.__mSearchResult = (self.__searchTask(taskMap), None, True, message)
+
+    def __searchTask(self, taskMap):
+        """
+
+        :type taskMap: dict
+        :return: the task without selection of page of search results
+        """
+        return dict((key, value) for key, value in taskMap.iteritems() if key not in self.SEARCH_PAGE_KEYS)
+
+    def __foundIds(self, taskMap):
+        """
+        Ids are found for all pages of search results of the task.
+
+        :type taskMap: dict
+        :return: ids found for the task, None if the search has to be evaluated
+        """
+        if self.__mSearchResult is None or self.__mSearchResult[0] != self.__searchTask(taskMap):
+            return None
+
+        return self.__mSearchResult[1]
+
+    def __searchError(self, taskMap):
+        """
+
+        :type taskMap: dict
+        :return: error of the search of the task, None if the search did not fail
+        """
+        if self.__mSearchResult is None or self.__mSearchResult[0] != self.__searchTask(taskMap):
+            return None
+
+        return self.__mSearchResult[3]
+
+    def __isSearchRunning(self):
+        """
+
+        :return: True if ids of the current task are found so far only
+        """
+        return self.__foundIds(self.__mTaskMap) is not None and not self.__mSearchResult[2]
+
+    def __searchResultPage(self, ids):
+        """
+        Returns ids of the page of search results selected by offset and limit of the task,
+        number of found ids and links to neighbouring pages are rendered before them.
+        All ids are returned if the task has no limit.
+
+        :type ids: list
+        :return: list
+        """
+        limit = int(self.__mTaskMap.get(u"limit", 0) or 0)
+        if limit <= 0:
+            return ids
+
+        offset = min(max(0, int(self.__mTaskMap.get(u"offset", 0) or 0)), len(ids))
+        pageIds = ids[offset:offset + limit]
+
+        if self.__isSearchRunning():
+            text = u"Počet dosud nalezených: {}, zobrazeno {}–{}, hledání pokračuje.".format(
+                len(ids), offset + 1, offset + len(pageIds))
+        elif pageIds:
+            text = u"Počet nalezených: {}, zobrazeno {}–{}.".format(len(ids), offset + 1, offset + len(pageIds))
+        else:
+            text = u"Počet nalezených: {}.".format(len(ids))
+
+        links = []
+        if offset > 0:
+            links.append(self.__mDocument.link(self.__searchPageUrl(max(0, offset - limit), limit), u"Předchozí"))
+        if offset + limit < len(ids):
+            links.append(self.__mDocument.link(self.__searchPageUrl(offset + limit, limit), u"Další"))
+        if links:
+            text += u" {}".format(u" | ".join(links))
+
+        self.__mDocument.paragraph(text)
+        return pageIds
+
+    def __searchPageUrl(self, offset, limit):
+        """
+
+        :type offset: int
+        :type limit: int
+        :return: task of the page of search results of the current task
+        """
+        items = self.__searchTask(self.__mTaskMap)
+        action = items.pop(u"action", u"showText")
+        items[u"offset"] = offset
+        items[u"limit"] = limit
+
+        query = u"&".join(u"{}={}".format(key, urllib.quote(unicode(value).encode("utf-8"), safe=""))
+                          for key, value in sorted(items.iteritems()))
+        return u"{}?{}".format(action, query)
+
+    def buildHtml(self, document, taskMap, paged=False):
         """
 
         :type document: VfkDocument
         :type taskMap: dict
+        :param paged: long lists are rendered by pages, next page is rendered by buildMore
+        :type paged: bool
         """
         self.__mCurrentPageParIds = []
         self.__mCurrentPageBudIds = []
         self.__mCurrentDefinitionPoint.first = ''
         self.__mCurrentDefinitionPoint.second = ''
+        self.__mPaged = paged
+        self.finishPendingContent()
+        self.__mTaskMap = taskMap
 
         self.__mDocument = document
         self.__mDocument.header()
@@ -64,7 +199,9 @@ class DocumentBuilder:
             self.pageHelp()
 
         if self.__mHasConnection:
-            if taskMap["page"] == "tel":
+            if taskMap["page"] == "allTEL":
+                self.pageTelesa()
+            elif taskMap["page"] == "tel":
                 self.pageTeleso(taskMap["id"])
             elif taskMap["page"] == "par":
                 self.pageParcela(taskMap["id"])
@@ -84,27 +221,80 @@ class DocumentBuilder:
                     if "opsub" in taskMap:
                         self.pageSeznamOsob(taskMap['opsub'].split(","))
             elif taskMap["page"] == "search":
-                if taskMap["type"] == "vlastnici":
+                error = self.__searchError(taskMap)
+                if error is not None:
+                    self.pageSearchError(error)
+                elif taskMap["type"] == "vlastnici":
                     self.pageSearchVlastnici(
                         taskMap["jmeno"], taskMap["rcIco"],
                                              taskMap["sjm"], taskMap["opo"],
-                                             taskMap["ofo"], taskMap["lv"])
+                                             taskMap["ofo"], taskMap["lv"],
+                                             self.__foundIds(taskMap), taskMap.get("adresa", u""))
                 elif taskMap["type"] == "parcely":
                     self.pageSearchParcely(
-                        taskMap["parcelniCislo"], taskMap["typ"], taskMap["druh"], taskMap["lv"])
+                        taskMap["parcelniCislo"], taskMap["typ"], taskMap["druh"], taskMap["lv"],
+                        self.__foundIds(taskMap))
                 elif taskMap["type"] == "budovy":
                     self.pageSearchBudovy(
                         taskMap["domovniCislo"], taskMap[
                             "naParcele"], taskMap["zpusobVyuziti"],
-                                          taskMap["lv"])
+                                          taskMap["lv"], self.__foundIds(taskMap))
                 elif taskMap["type"] == "jednotky":
                     self.pageSearchJednotky(
                         taskMap["cisloJednotky"], taskMap[
                             "domovniCislo"], taskMap["naParcele"],
-                                            taskMap["zpusobVyuziti"], taskMap["lv"])
+                                            taskMap["zpusobVyuziti"], taskMap["lv"],
+                                            self.__foundIds(taskMap))
         self.__mDocument.footer()
         return
 
+    def hasMoreContent(self):
+        """
+
+        :return: bool
+        """
+        return self.__mPendingPart is not None
+
+    def buildMore(self, document):
+        """
+        Renders next page of the current paged document.
+
+        :type document: VfkDocument
+        """
+        if self.__mPendingPart is None:
+            return
+
+        part, args = self.__mPendingPart
+        self.__mPendingPart = None
+        self.__mPendingModel = None
+        self.__mDocument = document
+        part(*args)
+
+    def finishPendingContent(self):
+        """
+        Drops the part of the current page not rendered yet, query of the part is finished,
+        so it does not keep reading from the connection.
+        """
+        if self.__mPendingModel is not None:
+            self.__mPendingModel.finish()
+
+        self.__mPendingPart = None
+        self.__mPendingModel = None
+
+    def __pagedIds(self, ids, part):
+        """
+        Returns ids rendered now, the rest of them is left for the part called by buildMore.
+
+        :type ids: list
+        :param part: method rendering list of ids
+        :return: list
+        """
+        if not self.__mPaged or len(ids) <= self.PAGE_ROWS:
+            return ids
+
+        self.__mPendingPart = (part, (ids[self.PAGE_ROWS:],))
+        return ids[:self.PAGE_ROWS]
+
     def initKatUzemi(self):
         model = VfkTableModel(self.__mConnectionName)
 
@@ -113,18 +303,36 @@ class DocumentBuilder:
 
     def pageTelesa(self):
         model = VfkTableModel(self.__mConnectionName)
+        if self.__mPaged:
+            model.setPageSize(self.PAGE_ROWS)
 
         ok = model.telesa()
         if not ok:
             return
 
-        for i in xrange(model.rowCount()):
+        self.partTelesa(model, 0)
+
+    def partTelesa(self, model, first):
+        """
+
+        :type model: VfkTableModel
+        :param first: first row not rendered yet
+        :type first: int
+        """
+        if first == model.rowCount():
+            model.fetchMore()
+
+        for i in xrange(first, model.rowCount()):
             tel_id = model.value(i, u"tel_id")
             cislo_tel = model.value(i, u"tel_cislo_tel")
             link = self.__mDocument.link(
                 u"showText?page=tel&id={}".format(tel_id), cislo_tel + u"<br/>")
             self.__mDocument.text(link)
 
+        if model.canFetchMore():
+            self.__mPendingPart = (self.partTelesa, (model, model.rowCount()))
+            self.__mPendingModel = model
+
     def pageTeleso(self, id):
         """
 
@@ -251,22 +459,19 @@ class DocumentBuilder:
 
         self.__mDocument.tableHeader(header)
 
-        for i in xrange(model.rowCount()):
+        ochranaModel = VfkTableModel(self.__mConnectionName)
+        ok = ochranaModel.nemovitostiOchrana(
+            [model.value(i, u"par_id") for i in xrange(model.rowCount())],
+            VfkTableModel.Nemovitost.NParcela)
+
+        for i in xrange(model.rowCount() if ok else 0):
             row = [self.makeParcelniCislo(
                 model, i), model.value(i, u"par_vymera_parcely"),
                 model.value(i, u"drupoz_nazev"), model.value(i, u"zpvypo_nazev")]
 
             parcelaId = model.value(i, u"par_id")
-            ochranaModel = VfkTableModel(self.__mConnectionName)
 
-            ok = ochranaModel.nemovitostOchrana(
-                parcelaId, VfkTableModel.Nemovitost.NParcela)
-            if not ok:
-                break
-
-            ochranaNazev = []
-            for j in xrange(ochranaModel.rowCount()):
-                ochranaNazev.append(ochranaModel.value(j, u"zpochn_nazev"))
+            ochranaNazev = self.__ochranaNazvy(ochranaModel, ochranaModel.groupRows(parcelaId))
 
             row.append(u", ".join(ochranaNazev))
 
@@ -326,15 +531,20 @@ class DocumentBuilder:
 
         self.__mDocument.tableHeader(header)
 
-        for i in xrange(model.rowCount()):
+        ochranaModel = VfkTableModel(self.__mConnectionName)
+        ok = ochranaModel.nemovitostiOchrana(
+            [model.value(i, u"bud_id") for i in xrange(model.rowCount())],
+            VfkTableModel.Nemovitost.NBudova)
+
+        for i in xrange(model.rowCount() if ok else 0):
             row = []
 
-            if Domains.anoNe(model.value(i, u"typbud_zadani_cd")) is False:
+            if Domains.anoNe(self.__typbud(model, i, u"zadani_cd")) is False:
                 row.append(
                     self.__mDocument.link(
                         u"showText?page=bud&id={}".format(
                             model.value(i, u"bud_id")),
-                                                 model.value(i, u"typbud_zkratka")))
+                                                 self.__typbud(model, i, u"zkratka")))
                 row.append(model.value(i, u"casobc_nazev"))
                 row.append(u'')
             else:
@@ -344,21 +554,13 @@ class DocumentBuilder:
                     self.__mDocument.link(
                         u"showText?page=bud&id={}".format(
                             model.value(i, u"bud_id")),
-                                                 u"{} {}".format(model.value(i, u"typbud_zkratka"),
+                                                 u"{} {}".format(self.__typbud(model, i, u"zkratka"),
                                                                  model.value(i, u"bud_cislo_domovni"))))
             row.append(model.value(i, u"zpvybu_nazev"))
 
             budId = model.value(i, u"bud_id")
-            ochranaModel = VfkTableModel(self.__mConnectionName)
 
-            ok = ochranaModel.nemovitostOchrana(
-                budId, VfkTableModel.Nemovitost.NBudova)
-            if not ok:
-                break
-
-            ochranaNazev = []
-            for j in xrange(ochranaModel.rowCount()):
-                ochranaNazev.append(ochranaModel.value(j, u"zpochn_nazev"))
+            ochranaNazev = self.__ochranaNazvy(ochranaModel, ochranaModel.groupRows(budId))
 
             row.append(u", ".join(ochranaNazev))
             row.append(self.makeParcelniCislo(model, i))
@@ -418,22 +620,19 @@ class DocumentBuilder:
 
         self.__mDocument.tableHeader(header)
 
-        for i in xrange(model.rowCount()):
+        ochranaModel = VfkTableModel(self.__mConnectionName)
+        ok = ochranaModel.nemovitostiOchrana(
+            [model.value(i, u"jed_id") for i in xrange(model.rowCount())],
+            VfkTableModel.Nemovitost.NJednotka)
+
+        for i in xrange(model.rowCount() if ok else 0):
             row = []
 
             jedId = model.value(i, u"jed_id")
             row.append(self.makeJednotka(model, i))
             row.append(model.value(i, u"zpvyje_nazev"))
-            ochranaModel = VfkTableModel(self.__mConnectionName)
-
-            ok = ochranaModel.nemovitostOchrana(
-                jedId, VfkTableModel.Nemovitost.NJednotka)
-            if not ok:
-                break
 
-            ochranaNazev = []
-            for j in xrange(ochranaModel.rowCount()):
-                ochranaNazev.append(ochranaModel.value(j, u"zpochn_nazev"))
+            ochranaNazev = self.__ochranaNazvy(ochranaModel, ochranaModel.groupRows(jedId))
 
             row.append(u", ".join(ochranaNazev))
 
@@ -474,8 +673,8 @@ class DocumentBuilder:
         budInfo += u'' if casobc else casobc + u", "
 
         budova = u''
-        budova += budModel.value(0, u"typbud_zkratka")
-        if Domains.anoNe(budModel.value(0, u"typbud_zadani_cd")):
+        budova += self.__typbud(budModel, 0, u"zkratka")
+        if Domains.anoNe(self.__typbud(budModel, 0, u"zadani_cd")):
             budova += u" " + budModel.value(0, u"bud_cislo_domovni")
         budInfo += self.__mDocument.link(
             u"showText?page=bud&id={}".format(budId), budova)
@@ -693,20 +892,19 @@ class DocumentBuilder:
         self.__mDocument.tableHeader(header)
 
         isRecord = False
-        for id in parIds:
-            row = []
-            model = VfkTableModel(self.__mConnectionName)
-            ok = model.parcelaBpej(id)
-            if not ok:
-                break
+        model = VfkTableModel(self.__mConnectionName)
+        ok = model.parcelyBpej(parIds)
 
-            if model.rowCount() == 0:
+        for id in parIds if ok else []:
+            row = []
+            rows = model.groupRows(id)
+            if not rows:
                 continue
 
             isRecord = True
-            row.append(self.makeParcelniCislo(model, 0))
-            row.append(model.value(0, u"bdp_bpej_kod"))
-            row.append(model.value(0, u"bdp_vymera"))
+            row.append(self.makeParcelniCislo(model, rows[0]))
+            row.append(model.value(rows[0], u"bdp_bpej_kod"))
+            row.append(model.value(rows[0], u"bdp_vymera"))
 
             self.__mDocument.tableRow(row)
 
@@ -794,17 +992,25 @@ class DocumentBuilder:
         opravneni = [u"jpv_par_id_pro", u"jpv_bud_id_pro",
                      u"jpv_jed_id_pro", u"jpv_opsub_id_pro"]
 
+        model = VfkTableModel(self.__mConnectionName)
+        # codes of the section D or of the other sections, typrav is not joined to jpv
+        kody = [row[u"kod"] for row in self.__mCodeLists.rows(u"typrav")
+                if row.get(u"sekce") and (row[u"sekce"] == u'D') == sekceD]
+        where = u"jpv.typrav_kod IN ({})".format(u", ".join(u"'{}'".format(kod.replace(u"'", u"''"))
+                                                           for kod in kody))
+        ok = model.nemovitostiJpv(ids, pravniSubjekt, pravo, where)
+        if not ok:
+            return isRecord
+
         for id in ids:
-            model = VfkTableModel(self.__mConnectionName)
-            where = u"typrav.sekce {}= 'D'".format(u'' if sekceD else u'!')
-            ok = model.nemovitostJpv(id, pravniSubjekt, pravo, where)
-            if not ok or model.rowCount() == 0:
+            rows = model.groupRows(id)
+            if not rows:
                 continue
 
             isRecord = True
-            for i in xrange(model.rowCount()):
+            for i in rows:
                 row = []
-                typPrava = model.value(i, u"typrav_nazev")
+                typPrava = self.__mCodeLists.value(u"typrav", model.value(i, u"jpv_typrav_kod"), u"nazev")
                 row.append(typPrava)
 
                 opravneniList = []
@@ -989,7 +1195,8 @@ class DocumentBuilder:
                 tables[typravNazev].append(content)
             else:
                 nazev += u" ({})".format(
-                    vlastnikModel.value(0, u"charos_zkratka"))
+                    self.__mCodeLists.value(
+                        u"charos", vlastnikModel.value(0, u"opsub_charos_kod"), u"zkratka"))
                 rowContent = [nazev, u'', u'', podil]
                 tables[typravNazev].append(rowContent)
 
@@ -1027,18 +1234,36 @@ class DocumentBuilder:
 
         self.__mDocument.heading2(u"Způsob ochrany nemovitosti")
 
-        if ochrana.rowCount() == 0:
+        ochranaNazev = self.__ochranaNazvy(ochrana, xrange(ochrana.rowCount()))
+        if not ochranaNazev:
             self.__mDocument.text(u"Není evidován žádný způsob ochrany.")
         else:
             self.__mDocument.beginTable()
             header = [u"Název"]
 
-            for i in xrange(ochrana.rowCount()):
-                content = [ochrana.value(i, u"zpochn_nazev")]
+            for nazev in ochranaNazev:
+                content = [nazev]
                 self.__mDocument.tableRow(content)
 
             self.__mDocument.endTable()
 
+    def __ochranaNazvy(self, model, rows):
+        """
+        Names of zpusob ochrany are looked up in code lists, unknown codes are skipped.
+
+        :type model: VfkTableModel
+        :param rows: rows of the model with codes of zpusob ochrany
+        :type rows: list
+        :return: list
+        """
+        nazvy = []
+        for i in rows:
+            zpochn = self.__mCodeLists.row(u"zpochn", model.value(i, u"zpochn_kod"))
+            if zpochn is not None:
+                nazvy.append(zpochn[u"nazev"])
+
+        return nazvy
+
     def pageBudova(self, id):
         """
 
@@ -1055,7 +1280,7 @@ class DocumentBuilder:
 
         content = []
 
-        if Domains.anoNe(model.value(0, u"typbud_zadani_cd")):
+        if Domains.anoNe(self.__typbud(model, 0, u"zadani_cd")):
             content.append(TPair(u"Stavba:", self.makeDomovniCislo(model, 0)))
             content.append(TPair(u"Část obce:", self.makeCastObce(model, 0)))
 
@@ -1070,7 +1295,7 @@ class DocumentBuilder:
         cena = model.value(0, u"bud_cena_nemovitosti")
         if cena:
             content.append(TPair(u"Cena nemovitosti:", cena))
-        content.append(TPair(u"Typ stavby:", model.value(0, u"typbud_nazev")))
+        content.append(TPair(u"Typ stavby:", self.__typbud(model, 0, u"nazev")))
         content.append(
             TPair(u"Způsob využití:", model.value(0, u"zpvybu_nazev")))
 
@@ -1182,7 +1407,8 @@ class DocumentBuilder:
                     manzelId, VfkTableModel.OpravnenyPovinny.OPOsoba)
                 content.append(TPair(u'', desc))
 
-        content.append(TPair(u"Typ:", opsubModel.value(0, u"charos_nazev")))
+        content.append(TPair(u"Typ:", self.__mCodeLists.value(
+            u"charos", opsubModel.value(0, u"opsub_charos_kod"), u"nazev")))
 
         nemovitostiModel = VfkTableModel(self.__mConnectionName)
         nemovitostiModel.vlastnikNemovitosti(id)
@@ -1213,79 +1439,103 @@ class DocumentBuilder:
         self.partTelesoC([], [], [], opsubIds, False)
         self.partTelesoD([], [], [], opsubIds, False)
 
-    def pageSeznamParcel(self, ids):
+    def pageSeznamParcel(self, ids, foundIds=None):
         """
 
         :type ids: list
+        :param foundIds: all ids found by a search when ids are a page of them only
+        :type foundIds: list
         """
         self.__mDocument.heading2(u"Seznam parcel")
-        self.__mDocument.beginItemize()
+        self.__mCurrentPageParIds = ids if foundIds is None else foundIds
+        self.partSeznamParcel(ids)
 
-        self.__mCurrentPageParIds = ids
+    def partSeznamParcel(self, ids):
+        """
 
-        for id in ids:
-            model = VfkTableModel(self.__mConnectionName)
-            ok = model.parcela(id, False)
-            if not ok:
-                continue
+        :type ids: list
+        """
+        self.__mDocument.beginItemize()
 
-            self.__mDocument.item(self.makeLongDescription(
-                id, VfkTableModel.OpravnenyPovinny.OPParcela))
+        ids = self.__pagedIds(ids, self.partSeznamParcel)
+        for text in self.makeLongDescriptions(ids, VfkTableModel.OpravnenyPovinny.OPParcela):
+            self.__mDocument.item(text)
 
         self.__mDocument.endItemize()
 
-    def pageSeznamOsob(self, ids):
+    def pageSeznamOsob(self, ids, foundIds=None):
         """
 
         :type ids: list
+        :param foundIds: all ids found by a search when ids are a page of them only
+        :type foundIds: list
         """
         self.__mDocument.heading2(u"Seznam osob")
-        self.__mDocument.beginItemize()
+        self.__mCurrentPageParIds = ids if foundIds is None else foundIds
+        self.partSeznamOsob(ids)
 
-        self.__mCurrentPageParIds = ids
+    def partSeznamOsob(self, ids):
+        """
 
-        for id in ids:
-            model = VfkTableModel(self.__mConnectionName)
-            ok = model.opravnenySubjekt(id, True)
-            if not ok:
-                continue
+        :type ids: list
+        """
+        self.__mDocument.beginItemize()
 
-            self.__mDocument.item(self.makeLongDescription(
-                id, VfkTableModel.OpravnenyPovinny.OPOsoba))
+        ids = self.__pagedIds(ids, self.partSeznamOsob)
+        for text in self.makeLongDescriptions(ids, VfkTableModel.OpravnenyPovinny.OPOsoba):
+            self.__mDocument.item(text)
 
         self.__mDocument.endItemize()
 
-    def pageSeznamBudov(self, ids):
+    def pageSeznamBudov(self, ids, foundIds=None):
         """
 
         :type ids: list
+        :param foundIds: all ids found by a search when ids are a page of them only
+        :type foundIds: list
         """
         self.__mDocument.heading2(u"Seznam budov")
+        self.__mCurrentPageBudIds = ids if foundIds is None else foundIds
+        self.partSeznamBudov(ids)
+
+    def partSeznamBudov(self, ids):
+        """
+
+        :type ids: list
+        """
         self.__mDocument.beginItemize()
-        self.__mCurrentPageBudIds = ids
 
-        for id in ids:
-            self.__mDocument.item(self.makeLongDescription(
-                id, VfkTableModel.OpravnenyPovinny.OPBudova))
+        ids = self.__pagedIds(ids, self.partSeznamBudov)
+        for text in self.makeLongDescriptions(ids, VfkTableModel.OpravnenyPovinny.OPBudova):
+            self.__mDocument.item(text)
 
         self.__mDocument.endItemize()
 
-    def pageSeznamJednotek(self, ids):
+    def pageSeznamJednotek(self, ids, foundIds=None):
         """
 
         :type ids: list
+        :param foundIds: all ids found by a search when ids are a page of them only
+        :type foundIds: list
         """
         self.__mDocument.heading2(u"Seznam jednotek")
+        self.__mCurrentPageBudIds = ids if foundIds is None else foundIds
+        self.partSeznamJednotek(ids)
+
+    def partSeznamJednotek(self, ids):
+        """
+
+        :type ids: list
+        """
         self.__mDocument.beginItemize()
-        self.__mCurrentPageBudIds = ids
 
-        for id in ids:
-            self.__mDocument.item(self.makeLongDescription(
-                id, VfkTableModel.OpravnenyPovinny.OPJednotka))
+        ids = self.__pagedIds(ids, self.partSeznamJednotek)
+        for text in self.makeLongDescriptions(ids, VfkTableModel.OpravnenyPovinny.OPJednotka):
+            self.__mDocument.item(text)
 
         self.__mDocument.endItemize()
 
-    def pageSearchVlastnici(self, jmeno, identifikator, sjm, opo, ofo, lv):
+    def pageSearchVlastnici(self, jmeno, identifikator, sjm, opo, ofo, lv, ids=None, adresa=u''):
         """
 
         :type jmeno: str
@@ -1294,60 +1544,70 @@ class DocumentBuilder:
         :type opo: bool
         :type ofo: bool
         :type lv: bool
+        :param ids: ids found by SearchThread, the search is evaluated if they are not given
+        :type ids: list
+        :type adresa: str
         :return:
         """
-        model = VfkTableModel(self.__mConnectionName)
-        ok = model.searchOpsub(jmeno, identifikator, sjm, opo, ofo, lv)
-        if not ok:
-            return
+        if ids is None:
+            model = VfkTableModel(self.__mConnectionName)
+            ok = model.searchOpsub(jmeno, identifikator, sjm, opo, ofo, lv, adresa)
+            if not ok:
+                return
 
-        ids = []
-        for i in xrange(model.rowCount()):
-            ids.append(model.value(i, u'opsub_id'))
+            ids = []
+            for i in xrange(model.rowCount()):
+                ids.append(model.value(i, u'opsub_id'))
 
-        self.pageSeznamOsob(ids)
+        self.pageSeznamOsob(self.__searchResultPage(ids), ids)
 
-    def pageSearchParcely(self, parcelniCislo, typIndex, druhKod, lv):
+    def pageSearchParcely(self, parcelniCislo, typIndex, druhKod, lv, ids=None):
         """
 
         :type parcelniCislo: str
         :type typIndex: str
         :type druhKod: str
         :type lv: str
+        :param ids: ids found by SearchThread, the search is evaluated if they are not given
+        :type ids: list
         :return:
         """
-        model = VfkTableModel(self.__mConnectionName)
-        ok = model.searchPar(parcelniCislo, typIndex, druhKod, lv)
-        if not ok:
-            return
+        if ids is None:
+            model = VfkTableModel(self.__mConnectionName)
+            ok = model.searchPar(parcelniCislo, typIndex, druhKod, lv)
+            if not ok:
+                return
 
-        ids = []
-        for i in xrange(model.rowCount()):
-            ids.append(model.value(i, u"par_id"))
+            ids = []
+            for i in xrange(model.rowCount()):
+                ids.append(model.value(i, u"par_id"))
 
-        self.pageSeznamParcel(ids)
+        self.pageSeznamParcel(self.__searchResultPage(ids), ids)
 
-    def pageSearchBudovy(self, domovniCislo, naParcele, zpusobVyuziti, lv):
+    def pageSearchBudovy(self, domovniCislo, naParcele, zpusobVyuziti, lv, ids=None):
         """
 
         :type domovniCislo: str
         :type naParcele: str
         :type zpusobVyuziti: str
         :type lv: str
+        :param ids: ids found by SearchThread, the search is evaluated if they are not given
+        :type ids: list
         :return:
         """
-        model = VfkTableModel(self.__mConnectionName)
-        ok = model.searchBud(domovniCislo, naParcele, zpusobVyuziti, lv)
-        if not ok:
-            return
+        if ids is None:
+            model = VfkTableModel(self.__mConnectionName)
+            ok = model.searchBud(domovniCislo, naParcele, zpusobVyuziti, lv)
+            if not ok:
+                return
 
-        ids = []
-        for i in xrange(model.rowCount()):
-            ids.append(model.value(i, u"bud_id"))
+            ids = []
+            for i in xrange(model.rowCount()):
+                ids.append(model.value(i, u"bud_id"))
 
-        self.pageSeznamBudov(ids)
+        self.pageSeznamBudov(self.__searchResultPage(ids), ids)
 
-    def pageSearchJednotky(self, cisloJednotky, domovniCislo, naParcele, zpusobVyuziti, lv):
+    def pageSearchJednotky(self, cisloJednotky, domovniCislo, naParcele, zpusobVyuziti, lv, ids=None):
         """
 
         :type cisloJednotky: str
@@ -1355,21 +1615,33 @@ class DocumentBuilder:
         :type naParcele: str
         :type zpusobVyuziti: str
         :type lv: str
+        :param ids: ids found by SearchThread, the search is evaluated if they are not given
+        :type ids: list
         :return:
         """
-        model = VfkTableModel(self.__mConnectionName)
-        ok = model.searchJed(
-            cisloJednotky, domovniCislo, naParcele, zpusobVyuziti, lv)
-        if not ok:
-            qDebug(
-                "\n(VFK) ERROR: Nemohu najit danne jednotky, nekde se stala nejaka chyba")
-            return
+        if ids is None:
+            model = VfkTableModel(self.__mConnectionName)
+            ok = model.searchJed(
+                cisloJednotky, domovniCislo, naParcele, zpusobVyuziti, lv)
+            if not ok:
+                qDebug(
+                    "\n(VFK) ERROR: Nemohu najit danne jednotky, nekde se stala nejaka chyba")
+                return
 
-        ids = []
-        for i in xrange(model.rowCount()):
-            ids.append(model.value(i, u"jed_id"))
+            ids = []
+            for i in xrange(model.rowCount()):
+                ids.append(model.value(i, u"jed_id"))
+
+        self.pageSeznamJednotek(self.__searchResultPage(ids), ids)
 
-        self.pageSeznamJednotek(ids)
+    def pageSearchError(self, message):
+        """
+
+        :param message: error of the search
+        :type message: str
+        """
+        self.__mDocument.heading2(u"Hledání")
+        self.__mDocument.paragraph(message)
 
     def pageHelp(self):
         self.__mDocument.heading1(u"VFK plugin")
@@ -1445,16 +1717,25 @@ class DocumentBuilder:
             text = u"Jednotka: {}".format(self.makeJednotka(model, 0))
         elif nemovitost == VfkTableModel.OpravnenyPovinny.OPOsoba:
             model.opravnenySubjekt(id, True)
-            if model.value(0, u"opsub_opsub_type") == u"BSM":
-                text = u"{}".format(self.makeJmeno(model, 0))
-            else:
-                text = u"{}, {}, RČ/IČO: {}".format(self.makeJmeno(model, 0), self.makeAdresa(model, 0),
-                                                    self.makeIdentifikator(model, 0))
+            text = self.__osobaDescription(model, 0)
         else:
             pass
 
         return text
 
+    def __osobaDescription(self, model, row):
+        """
+
+        :type model: VfkTableModel
+        :type row: int
+        :return: str
+        """
+        if model.value(row, u"opsub_opsub_type") == u"BSM":
+            return u"{}".format(self.makeJmeno(model, row))
+
+        return u"{}, {}, RČ/IČO: {}".format(self.makeJmeno(model, row), self.makeAdresa(model, row),
+                                            self.makeIdentifikator(model, row))
+
     def makeLongDescription(self, id, nemovitost):
         """
 
@@ -1470,24 +1751,81 @@ class DocumentBuilder:
 
         if nemovitost == VfkTableModel.OpravnenyPovinny.OPParcela:
             model.parcela(id, False)
-            text = u"Parcela "
-            text += self.makeParcelniCislo(model, 0)
-            text += u", LV {}".format(self.makeLVCislo(model, 0))
         elif nemovitost == VfkTableModel.OpravnenyPovinny.OPBudova:
             model.budova(id, False)
-            text = u"Budova: {}".format(self.makeDomovniCislo(model, 0))
-            text += u" na parcele {}".format(self.makeParcelniCislo(model, 0))
-            text += u", LV {}".format(self.makeLVCislo(model, 0))
         elif nemovitost == VfkTableModel.OpravnenyPovinny.OPJednotka:
             model.jednotka(id, True)
-            text = u"Jednotka: ".format(self.makeJednotka(model, 0))
-            text += u" v budově  {}".format(self.makeDomovniCislo(model, 0))
-            text += u" na parcele {}".format(self.makeParcelniCislo(model, 0))
-            text += u", LV {}".format(self.makeLVCislo(model, 0))
         elif nemovitost == VfkTableModel.OpravnenyPovinny.OPOsoba:
-            text += self.makeShortDescription(id, nemovitost)
+            model.opravnenySubjekt(id, True)
         else:
-            pass
+            return text
+
+        return self.__longDescription(model, 0, nemovitost)
+
+    def makeLongDescriptions(self, ids, nemovitost):
+        """
+        Batch variant of makeLongDescription, rows of all ids are read by one query.
+
+        :type ids: list
+        :type nemovitost: VfkTableModel.OpravnenyPovinny
+        :return: descriptions in order of ids
+        :rtype: list
+        """
+        model = VfkTableModel(self.__mConnectionName)
+
+        if nemovitost == VfkTableModel.OpravnenyPovinny.OPParcela:
+            ok = model.parcely(ids, False)
+        elif nemovitost == VfkTableModel.OpravnenyPovinny.OPBudova:
+            ok = model.budovy(ids, False)
+        elif nemovitost == VfkTableModel.OpravnenyPovinny.OPJednotka:
+            ok = model.jednotky(ids, True)
+        elif nemovitost == VfkTableModel.OpravnenyPovinny.OPOsoba:
+            ok = model.opravneneSubjekty(ids, True)
+        else:
+            return [u''] * len(ids)
+
+        if not ok:
+            # descriptions are read one by one as before, the list must not be empty
+            qDebug(u"\n(VFK) Descriptions of {} ids cannot be read by one query".format(len(ids)))
+            return [self.makeLongDescription(id, nemovitost) for id in ids]
+
+        texts = []
+        for id in ids:
+            if not id:
+                texts.append(u'')
+                continue
+
+            # values of an id without rows are empty as in makeLongDescription
+            rows = model.groupRows(id)
+            texts.append(self.__longDescription(model, rows[0] if rows else -1, nemovitost))
+
+        return texts
+
+    def __longDescription(self, model, row, nemovitost):
+        """
+
+        :type model: VfkTableModel
+        :type row: int
+        :type nemovitost: VfkTableModel.OpravnenyPovinny
+        :return: str
+        """
+        text = u''
+
+        if nemovitost == VfkTableModel.OpravnenyPovinny.OPParcela:
+            text = u"Parcela "
+            text += self.makeParcelniCislo(model, row)
+            text += u", LV {}".format(self.makeLVCislo(model, row))
+        elif nemovitost == VfkTableModel.OpravnenyPovinny.OPBudova:
+            text = u"Budova: {}".format(self.makeDomovniCislo(model, row))
+            text += u" na parcele {}".format(self.makeParcelniCislo(model, row))
+            text += u", LV {}".format(self.makeLVCislo(model, row))
+        elif nemovitost == VfkTableModel.OpravnenyPovinny.OPJednotka:
+            text = u"Jednotka: ".format(self.makeJednotka(model, row))
+            text += u" v budově  {}".format(self.makeDomovniCislo(model, row))
+            text += u" na parcele {}".format(self.makeParcelniCislo(model, row))
+            text += u", LV {}".format(self.makeLVCislo(model, row))
+        elif nemovitost == VfkTableModel.OpravnenyPovinny.OPOsoba:
+            text = self.__osobaDescription(model, row)
 
         return text
 
@@ -1589,6 +1927,17 @@ class DocumentBuilder:
             u"showText?page=par&id={}".format(model.value(row, u"par_id")), cislo)
         return u"{} {}".format(st, link)
 
+    def __typbud(self, model, row, column):
+        """
+        Column of the typbud code list for the building in the row of the model.
+
+        :type model: VfkTableModel
+        :type row: int
+        :type column: str
+        :return: str
+        """
+        return self.__mCodeLists.value(u"typbud", model.value(row, u"bud_typbud_kod"), column)
+
     def makeDomovniCislo(self, model, row):
         """
 
@@ -1598,7 +1947,7 @@ class DocumentBuilder:
         """
         return self.__mDocument.link(
             u"showText?page=bud&id={}".format(model.value(row, u"bud_id")),
-                                     u"{} {}".format(model.value(row, u"typbud_zkratka"),
+                                     u"{} {}".format(self.__typbud(model, row, u"zkratka"),
                                                      model.value(row, u"bud_cislo_domovni")))
 
     def makeJednotka(self, model, row):
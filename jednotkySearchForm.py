@@ -23,12 +23,14 @@
 """
 
 from PyQt4.QtGui import *
-from PyQt4.QtCore import QAbstractItemModel, QModelIndex
+from PyQt4.QtCore import QAbstractItemModel, QModelIndex, SIGNAL, pyqtSignal
 
 from ui_jednotkysearchform import *
 
 
 class JednotkySearchForm(QWidget):
+    # signals
+    searchChanged = pyqtSignal()
 
     def __init__(self, parent=None):
         super(JednotkySearchForm, self).__init__(parent)
@@ -39,6 +41,17 @@ class JednotkySearchForm(QWidget):
 
         self.__mZpusobVyuzitiModel = QAbstractItemModel
 
+        self.connect(self.ui.mCisloJednotkyLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.mCisloDomovniLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.mNaParceleLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.mLvJednotkyLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.mZpVyuzitiCombo, SIGNAL(
+            "activated(int)"), self.__searchChanged)
+
     def cisloJednotky(self):
         return unicode(self.ui.mCisloJednotkyLineEdit.text()).strip()
 
@@ -64,3 +77,6 @@ class JednotkySearchForm(QWidget):
             return u''
         else:
             return u"{}".format(self.ui.mZpVyuzitiCombo.model().data(index))
+
+    def __searchChanged(self):
+        self.searchChanged.emit()
@@ -36,8 +36,11 @@ import time
 
 from ui_MainApp import Ui_MainApp
 from searchFormController import *
+from vfkTableModel import VfkTableModel
+from codeLists import CodeLists
 from openThread import *
-from applyChanges import *
+from applyChangesThread import *
+from schemaOptimizerThread import SchemaOptimizerThread
 from publicvfk import VFKParBuilder
 from publicvfk import VFKBudBuilder
 from publicvfk import VFKBuilderError
@@ -89,6 +92,8 @@ class MainApp(QDockWidget, QMainWindow, Ui_MainApp):
         self.__databases = {}
         # self.pb_applyChanges.setEnabled(False)
         self.changes_instance = ApplyChanges()
+        self.changesThread = None
+        self.optimizerThread = None
 
         # Connect ui with functions
         self.__createToolbarsAndConnect()
@@ -123,6 +128,8 @@ class MainApp(QDockWidget, QMainWindow, Ui_MainApp):
 
         self.connect(self.__mSearchController, SIGNAL(
             "actionTriggered(QUrl)"), self.vfkBrowser.processAction)
+        self.__mSearchController.searchResultFound.connect(self.vfkBrowser.showSearchResult)
+        self.__mSearchController.searchFailed.connect(self.vfkBrowser.showSearchError)
         self.connect(
             self, SIGNAL("enableSearch"), self.searchButton.setEnabled)
 
@@ -165,6 +172,12 @@ class MainApp(QDockWidget, QMainWindow, Ui_MainApp):
         self.settings = QSettings("CTU", "VFK plugin")
         self.full_data = True
 
+        VfkTableModel.setResultCacheSize(
+            int(self.settings.value('resultCacheSize', VfkTableModel.RESULT_CACHE_SIZE)))
+        queryLog = VfkTableModel.queryLog()
+        queryLog.setCapacity(int(self.settings.value('queryLogSize', queryLog.capacity())))
+        queryLog.setSlowQueryTime(int(self.settings.value('slowQueryTime', queryLog.slowQueryTime())))
+
     def browseButton_clicked(self, browseButton_id=1):
         """
         :param browseButton_id: ID of clicked browse button.
@@ -361,9 +374,22 @@ class MainApp(QDockWidget, QMainWindow, Ui_MainApp):
 
     def loadingLayersFinished(self):
         """
-
+        Imported database is optimized in background thread, database is opened when it is done.
         :return:
         """
+        if self.optimizerThread and self.optimizerThread.isRunning():
+            return
+
+        self.labelLoading.setText(u'Optimalizuji databázi...')
+        self.optimizerThread = SchemaOptimizerThread(os.environ['OGR_VFK_DB_NAME'])
+        self.optimizerThread.optimizationFinished.connect(self.__databaseOptimized)
+        self.optimizerThread.start()
+
+    def __databaseOptimized(self, ok):
+        """
+        Database is opened even if the optimization failed, it is only slower.
+        :type ok: bool
+        """
         try:
             self.__openDatabase(
                 os.environ['OGR_VFK_DB_NAME'])  # self.__mDataSourceName)
@@ -484,6 +510,16 @@ class MainApp(QDockWidget, QMainWindow, Ui_MainApp):
         if not QSqlDatabase.isDriverAvailable('QSQLITE'):
             raise VFKError(u'Databázový ovladač QSQLITE není dostupný.')
 
+        # prepared queries and cached results of previous connection are not used any more
+        if self.property("connectionName"):
+            self.vfkBrowser.finishPendingContent()
+            VfkTableModel.clearPreparedQueries(self.property("connectionName"))
+            VfkTableModel.clearResultCache(self.property("connectionName"))
+            CodeLists.clear(self.property("connectionName"))
+
+        # search tables of the database may be built again
+        VfkTableModel.clearSearchTables(dbPath)
+
         connectionName = QUuid.createUuid().toString()
         db = QSqlDatabase.addDatabase("QSQLITE", connectionName)
         db.setDatabaseName(dbPath)
@@ -797,41 +833,81 @@ class MainApp(QDockWidget, QMainWindow, Ui_MainApp):
 
     def applyChanges(self):
         """
-        Method
+        Method starts applying changes in background thread.
         :return:
         """
-        self.changes_instance.run(self.__databases['mainDb'],
-                                  self.__databases['amendmentDb'],
-                                  self.__databases['exportDb'])
+        if self.changesThread and self.changesThread.isRunning():
+            return
+
+        self.pb_applyChanges.setEnabled(False)
+        self.pb_cancelChanges.setEnabled(True)
+
+        self.changesThread = ApplyChangesThread(self.changes_instance,
+                                                self.__databases['mainDb'],
+                                                self.__databases['amendmentDb'],
+                                                self.__databases['exportDb'])
+        self.changesThread.start()
+
+    def cancelChanges(self):
+        """
+        Method requests cancellation of running process of applying changes.
+        """
+        if not self.changesThread or not self.changesThread.isRunning():
+            return
 
-    def __updateProgressBarChanges(self, iteration, table_name):
+        self.pb_cancelChanges.setEnabled(False)
+        self.l_status.setText(u'Ruším aplikaci změn...')
+        self.changesThread.cancel()
+
+    def __updateProgressBarChanges(self, rows_applied, table_name):
         """
-        :type iteration: int
+        :type rows_applied: int
         :type table_name: str
         """
-        self.progressBar_changes.setValue(iteration)
-        self.l_status.setText(u'Aplikuji změny na tabulku {}...'.format(table_name))
-        QgsApplication.processEvents()
+        self.progressBar_Changes.setValue(rows_applied)
+        self.l_status.setText(u'Aplikuji změny na tabulku {} ({}/{})...'.format(
+            table_name, rows_applied, self.progressBar_Changes.maximum()))
 
     def __setRangeProgressBarChanges(self, max_range):
         """
         :type max_range: int
         """
-        self.progressBar_changes.setRange(0, max_range)
-        self.progressBar_changes.setValue(0)
+        self.progressBar_Changes.setRange(0, max_range)
+        self.progressBar_Changes.setValue(0)
 
     def __changesApplied(self):
         """
         """
-        time.sleep(1)
         self.l_status.setText(u'Změny byly úspěšně aplikovány.')
-        QgsApplication.processEvents()
+        self.vfkBrowser.finishPendingContent()
+        VfkTableModel.clearResultCache()
+        CodeLists.clear()
+        self.__changesFinished()
+
+    def __changesCancelled(self):
+        """
+        """
+        self.progressBar_Changes.setValue(0)
+        self.l_status.setText(u'Aplikace změn byla zrušena, výstupní databáze nebyla vytvořena.')
+        self.__changesFinished()
+
+    def __changesFailed(self, message):
+        """
+        :type message: str
+        """
+        self.l_status.setText(u'Aplikace změn selhala: {}'.format(message))
+        self.__changesFinished()
+
+    def __changesFinished(self):
+        """
+        """
+        self.pb_applyChanges.setEnabled(True)
+        self.pb_cancelChanges.setEnabled(False)
 
     def __changesPreprocessingDatabase(self):
         """
         """
         self.l_status.setText(u'Připravuji výstupní databázi...')
-        QgsApplication.processEvents()
 
     def __checkIfAmendmentFile(self, file_name):
         """
@@ -1027,10 +1103,14 @@ class MainApp(QDockWidget, QMainWindow, Ui_MainApp):
 
         self.pb_applyChanges.clicked.connect(self.applyChanges)
         self.pb_applyChanges.setEnabled(False)
+        self.pb_cancelChanges.clicked.connect(self.cancelChanges)
+        self.pb_cancelChanges.setEnabled(False)
 
         self.connect(self.changes_instance, SIGNAL("maxRangeProgressBar"), self.__setRangeProgressBarChanges)
         self.connect(self.changes_instance, SIGNAL("updateStatus"), self.__updateProgressBarChanges)
         self.connect(self.changes_instance, SIGNAL("finishedStatus"), self.__changesApplied)
+        self.connect(self.changes_instance, SIGNAL("cancelledStatus"), self.__changesCancelled)
+        self.connect(self.changes_instance, SIGNAL("errorStatus"), self.__changesFailed)
         self.connect(self.changes_instance, SIGNAL("preprocessingDatabase"), self.__changesPreprocessingDatabase)
 
         # connect radio boxes
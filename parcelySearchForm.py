@@ -23,12 +23,14 @@
 """
 
 from PyQt4.QtGui import *
-from PyQt4.QtCore import QAbstractItemModel, QRegExp, SIGNAL
+from PyQt4.QtCore import QAbstractItemModel, QRegExp, SIGNAL, pyqtSignal
 
 from ui_parcelysearchform import *
 
 
 class ParcelySearchForm(QWidget):
+    # signals
+    searchChanged = pyqtSignal()
 
     def __init__(self, parent=None):
         super(ParcelySearchForm, self).__init__(parent)
@@ -46,6 +48,15 @@ class ParcelySearchForm(QWidget):
         self.validator = QRegExpValidator(self.rx)
         self.ui.parCisloLineEdit.setValidator(self.validator)
 
+        self.connect(self.ui.parCisloLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.lvParcelyLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.typParcelyCombo, SIGNAL(
+            "activated(int)"), self.__searchChanged)
+        self.connect(self.ui.druhPozemkuCombo, SIGNAL(
+            "activated(int)"), self.__searchChanged)
+
     def parcelniCislo(self):
         return unicode(self.ui.parCisloLineEdit.text()).strip()
 
@@ -100,3 +111,6 @@ class ParcelySearchForm(QWidget):
             return u''
         else:
             return u"{}".format(self.ui.druhPozemkuCombo.model().data(index))
+
+    def __searchChanged(self):
+        self.searchChanged.emit()
@@ -446,6 +446,125 @@ class VFKBudBuilder(VFKBuilder):
         # Close database
         self.dsn_db = None
 
+
+class VFKGeometryRefresher(VFKBuilder):
+    # columns with ids of features written by VFKParBuilder and VFKBudBuilder
+    KEY_COLUMNS = {'PAR': 'id_par', 'BUD': 'id_bud'}
+
+    def __init__(self, dbname):
+        """Constructor VFKGeometryRefresher, rebuilds geometries of selected parcels
+         and buildings in already existing database
+
+        :param str dbname: path to the database
+        :raises VFKBuilderError: if the database is not connected
+        """
+        self.dbname = dbname
+        self.dsn_db = None
+        self.db = sqlite3.connect(self.dbname)
+        if self.db is None:
+            raise VFKBuilderError('Database is not connected')
+        # ids of features without row in the layer, per table
+        self.not_found = {'PAR': [], 'BUD': []}
+
+    def close(self):
+        """Close database
+        """
+        self.db.close()
+
+    def get_vertices(self, sql, params):
+        """Form a list of vertices from WKB geometries selected by SQL command
+
+        :param str sql: SQL command selecting geometries
+        :param tuple params: parameters of the SQL command
+        :return: list of vertices
+        """
+        list_vertices = []
+        cur = self.db.cursor()
+        cur.execute(sql, params)
+        for row in cur.fetchall():
+            geom = ogr.CreateGeometryFromWkb(bytes(row[0]))
+            if geom is not None:
+                list_vertices.append(geom.GetPoints())
+
+        return list_vertices
+
+    def update_geometry(self, table, feature_id, list_vertices):
+        """Build the boundary from list of vertices and write it to the feature
+
+        :param str table: name of the table - PAR or BUD
+        :param int feature_id: id of the feature
+        :param list list_vertices: unsorted list of vertices forming boundary
+        :return: True if the geometry was written, feature which is not in the layer
+         is recorded in not_found
+        """
+        if not list_vertices:
+            # no boundary in the database, the geometry is kept
+            return False
+
+        poly_geom = self.build_bound(list_vertices)
+        wkb = None
+        if poly_geom is not None:
+            # Convert to 2D
+            poly_geom.FlattenTo2D()
+            wkb = sqlite3.Binary(poly_geom.ExportToWkb())
+
+        cur = self.db.cursor()
+        cur.execute('UPDATE {} SET geometry = ? WHERE {} = ?'.format(table, self.KEY_COLUMNS[table]),
+                    (wkb, feature_id))
+        if cur.rowcount < 1:
+            self.not_found[table].append(feature_id)
+            return False
+
+        return True
+
+    def refresh_par(self, parcels):
+        """Rebuild the boundaries of specified parcels from HP
+
+        :param list parcels: list of parcel ids
+        :return: number of updated parcels
+        """
+        count = 0
+        for par_id in parcels:
+            list_vertices = self.get_vertices(
+                'SELECT geometry FROM hp WHERE (par_id_1 = ? OR par_id_2 = ?) AND geometry IS NOT NULL',
+                (par_id, par_id))
+            if self.update_geometry('PAR', par_id, list_vertices):
+                count += 1
+
+        return count
+
+    def refresh_bud(self, buildings):
+        """Rebuild the boundaries of specified buildings from SBP
+
+        :param list buildings: list of building ids
+        :return: number of updated buildings
+        """
+        count = 0
+        for bud_id in buildings:
+            list_vertices = self.get_vertices(
+                'SELECT sbp.geometry FROM ob JOIN sbp ON sbp.ob_id = ob.id '
+                'WHERE ob.bud_id = ? AND ob.typppd_kod = 21700 AND sbp.poradove_cislo_bodu = 1 '
+                'AND sbp.geometry IS NOT NULL',
+                (bud_id,))
+            if self.update_geometry('BUD', bud_id, list_vertices):
+                count += 1
+
+        return count
+
+    def refresh_changes(self, table):
+        """Rebuild the boundaries of parcels and buildings listed in the table of changes
+
+        :param str table: name of the table with columns layer and id
+        :return: numbers of updated parcels and buildings
+        """
+        parcels = self.executeSQL("SELECT id FROM {} WHERE layer = 'PAR'".format(table))
+        buildings = self.executeSQL("SELECT id FROM {} WHERE layer = 'BUD'".format(table))
+
+        counts = (self.refresh_par(parcels), self.refresh_bud(buildings))
+        self.db.commit()
+
+        return counts
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         sys.exit("{} soubor.vfk".format(sys.argv[0]))
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import csv
+import json
+import time
+from collections import deque
+
+
+class QueryLog(object):
+    """
+    Ring buffer of evaluated queries, the oldest entries are dropped when it is full.
+    """
+
+    # order of entry keys in exports
+    FIELDS = ['time', 'connection', 'query', 'values', 'rows', 'elapsed', 'error', 'plan']
+
+    def __init__(self, capacity=1000, slowQueryTime=500):
+        """
+
+        :param capacity: maximal number of entries, 0 disables the log
+        :type capacity: int
+        :param slowQueryTime: queries running at least this number of ms have their plan recorded
+        :type slowQueryTime: int
+        """
+        self.__mEntries = deque(maxlen=max(0, capacity))
+        self.__mSlowQueryTime = slowQueryTime
+
+    def capacity(self):
+        """
+
+        :return: int
+        """
+        return self.__mEntries.maxlen
+
+    def setCapacity(self, capacity):
+        """
+        Sets maximal number of entries, the newest entries are kept.
+
+        :type capacity: int
+        """
+        self.__mEntries = deque(self.__mEntries, maxlen=max(0, capacity))
+
+    def slowQueryTime(self):
+        """
+
+        :return: int
+        """
+        return self.__mSlowQueryTime
+
+    def setSlowQueryTime(self, slowQueryTime):
+        """
+
+        :param slowQueryTime: time in ms
+        :type slowQueryTime: int
+        """
+        self.__mSlowQueryTime = slowQueryTime
+
+    def isEnabled(self):
+        """
+
+        :return: bool
+        """
+        return self.__mEntries.maxlen > 0
+
+    def isSlow(self, elapsed):
+        """
+
+        :param elapsed: time in ms
+        :type elapsed: int
+        :return: bool
+        """
+        return elapsed >= self.__mSlowQueryTime
+
+    def record(self, connection, query, values, rows, elapsed, error=u'', plan=None):
+        """
+
+        :type connection: str
+        :param query: query template
+        :type query: str
+        :param values: values bound to the query
+        :type values: list
+        :param rows: number of read rows
+        :type rows: int
+        :param elapsed: time in ms
+        :type elapsed: int
+        :type error: str
+        :param plan: lines of EXPLAIN QUERY PLAN output
+        :type plan: list
+        """
+        if not self.isEnabled():
+            return
+
+        self.__mEntries.append({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'connection': unicode(connection),
+            'query': unicode(query),
+            'values': [unicode(value) for value in values or []],
+            'rows': rows,
+            'elapsed': elapsed,
+            'error': unicode(error),
+            'plan': list(plan) if plan is not None else []
+        })
+
+    def entries(self):
+        """
+
+        :return: entries from the oldest one
+        """
+        return list(self.__mEntries)
+
+    def slowEntries(self):
+        """
+
+        :return: entries of slow queries from the oldest one
+        """
+        return [entry for entry in self.__mEntries if self.isSlow(entry['elapsed'])]
+
+    def clear(self):
+        self.__mEntries.clear()
+
+    def exportCsv(self, fileName):
+        """
+        Values and plan lines are joined by newlines.
+
+        :type fileName: str
+        """
+        with open(fileName, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.FIELDS)
+            for entry in self.__mEntries:
+                row = []
+                for field in self.FIELDS:
+                    value = entry[field]
+                    if isinstance(value, list):
+                        value = u'\n'.join(value)
+                    row.append(unicode(value).encode('utf-8'))
+                writer.writerow(row)
+
+    def exportJson(self, fileName):
+        """
+
+        :type fileName: str
+        """
+        with open(fileName, 'w') as f:
+            json.dump(self.entries(), f, indent=2)
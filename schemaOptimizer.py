@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import sqlite3
+import logging
+import unicodedata
+
+from applyChanges import SchemaCatalog
+
+logger = logging.getLogger(__name__)
+
+# version of the optimization, increase it whenever SCHEMA_INDEXES or search tables are changed
+SCHEMA_VERSION = 6
+
+# table of the database with key-value metadata of the optimization
+SCHEMA_META_TABLE = 'vfk_schema_meta'
+
+# tables whose data are copied to search tables, search tables are rebuilt when they are changed
+SEARCH_SOURCE_TABLES = ['OPSUB', 'PAR', 'TEL', 'DRUPOZ']
+
+# full-text index of names of owners
+OPSUB_FTS_TABLE = 'opsub_fts'
+OPSUB_FTS_COLUMNS = ['JMENO', 'PRIJMENI', 'NAZEV']
+
+# tokenizers of full-text indexes, the first one supported by SQLite is used
+# (remove_diacritics 2 is available since SQLite 3.27)
+FTS_TOKENIZERS = ['unicode61 remove_diacritics 2', 'unicode61 remove_diacritics 1']
+
+# normalized names and address of owners, row is identified by rowid of OPSUB as opsub_rowid
+OPSUB_SEARCH_TABLE = 'opsub_search'
+OPSUB_SEARCH_COLUMNS = ['JMENO', 'PRIJMENI', 'NAZEV', 'NAZEV_ULICE', 'OBEC']
+
+# parcels with everything searched by parcel searches, one row per parcel
+PAR_SEARCH_TABLE = 'par_search'
+PAR_SEARCH_QUERY = 'SELECT par.id par_id, ' \
+                   'par.kmenove_cislo_par kmenove_cislo_par, ' \
+                   'par.poddeleni_cisla_par poddeleni_cisla_par, ' \
+                   'drupoz.kod drupoz_kod, ' \
+                   'drupoz.zkratka drupoz_zkratka, ' \
+                   'drupoz.stavebni_parcela stavebni_parcela, ' \
+                   'tel.cislo_tel cislo_tel, ' \
+                   'par.bud_id bud_id ' \
+                   'FROM main.par ' \
+                   'LEFT JOIN main.drupoz ON drupoz.kod = par.drupoz_kod ' \
+                   'LEFT JOIN main.tel ON tel.id = par.tel_id'
+PAR_SEARCH_SOURCES = [
+    ('PAR', ('ID', 'KMENOVE_CISLO_PAR', 'PODDELENI_CISLA_PAR', 'DRUPOZ_KOD', 'TEL_ID', 'BUD_ID')),
+    ('DRUPOZ', ('KOD', 'ZKRATKA', 'STAVEBNI_PARCELA')),
+    ('TEL', ('ID', 'CISLO_TEL'))
+]
+PAR_SEARCH_INDEXES = [
+    ('kmenove_cislo_par', 'poddeleni_cisla_par', 'stavebni_parcela', 'drupoz_zkratka'),
+    ('drupoz_zkratka', 'stavebni_parcela'),
+    ('cislo_tel',)
+]
+
+# (table, columns) of indexes used by lookups and searches of VfkTableModel
+SCHEMA_INDEXES = [
+    ('TEL', ('ID',)),
+    ('TEL', ('CISLO_TEL',)),
+    ('PAR', ('ID',)),
+    ('PAR', ('TEL_ID',)),
+    ('PAR', ('BUD_ID',)),
+    ('PAR', ('KMENOVE_CISLO_PAR', 'PODDELENI_CISLA_PAR')),
+    ('BUD', ('ID',)),
+    ('BUD', ('TEL_ID',)),
+    ('BUD', ('CISLO_DOMOVNI',)),
+    ('JED', ('ID',)),
+    ('JED', ('BUD_ID',)),
+    ('JED', ('TEL_ID',)),
+    ('JED', ('CISLO_JEDNOTKY',)),
+    ('OPSUB', ('ID',)),
+    ('OPSUB', ('RODNE_CISLO',)),
+    ('OPSUB', ('ICO',)),
+    # both directions of the owner relation are covered, so the table itself is not read
+    ('VLA', ('TEL_ID', 'OPSUB_ID')),
+    ('VLA', ('OPSUB_ID', 'TEL_ID')),
+    ('JPV', ('ID',)),
+    ('JPV', ('PAR_ID_K',)),
+    ('JPV', ('PAR_ID_PRO',)),
+    ('JPV', ('BUD_ID_K',)),
+    ('JPV', ('BUD_ID_PRO',)),
+    ('JPV', ('JED_ID_K',)),
+    ('JPV', ('JED_ID_PRO',)),
+    ('JPV', ('OPSUB_ID_K',)),
+    ('JPV', ('OPSUB_ID_PRO',)),
+    ('LISTIN', ('ID',)),
+    ('RL', ('JPV_ID',)),
+    ('RL', ('LISTIN_ID',)),
+    ('RL', ('PAR_ID',)),
+    ('RL', ('BUD_ID',)),
+    ('RL', ('JED_ID',)),
+    ('LDU', ('LISTIN_ID',)),
+    ('RZO', ('PAR_ID', 'ZPOCHR_KOD')),
+    ('RZO', ('BUD_ID', 'ZPOCHR_KOD')),
+    ('RZO', ('JED_ID', 'ZPOCHR_KOD')),
+    ('BDP', ('PAR_ID',)),
+    ('OBDEBO', ('PAR_ID',)),
+    ('OBDEBO', ('BUD_ID',)),
+    ('OBDEBO', ('JED_ID',)),
+    ('HP', ('PAR_ID_1',)),
+    ('HP', ('PAR_ID_2',)),
+    ('OB', ('BUD_ID',)),
+    ('SBP', ('HP_ID',)),
+    ('SBP', ('OB_ID',))
+]
+
+
+def normalizeSearchText(value):
+    """
+    Convert text to the form stored in search tables, i.e. lower case without diacritics.
+    :param value: Text
+    :type value: str
+    :return: Normalized text, None for None
+    :rtype: str
+    """
+    if value is None:
+        return None
+
+    value = unicodedata.normalize('NFKD', unicode(value))
+    return u''.join(c for c in value if not unicodedata.combining(c)).lower()
+
+
+class SchemaOptimizer(object):
+    """
+    Indexes the database created by GDAL for queries of the plugin, builds search tables and
+    collects statistics for the query planner. Version of the optimization and a stamp of the
+    searched data are recorded in the database, so the same database is optimized only once.
+    """
+
+    def __init__(self, dbname):
+        """
+        :param dbname: Path to the VFK database
+        :type dbname: str
+        """
+        self.__dbname = dbname
+
+    def run(self):
+        """
+        Optimizes the database if it is not optimized by the current version yet or if the
+        searched data were changed since the last optimization, e.g. by applying changes.
+        :return: True if the database was optimized, False if it was up to date
+        :rtype: bool
+        """
+        conn = sqlite3.connect(self.__dbname, isolation_level=None)
+        try:
+            cur = conn.cursor()
+            catalog = SchemaCatalog(cur, ('main',))
+            try:
+                version = int(self.__metaValue(cur, 'schema_version') or 0)
+            except ValueError:
+                version = 0
+            stamp = self.__dataStamp(cur, catalog)
+
+            if version >= SCHEMA_VERSION and self.__metaValue(cur, 'data_stamp') == stamp:
+                logger.debug('(VFK) Schema of {} is up to date'.format(self.__dbname))
+                return False
+
+            cur.execute('BEGIN')
+            try:
+                created = self.__createIndexes(cur, catalog)
+                self.__buildSearchTables(cur, catalog)
+                cur.execute('ANALYZE main')
+                cur.execute('CREATE TABLE IF NOT EXISTS main.{} (key TEXT PRIMARY KEY, value TEXT)'.format(
+                    SCHEMA_META_TABLE))
+                cur.executemany('INSERT OR REPLACE INTO main.{} (key, value) VALUES (?, ?)'.format(SCHEMA_META_TABLE),
+                                [('schema_version', str(SCHEMA_VERSION)), ('data_stamp', stamp)])
+                cur.execute('COMMIT')
+            except sqlite3.Error:
+                cur.execute('ROLLBACK')
+                raise
+
+            logger.debug('(VFK) Schema of {} optimized, {} indexes created'.format(self.__dbname, created))
+            return True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def __metaValue(cursor, key):
+        """
+        :type cursor: sqlite3.Cursor
+        :type key: str
+        :return: Recorded value of the key, None if it is not recorded
+        :rtype: str
+        """
+        cursor.execute('SELECT 1 FROM main.sqlite_master WHERE type = \'table\' AND name = ?', (SCHEMA_META_TABLE,))
+        if cursor.fetchone() is None:
+            return None
+
+        cursor.execute('SELECT value FROM main.{} WHERE key = ?'.format(SCHEMA_META_TABLE), (key,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def __dataStamp(cursor, catalog):
+        """
+        Stamp of data of SEARCH_SOURCE_TABLES. Changes are applied by deleting rows and inserting
+        them with new ogr_fid, so any change alters number of rows or the maximal rowid.
+        :type cursor: sqlite3.Cursor
+        :type catalog: SchemaCatalog
+        :rtype: str
+        """
+        parts = []
+        for table in SEARCH_SOURCE_TABLES:
+            if not catalog.columns(table):
+                continue
+            cursor.execute('SELECT count(*), max(rowid) FROM main.{}'.format(table))
+            parts.append('{}:{}:{}'.format(table, *cursor.fetchone()))
+
+        return ';'.join(parts)
+
+    @staticmethod
+    def __indexedColumns(cursor):
+        """
+        :type cursor: sqlite3.Cursor
+        :return: Columns of existing indexes in lower case, {table: [(column, ...), ...]}
+        :rtype: dict
+        """
+        indexes = {}
+        cursor.execute('SELECT name, tbl_name FROM main.sqlite_master WHERE type = \'index\'')
+        for name, table in cursor.fetchall():
+            cursor.execute('PRAGMA main.index_info(\'{}\')'.format(name))
+            columns = tuple(str(row[2]).lower() for row in sorted(cursor.fetchall()))
+            indexes.setdefault(str(table).lower(), []).append(columns)
+
+        return indexes
+
+    def __createIndexes(self, cursor, catalog):
+        """
+        Creates indexes of SCHEMA_INDEXES whose table and columns exist and which are not
+        covered by an existing index yet.
+        :type cursor: sqlite3.Cursor
+        :type catalog: SchemaCatalog
+        :return: Number of created indexes
+        :rtype: int
+        """
+        indexes = self.__indexedColumns(cursor)
+        created = 0
+
+        for table, columns in SCHEMA_INDEXES:
+            if not all(catalog.hasColumn(table, column) for column in columns):
+                continue
+
+            key = tuple(column.lower() for column in columns)
+            if any(existing[:len(key)] == key for existing in indexes.get(table.lower(), [])):
+                continue
+
+            name = 'vfk_{}_{}'.format(table, '_'.join(columns)).lower()
+            cursor.execute('CREATE INDEX IF NOT EXISTS main.{} ON {} ({})'.format(name, table, ', '.join(columns)))
+            indexes.setdefault(table.lower(), []).append(key)
+            created += 1
+
+        return created
+
+    def __buildSearchTables(self, cursor, catalog):
+        """
+        Builds search tables from current data of SEARCH_SOURCE_TABLES.
+        :type cursor: sqlite3.Cursor
+        :type catalog: SchemaCatalog
+        """
+        self.__buildOpsubFts(cursor, catalog)
+        self.__buildOpsubSearch(cursor, catalog)
+        self.__buildParSearch(cursor, catalog)
+
+    @staticmethod
+    def __buildOpsubFts(cursor, catalog):
+        """
+        Builds full-text index of names of owners, case and diacritics are ignored by its
+        tokenizer. The index is external content of OPSUB table, so its rowid is rowid of OPSUB.
+        Nothing is built if SQLite is compiled without FTS5.
+        :type cursor: sqlite3.Cursor
+        :type catalog: SchemaCatalog
+        :return: True if the index was built
+        :rtype: bool
+        """
+        cursor.execute('DROP TABLE IF EXISTS main.{}'.format(OPSUB_FTS_TABLE))
+
+        if not all(catalog.hasColumn('OPSUB', column) for column in OPSUB_FTS_COLUMNS):
+            return False
+
+        for tokenizer in FTS_TOKENIZERS:
+            try:
+                cursor.execute('CREATE VIRTUAL TABLE main.{} USING fts5({}, content=\'opsub\', '
+                               'tokenize=\'{}\')'.format(OPSUB_FTS_TABLE, ', '.join(OPSUB_FTS_COLUMNS).lower(),
+                                                          tokenizer))
+                break
+            except sqlite3.OperationalError as e:
+                logger.debug('(VFK) Tokenizer {} is not available: {}'.format(tokenizer, e))
+        else:
+            logger.warning('(VFK) Full-text index of owners is not built, FTS5 is not available')
+            return False
+
+        cursor.execute('INSERT INTO main.{0} ({0}) VALUES (\'rebuild\')'.format(OPSUB_FTS_TABLE))
+        return True
+
+    @staticmethod
+    def __buildOpsubSearch(cursor, catalog):
+        """
+        Builds table of normalized names and address of owners with index on each column.
+        Values starting with a text are looked up as a range of the index, see
+        VfkTableModel.__prefixWhere.
+        :type cursor: sqlite3.Cursor
+        :type catalog: SchemaCatalog
+        :return: True if the table was built
+        :rtype: bool
+        """
+        cursor.execute('DROP TABLE IF EXISTS main.{}'.format(OPSUB_SEARCH_TABLE))
+
+        columns = [column for column in OPSUB_SEARCH_COLUMNS if catalog.hasColumn('OPSUB', column)]
+        if not columns:
+            return False
+
+        cursor.execute('CREATE TABLE main.{} (opsub_rowid INTEGER PRIMARY KEY, {})'.format(
+            OPSUB_SEARCH_TABLE, ', '.join('{} TEXT COLLATE NOCASE'.format(column) for column in columns)))
+
+        cursor.execute('SELECT rowid, {} FROM main.opsub'.format(', '.join(columns)))
+        rows = [(row[0],) + tuple(normalizeSearchText(value) for value in row[1:]) for row in cursor.fetchall()]
+        cursor.executemany('INSERT INTO main.{} VALUES (?, {})'.format(
+            OPSUB_SEARCH_TABLE, ', '.join('?' * len(columns))), rows)
+
+        for column in columns:
+            cursor.execute('CREATE INDEX main.{0}_{1} ON {0} ({1})'.format(OPSUB_SEARCH_TABLE, column.lower()))
+
+        return True
+
+    @staticmethod
+    def __buildParSearch(cursor, catalog):
+        """
+        Builds denormalized table of parcels for parcel searches. Columns keep affinity of the
+        source columns, so the table is compared with bound values the same way as the sources.
+        :type cursor: sqlite3.Cursor
+        :type catalog: SchemaCatalog
+        :return: True if the table was built
+        :rtype: bool
+        """
+        cursor.execute('DROP TABLE IF EXISTS main.{}'.format(PAR_SEARCH_TABLE))
+
+        for table, columns in PAR_SEARCH_SOURCES:
+            if not all(catalog.hasColumn(table, column) for column in columns):
+                return False
+
+        cursor.execute('CREATE TABLE main.{} AS {}'.format(PAR_SEARCH_TABLE, PAR_SEARCH_QUERY))
+        for columns in PAR_SEARCH_INDEXES:
+            cursor.execute('CREATE INDEX main.{0}_{1} ON {0} ({2})'.format(
+                PAR_SEARCH_TABLE, columns[0], ', '.join(columns)))
+
+        return True
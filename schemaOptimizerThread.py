@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from PyQt4.QtCore import QThread, pyqtSignal, qDebug
+
+from schemaOptimizer import SchemaOptimizer
+
+
+class SchemaOptimizerThread(QThread):
+    # signals
+    optimizationFinished = pyqtSignal(bool)
+
+    def __init__(self, dbname):
+        """
+        Class for optimizing imported database outside of the GUI thread
+        :param dbname: file name of the database
+        :type dbname: str
+        :return:
+        """
+        QThread.__init__(self)
+
+        self.dbname = dbname
+
+    def __del__(self):
+        self.wait()
+
+    def run(self):
+        ok = True
+        try:
+            SchemaOptimizer(self.dbname).run()
+        except Exception as e:
+            # database without optimization is still usable, just slower
+            qDebug("\n(VFK) Schema optimization failed: {}".format(e))
+            ok = False
+
+        self.optimizationFinished.emit(ok)
@@ -21,10 +21,15 @@
  ***************************************************************************/
 """
 
-from PyQt4.QtCore import QObject, QUrl, QRegExp, QModelIndex, SIGNAL, SLOT, Qt, pyqtSignal, qDebug
+from collections import OrderedDict
+
+from PyQt4.QtCore import QObject, QUrl, QRegExp, QModelIndex, QTimer, SIGNAL, SLOT, Qt, pyqtSignal, qDebug
 from PyQt4.QtGui import QStandardItemModel, QStackedWidget, QStandardItem, QApplication
+from PyQt4.QtSql import QSqlDatabase
 
 from vfkTableModel import *
+from codeLists import CodeLists
+from searchThread import SearchThread
 
 
 class SearchFormController(QObject):
@@ -48,6 +53,17 @@ class SearchFormController(QObject):
 
     # signals
     actionTriggered = pyqtSignal(QUrl)
+    searchResultFound = pyqtSignal(QUrl, list, bool)
+    searchFailed = pyqtSignal(QUrl, str)
+
+    # delay of search after the form is changed, ms
+    SEARCH_DELAY = 400
+
+    # number of cached search results
+    SEARCH_CACHE_SIZE = 20
+
+    # number of found items on one page of search results
+    SEARCH_PAGE_ROWS = 500
 
     def __init__(self, mainControls, searchForms, parent=None):
         """
@@ -69,6 +85,25 @@ class SearchFormController(QObject):
         self.__mZpusobVyuzitiBudovy = ''
         self.__mZpusobVyuzitiJednotek = ''
 
+        self.__mSearchThread = None     # running search
+        self.__mSearchThreads = []      # search threads not finished yet, including cancelled ones
+        self.__mSearchTask = QUrl()     # task of the running search
+        self.__mFoundIds = []           # ids found by the running search so far
+        self.__mFoundValues = []        # values of other columns of the found ids
+        self.__mSearchKey = None        # (search method, arguments) of the running search
+        self.__mSearchShown = False     # True if ids found so far by the running search are shown
+        self.__mSearchButtonText = self.__controls.searchButton.text()
+
+        # results of searches, (search method, arguments) -> (ids, values of other columns)
+        self.__mSearchCache = OrderedDict()
+
+        self.__mSearchTimer = QTimer(self)
+        self.__mSearchTimer.setSingleShot(True)
+        self.__mSearchTimer.setInterval(self.SEARCH_DELAY)
+        self.__mSearchTimer.timeout.connect(self.__searchAsYouType)
+        for form in (self.__forms.vlastnici, self.__forms.parcely, self.__forms.budovy, self.__forms.jednotky):
+            form.searchChanged.connect(self.__mSearchTimer.start)
+
         self.__controls.formCombobox.addItem(u"vlastníky", self.Form.Vlastnici)
         self.__controls.formCombobox.addItem(u"parcely", self.Form.Parcely)
         self.__controls.formCombobox.addItem(u"budovy", self.Form.Budovy)
@@ -79,7 +114,7 @@ class SearchFormController(QObject):
                 "activated(int)"), self.__controls.searchForms,
                      SLOT("setCurrentIndex(int)"))
         self.connect(self.__controls.searchButton,
-                     SIGNAL("clicked()"), self.search)
+                     SIGNAL("clicked()"), self.onSearchButtonClicked)
 
         self.__controls.searchForms.setCurrentIndex(0)
         self.__controls.searchButton.setEnabled(False)
@@ -89,74 +124,265 @@ class SearchFormController(QObject):
 
         :type connectionName: str
         """
+        self.cancelSearch()
+        self.__mSearchCache.clear()
         self.__mConnectionName = connectionName
         self.__initComboBoxModels()
         self.__controls.searchButton.setEnabled(True)
 
-    def search(self):
+    def isSearching(self):
         """
 
+        :return: bool
         """
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        QApplication.processEvents()
+        return self.__mSearchThread is not None
+
+    def onSearchButtonClicked(self):
+        if self.isSearching():
+            task = self.__mSearchTask
+            shown = self.__mSearchShown
+            self.cancelSearch()
+            if shown:
+                # page with ids found so far is not left as if the search was running
+                self.searchFailed.emit(task, u"Hledání bylo zrušeno.")
+        else:
+            self.search()
+
+    def search(self):
+        """
+        Search is evaluated outside of the GUI thread, running search is replaced by the new one.
+        Results of previous searches are reused.
+        """
+        self.__mSearchTimer.stop()
+        self.cancelSearch()
 
         if int(self.__controls.formCombobox.itemData(self.__controls.formCombobox.currentIndex())) == self.Form.Parcely:
-            self.__searchParcely()
+            search = self.__searchParcely()
         elif int(self.__controls.formCombobox.itemData(self.__controls.formCombobox.currentIndex())) == self.Form.Budovy:
-            self.__searchBudovy()
+            search = self.__searchBudovy()
         elif int(self.__controls.formCombobox.itemData(self.__controls.formCombobox.currentIndex())) == self.Form.Jednotky:
-            self.__searchJednotky()
+            search = self.__searchJednotky()
         elif int(self.__controls.formCombobox.itemData(self.__controls.formCombobox.currentIndex())) == self.Form.Vlastnici:
-            self.__searchVlastnici()
+            search = self.__searchVlastnici()
         else:
             qDebug("Neplatna hodnota v SearchComboBoxu!!!")
+            return
+
+        url, search, args, idColumn, columns = search
+        ids = self.__cachedIds(search, args)
+        if ids is not None:
+            self.searchResultFound.emit(url, ids, True)
+            return
+
+        self.__startSearch(url, search, args, idColumn, columns)
+
+    def __searchAsYouType(self):
+        if self.__mConnectionName and self.__controls.searchButton.isEnabled():
+            self.search()
+
+    def __cachedIds(self, search, args):
+        """
+
+        :type search: str
+        :type args: tuple
+        :return: ids found by the search, None if the search has to be evaluated
+        """
+        key = (search, args)
+        result = self.__mSearchCache.pop(key, None)
+        if result is None:
+            result = self.__narrowedResult(search, args)
+            if result is None:
+                return None
+
+        self.__cacheResult(key, result)
+        return result[0]
+
+    def __narrowedResult(self, search, args):
+        """
+        Owners found by name are narrowed from the cached result of the same search
+        by a prefix of the name, the search is not evaluated again.
+
+        :type search: str
+        :type args: tuple
+        :return: (ids, values of other columns), None if no cached result can be narrowed
+        """
+        if search != u"searchOpsub":
+            return None
+
+        jmeno = args[0]
+        for (cachedSearch, cachedArgs), (ids, values) in reversed(self.__mSearchCache.items()):
+            if cachedSearch != search or cachedArgs[1:] != args[1:] or not jmeno.startswith(cachedArgs[0]):
+                continue
+
+            model = VfkTableModel(self.__mConnectionName)
+            matches = model.opsubNameMatcher(jmeno, args[2], args[3], args[4])
+            if matches is None:
+                return None
+
+            rows = [i for i in xrange(len(ids)) if matches(values[i])]
+            if not rows:
+                # names containing the text are searched if no name starts with it
+                return None
+
+            return [ids[i] for i in rows], [values[i] for i in rows]
+
+        return None
+
+    def __cacheResult(self, key, result):
+        """
+        The least recently used results are dropped.
+
+        :type key: tuple
+        :type result: tuple
+        """
+        self.__mSearchCache[key] = result
+        while len(self.__mSearchCache) > self.SEARCH_CACHE_SIZE:
+            self.__mSearchCache.popitem(last=False)
+
+    def cancelSearch(self):
+        """
+        Running search is cancelled, its result is not shown.
+        """
+        if self.__mSearchThread is None:
+            return
+
+        self.__mSearchThread.cancel()
+        self.__mSearchThread = None
+        self.__mFoundIds = []
+        self.__mFoundValues = []
+        self.__mSearchShown = False
+        self.__controls.searchButton.setText(self.__mSearchButtonText)
+
+    def __startSearch(self, url, search, args, idColumn, columns):
+        """
+
+        :param url: task of the search page
+        :type url: QUrl
+        :param search: name of search method of VfkTableModel
+        :type search: str
+        :type args: tuple
+        :param idColumn: column with ids in result of the search
+        :type idColumn: str
+        :param columns: other columns cached with the ids
+        :type columns: list
+        """
+        dbName = QSqlDatabase.database(self.__mConnectionName).databaseName()
+        query, values = VfkTableModel(self.__mConnectionName).searchQuery(search, args)
+
+        thread = SearchThread(dbName, query, values, idColumn, columns)
+        thread.idsFound.connect(self.__onIdsFound)
+        thread.searchFinished.connect(self.__onSearchFinished)
+        thread.finished.connect(self.__onThreadFinished)
+
+        self.__mSearchThread = thread
+        self.__mSearchThreads.append(thread)
+        self.__mSearchTask = url
+        self.__mSearchKey = (search, args)
+        self.__mFoundIds = []
+        self.__mFoundValues = []
+        self.__mSearchShown = False
+        self.__controls.searchButton.setText(u"Zrušit hledání")
+
+        thread.start()
+
+    def __onIdsFound(self, ids, values):
+        """
+
+        :type ids: list
+        :param values: dicts of values of other columns of the ids
+        :type values: list
+        """
+        if self.sender() is not self.__mSearchThread:
+            return
+
+        self.__mFoundIds.extend(ids)
+        self.__mFoundValues.extend(values)
 
-        QApplication.restoreOverrideCursor()
+        if not self.__mSearchShown and len(self.__mFoundIds) >= SearchThread.IDS_PER_PART:
+            # the first page is shown while the rest of ids is searched
+            self.__mSearchShown = True
+            self.searchResultFound.emit(self.__mSearchTask, list(self.__mFoundIds), False)
+
+    def __onSearchFinished(self, ok):
+        """
+
+        :type ok: bool
+        """
+        thread = self.sender()
+        if thread is not self.__mSearchThread:
+            return
+
+        ids = self.__mFoundIds
+        values = self.__mFoundValues
+        self.__mSearchThread = None
+        self.__mFoundIds = []
+        self.__mFoundValues = []
+        self.__mSearchShown = False
+        self.__controls.searchButton.setText(self.__mSearchButtonText)
+
+        if ok:
+            self.__cacheResult(self.__mSearchKey, (ids, values))
+            self.searchResultFound.emit(self.__mSearchTask, ids, True)
+        else:
+            # the failed search is not evaluated again on the GUI thread
+            self.searchFailed.emit(self.__mSearchTask, u"Hledání se nezdařilo: {}".format(thread.error))
+
+    def __onThreadFinished(self):
+        thread = self.sender()
+        if thread in self.__mSearchThreads:
+            self.__mSearchThreads.remove(thread)
 
     def __searchVlastnici(self):
         """
 
+        :return: (task, search method, arguments, id column, other columns)
         """
         jmeno = self.__forms.vlastnici.jmeno()
         rcIco = self.__forms.vlastnici.rcIco()
         lv = self.__forms.vlastnici.lv()
+        adresa = self.__forms.vlastnici.adresa()
         sjm = self.__forms.vlastnici.isSjm()
         opo = self.__forms.vlastnici.isOpo()
         ofo = self.__forms.vlastnici.isOfo()
 
-        url = QUrl(u"showText?page=search&type=vlastnici&jmeno={}&rcIco={}&sjm={}&opo={}&ofo={}&lv={}"
-                   .format(jmeno, rcIco, 1 if sjm else 0, 1 if opo else 0, 1 if ofo else 0, lv))
-        self.actionTriggered.emit(url)
+        url = QUrl(u"showText?page=search&type=vlastnici&jmeno={}&rcIco={}&sjm={}&opo={}&ofo={}&lv={}&adresa={}"
+                   u"&offset=0&limit={}".format(jmeno, rcIco, 1 if sjm else 0, 1 if opo else 0, 1 if ofo else 0, lv,
+                                                adresa, self.SEARCH_PAGE_ROWS))
+        args = (jmeno, rcIco, u"1" if sjm else u"0", u"1" if opo else u"0", u"1" if ofo else u"0", lv, adresa)
+        return url, u"searchOpsub", args, u"opsub_id", VfkTableModel.OPSUB_NAME_COLUMNS
 
     def __searchParcely(self):
         """
 
+        :return: (task, search method, arguments, id column, other columns)
         """
         parcelniCislo = self.__forms.parcely.parcelniCislo()
         typ = int(self.__forms.parcely.typParcely())
         druh = self.__forms.parcely.druhPozemkuKod()
         lv = self.__forms.parcely.lv()
 
-        url = QUrl(u"showText?page=search&type=parcely&parcelniCislo={}&typ={}&druh={}&lv={}"
-                   .format(parcelniCislo, typ, druh, lv))
-        self.actionTriggered.emit(url)
+        url = QUrl(u"showText?page=search&type=parcely&parcelniCislo={}&typ={}&druh={}&lv={}&offset=0&limit={}"
+                   .format(parcelniCislo, typ, druh, lv, self.SEARCH_PAGE_ROWS))
+        return url, u"searchPar", (parcelniCislo, unicode(typ), druh, lv), u"par_id", []
 
     def __searchBudovy(self):
         """
 
+        :return: (task, search method, arguments, id column, other columns)
         """
         domovniCislo = self.__forms.budovy.domovniCislo()
         naParcele = self.__forms.budovy.naParcele()
         zpusobVyuziti = self.__forms.budovy.zpusobVyuzitiKod()
         lv = self.__forms.budovy.lv()
 
-        url = QUrl(u"showText?page=search&type=budovy&domovniCislo={}&naParcele={}&zpusobVyuziti={}&lv={}"
-                   .format(domovniCislo, naParcele, zpusobVyuziti, lv))
-        self.actionTriggered.emit(url)
+        url = QUrl(u"showText?page=search&type=budovy&domovniCislo={}&naParcele={}&zpusobVyuziti={}&lv={}&offset=0&limit={}"
+                   .format(domovniCislo, naParcele, zpusobVyuziti, lv, self.SEARCH_PAGE_ROWS))
+        return url, u"searchBud", (domovniCislo, naParcele, zpusobVyuziti, lv), u"bud_id", []
 
     def __searchJednotky(self):
         """
 
+        :return: (task, search method, arguments, id column, other columns)
         """
         cisloJednotky = self.__forms.jednotky.cisloJednotky()
         domovniCislo = self.__forms.jednotky.domovniCislo()
@@ -164,72 +390,59 @@ class SearchFormController(QObject):
         zpusobVyuziti = self.__forms.jednotky.zpusobVyuzitiKod()
         lv = self.__forms.jednotky.lv()
 
-        url = QUrl(u"showText?page=search&type=jednotky&cisloJednotky={}&domovniCislo={}&naParcele={}&zpusobVyuziti={}&lv={}"
-                   .format(cisloJednotky, domovniCislo, naParcele, zpusobVyuziti, lv))
-        self.actionTriggered.emit(url)
+        url = QUrl(u"showText?page=search&type=jednotky&cisloJednotky={}&domovniCislo={}&naParcele={}&zpusobVyuziti={}&lv={}&offset=0&limit={}"
+                   .format(cisloJednotky, domovniCislo, naParcele, zpusobVyuziti, lv, self.SEARCH_PAGE_ROWS))
+        args = (cisloJednotky, domovniCislo, naParcele, zpusobVyuziti, lv)
+        return url, u"searchJed", args, u"jed_id", []
 
     def __initComboBoxModels(self):
         """
-
+        Models of combo boxes are filled from code lists of the connection.
         """
-        self.__mDruhParcely = VfkTableModel(self.__mConnectionName, self)
-        self.__mDruhParcely.druhyPozemku(True, True)
-
-        self.__mDruhPozemkoveParcely = VfkTableModel(
-            self.__mConnectionName, self)
-        self.__mDruhPozemkoveParcely.druhyPozemku(True, False)
-
-        self.__mDruhStavebniParcely = VfkTableModel(
-            self.__mConnectionName, self)
-        self.__mDruhStavebniParcely.druhyPozemku(False, True)
-
-        self.__mZpusobVyuzitiBudovy = VfkTableModel(
-            self.__mConnectionName, self)
-        self.__mZpusobVyuzitiBudovy.zpusobVyuzitiBudov()
-
-        self.__mZpusobVyuzitiJednotek = VfkTableModel(
-            self.__mConnectionName, self)
-        self.__mZpusobVyuzitiJednotek.zpusobVyuzitiJednotek()
+        codeLists = CodeLists.forConnection(self.__mConnectionName)
+        druhyPozemku = codeLists.rows(u"drupoz")
 
         falseKodForDefaultDruh = ''
         text = u'libovolný'
         fakeRow = [falseKodForDefaultDruh, text]
 
-        self.__forms.parcely.setDruhPozemkuModel(
-            self.__addFirstRowToModel(self.__mDruhParcely, fakeRow))
+        self.__mDruhParcely = self.__codeListModel(
+            druhyPozemku, u"kod", u"zkratka", fakeRow)
+        self.__mDruhPozemkoveParcely = self.__codeListModel(
+            [row for row in druhyPozemku if row[u"stavebni_parcela"] == u'n'], u"kod", u"zkratka", fakeRow)
+        self.__mDruhStavebniParcely = self.__codeListModel(
+            [row for row in druhyPozemku if row[u"stavebni_parcela"] == u'a'], u"kod", u"zkratka")
+        self.__mZpusobVyuzitiBudovy = self.__codeListModel(
+            codeLists.rows(u"zpvybu"), u"kod", u"zkratka", fakeRow)
+        self.__mZpusobVyuzitiJednotek = self.__codeListModel(
+            codeLists.rows(u"zpvyje"), u"kod", u"zkratka", fakeRow)
+
+        self.__forms.parcely.setDruhPozemkuModel(self.__mDruhParcely)
         self.__forms.parcely.setDruhPozemkuPozemkovaModel(
-            self.__addFirstRowToModel(self.__mDruhPozemkoveParcely, fakeRow))
+            self.__mDruhPozemkoveParcely)
         self.__forms.parcely.setDruhPozemkuStavebniModel(
             self.__mDruhStavebniParcely)
-        self.__forms.budovy.setZpusobVyuzitiModel(
-            self.__addFirstRowToModel(self.__mZpusobVyuzitiBudovy, fakeRow))
+        self.__forms.budovy.setZpusobVyuzitiModel(self.__mZpusobVyuzitiBudovy)
         self.__forms.jednotky.setZpusobVyuzitiModel(
-            self.__addFirstRowToModel(self.__mZpusobVyuzitiJednotek, fakeRow))
+            self.__mZpusobVyuzitiJednotek)
 
-    def __addFirstRowToModel(self, oldModel, newRow):
+    def __codeListModel(self, rows, kodColumn, textColumn, firstRow=None):
         """
 
-        :type oldModel: QAbstractItemModel
-        :type newRow: list
+        :param rows: rows of a code list
+        :type rows: list
+        :type kodColumn: str
+        :type textColumn: str
+        :param firstRow: row inserted before rows of the code list
+        :type firstRow: list
         :return: QStandardItemModel
         """
         model = QStandardItemModel(self)
-        items = []
-
-        for str in newRow:
-            items.append(QStandardItem(str))
-
-        model.appendRow(items)
-
-        for i in xrange(oldModel.rowCount()):
-            items = []
 
-            for j in xrange(oldModel.columnCount()):
-                index = QModelIndex(oldModel.index(i, j))
-                data = oldModel.data(index)
-                item = QStandardItem(data)
-                items.append(item)
+        if firstRow:
+            model.appendRow([QStandardItem(value) for value in firstRow])
 
-            model.appendRow(items)
+        for row in rows:
+            model.appendRow([QStandardItem(row[kodColumn]), QStandardItem(row[textColumn])])
 
         return model
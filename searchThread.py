@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import sqlite3
+import time
+
+from PyQt4.QtCore import QThread, pyqtSignal, qDebug
+
+from vfkTableModel import VfkResult, VfkTableModel
+
+
+class SearchThread(QThread):
+    """
+    Runs search query outside of the GUI thread, found ids are emitted by parts.
+    """
+    # number of ids emitted at once
+    IDS_PER_PART = 500
+
+    # number of SQLite virtual machine instructions between checks of cancellation
+    PROGRESS_HANDLER_STEPS = 10000
+
+    # signals
+    idsFound = pyqtSignal(list, list)
+    searchFinished = pyqtSignal(bool)
+
+    def __init__(self, dbName, query, values, idColumn, columns=()):
+        """
+        Class for searching outside of the GUI thread, the search uses its own connection
+        to the database, because connections cannot be shared by threads.
+        :param dbName: file name of the database
+        :type dbName: str
+        :param query: search query, see VfkTableModel.searchQuery
+        :type query: str
+        :param values: values bound to the query
+        :type values: list
+        :param idColumn: column with ids in result of the search
+        :type idColumn: str
+        :param columns: other columns emitted with the ids
+        :type columns: list
+        :return:
+        """
+        QThread.__init__(self)
+
+        self.dbName = dbName
+        self.query = query
+        self.values = values
+        self.idColumn = idColumn
+        self.columns = list(columns)
+        self.cancelled = False
+        self.error = u''
+
+    def __del__(self):
+        self.wait()
+
+    def cancel(self):
+        """
+        Search is stopped as soon as possible, running statement is interrupted
+        and no more ids are emitted.
+        """
+        self.cancelled = True
+
+    def run(self):
+        ok = False
+        rows = 0
+        plan = None
+        start = time.time()
+        try:
+            conn = sqlite3.connect(self.dbName)
+            try:
+                # long statements are interrupted when cancellation is requested
+                conn.set_progress_handler(lambda: self.cancelled, self.PROGRESS_HANDLER_STEPS)
+                rows = self.__searchIds(conn.cursor())
+                ok = True
+
+                if VfkTableModel.queryLog().isSlow(int((time.time() - start) * 1000)):
+                    conn.set_progress_handler(None, 0)
+                    plan = self.__queryPlan(conn.cursor())
+            finally:
+                conn.close()
+        except Exception as e:
+            # the result has to be emitted, otherwise the search is never finished
+            if not self.cancelled:
+                self.error = unicode(e)
+                qDebug(u'(VFK) Search failed: {}'.format(e))
+
+        if not self.cancelled:
+            # the search does not use connections of VfkTableModel, so it is logged here
+            VfkTableModel.queryLog().record(self.dbName, self.query, self.values, rows,
+                                            int((time.time() - start) * 1000), self.error, plan)
+
+        self.searchFinished.emit(ok and not self.cancelled)
+
+    def __searchIds(self, cursor):
+        """
+        Ids are read by parts, so the search can be cancelled while the rows are read.
+        Each part of ids is emitted with dicts of values of the other columns.
+
+        :type cursor: sqlite3.Cursor
+        :return: number of read rows
+        """
+        count = 0
+        cursor.execute(self.query, self.values)
+        # first column of the name is used, as by VfkResult.fetch
+        columns = dict((column[0], i) for i, column in reversed(list(enumerate(cursor.description))))
+
+        while not self.cancelled:
+            result = VfkResult(columns, cursor.fetchmany(self.IDS_PER_PART))
+            if not result.rows:
+                break
+
+            count += result.rowCount()
+            rows = xrange(result.rowCount())
+            ids = [result.value(i, self.idColumn) for i in rows]
+            values = [dict((column, result.value(i, column)) for column in self.columns) for i in rows]
+            self.idsFound.emit(ids, values)
+
+        return count
+
+    def __queryPlan(self, cursor):
+        """
+
+        :type cursor: sqlite3.Cursor
+        :return: lines of EXPLAIN QUERY PLAN output
+        """
+        cursor.execute(u"EXPLAIN QUERY PLAN {}".format(self.query), self.values)
+        # detail is the last column in all SQLite versions
+        return [unicode(row[-1]) for row in cursor.fetchall()]
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import sqlite3
+import os
+import shutil
+import json
+import tempfile
+import unittest
+
+import applyChanges
+from applyChanges import ApplyChangesEngine, ApplyChangesListener, GEOMETRY_CHANGES_TABLE, vfkDateToIso
+
+# columns of generated amendment tables, ogr_fid is added as primary key
+COLUMNS = ['ID', 'STAV_DAT', 'DATUM_VZNIKU', 'PRIZNAK_KONTEXTU', 'CISLO_TEL']
+
+# rows of main table TEL, (ogr_fid, id, cislo_tel)
+MAIN_TEL = [(1, 1, 1001), (2, 2, 1002), (3, 3, 1003), (4, 4, 1004)]
+
+# rows of amendment table TEL, (id, stav_dat, datum_vzniku, priznak_kontextu, cislo_tel)
+AMENDMENT_TEL = [
+    # context of changes only, row of main table is kept
+    (1, 0, '01.01.2017 00:00:00', 1, 9001),
+    # changed, the newest current row wins
+    (2, 1, '01.01.2015 00:00:00', 3, 9002),
+    (2, 0, '02.01.2016 10:00:00', 3, 9102),
+    (2, 0, '31.12.2016 10:00:00', 3, 9202),
+    # deleted
+    (3, 0, '01.01.2017 00:00:00', 2, 9003),
+    # new
+    (5, 0, '01.01.2017 00:00:00', 3, 9005),
+    # context of changes missing in main table, it is inserted
+    (6, 0, '01.01.2017 00:00:00', 1, 9006)
+]
+
+
+class RecordingListener(ApplyChangesListener):
+    """
+    Records calls of listener methods.
+    """
+
+    def __init__(self, engine=None):
+        self.calls = []
+        self.__engine = engine
+
+    def setEngine(self, engine):
+        self.__engine = engine
+
+    def started(self, rows_total):
+        self.calls.append(('started', rows_total))
+        if self.__engine is not None:
+            self.__engine.cancel()
+
+    def progress(self, rows_applied, table):
+        self.calls.append(('progress', rows_applied, table))
+
+    def finished(self):
+        self.calls.append(('finished',))
+
+    def cancelled(self):
+        self.calls.append(('cancelled',))
+
+    def error(self, message):
+        self.calls.append(('error', message))
+
+
+def createDatabase(path, tel, par=()):
+    """
+    Creates database in layout of GDAL VFK driver with tables TEL and PAR.
+    :param tel: Rows of table TEL
+    :param par: Rows of table PAR
+    :type path: str
+    :type tel: list
+    :type par: list
+    """
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE vfk_tables (table_name TEXT, num_records INTEGER, num_features INTEGER)')
+    for table, rows in (('TEL', tel), ('PAR', par)):
+        conn.execute('CREATE TABLE {} (ogr_fid INTEGER PRIMARY KEY, {})'.format(table, ', '.join(COLUMNS)))
+        conn.executemany('INSERT INTO {} ({}) VALUES (?, ?, ?, ?, ?)'.format(table, ', '.join(COLUMNS)), rows)
+        conn.execute('INSERT INTO vfk_tables VALUES (?, ?, 0)', (table, len(rows)))
+    conn.commit()
+    conn.close()
+
+
+class TestApplyChangesEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.main = os.path.join(self.dir, 'main.db')
+        self.amendment = os.path.join(self.dir, 'amendment.db')
+        self.updated = os.path.join(self.dir, 'updated.db')
+
+        createDatabase(self.main, [(id, 0, '01.01.2010 00:00:00', None, cislo) for fid, id, cislo in MAIN_TEL],
+                       [(1, 0, '01.01.2010 00:00:00', None, None), (2, 0, '01.01.2010 00:00:00', None, None)])
+        createDatabase(self.amendment, AMENDMENT_TEL, [(2, 0, '01.01.2017 00:00:00', 3, None)])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def rows(self, query):
+        conn = sqlite3.connect(self.updated)
+        try:
+            return conn.execute(query).fetchall()
+        finally:
+            conn.close()
+
+    def test_run_classifies_ids(self):
+        self.assertTrue(ApplyChangesEngine().run(self.main, self.amendment, self.updated))
+
+        rows = self.rows('SELECT ID, CISLO_TEL FROM TEL ORDER BY ID')
+        self.assertEqual(rows, [(1, 1001), (2, 9202), (4, 1004), (5, 9005), (6, 9006)])
+
+    def test_run_allocates_fids_after_max_fid(self):
+        ApplyChangesEngine().run(self.main, self.amendment, self.updated)
+
+        # fids of kept rows are not changed, inserted rows follow in order of ids
+        rows = self.rows('SELECT ogr_fid, ID FROM TEL ORDER BY ogr_fid')
+        self.assertEqual(rows, [(1, 1), (4, 4), (5, 2), (6, 5), (7, 6)])
+
+    def test_run_reports_progress_per_chunk(self):
+        listener = RecordingListener()
+        chunk = applyChanges.IDS_PER_CHUNK
+        applyChanges.IDS_PER_CHUNK = 2
+        try:
+            self.assertTrue(ApplyChangesEngine(listener).run(self.main, self.amendment, self.updated))
+        finally:
+            applyChanges.IDS_PER_CHUNK = chunk
+
+        # ids 1, 2, 3, 5 and 6 of TEL are processed in three chunks, fids follow over chunks
+        progress = [call[1] for call in listener.calls if call[0] == 'progress' and call[2] == 'TEL']
+        self.assertEqual([b - a for a, b in zip(progress, progress[1:])], [2, 2, 1])
+        self.assertEqual(listener.calls[0], ('started', 6))
+        self.assertEqual(listener.calls[-2], ('progress', 6, listener.calls[-2][2]))
+        rows = self.rows('SELECT ogr_fid, ID FROM TEL ORDER BY ogr_fid')
+        self.assertEqual(rows, [(1, 1), (4, 4), (5, 2), (6, 5), (7, 6)])
+
+    def test_run_records_geometry_changes(self):
+        ApplyChangesEngine().run(self.main, self.amendment, self.updated)
+
+        rows = self.rows('SELECT layer, id FROM {}'.format(GEOMETRY_CHANGES_TABLE))
+        self.assertEqual(rows, [('PAR', 2)])
+
+    def test_run_keeps_main_database(self):
+        ApplyChangesEngine().run(self.main, self.amendment, self.updated)
+
+        conn = sqlite3.connect(self.main)
+        rows = conn.execute('SELECT ogr_fid, ID, CISLO_TEL FROM TEL ORDER BY ogr_fid').fetchall()
+        conn.close()
+        self.assertEqual(rows, MAIN_TEL)
+
+    def test_cancelled_run_removes_output(self):
+        listener = RecordingListener()
+        engine = ApplyChangesEngine(listener)
+        listener.setEngine(engine)
+
+        self.assertFalse(engine.run(self.main, self.amendment, self.updated))
+        self.assertFalse(os.path.exists(self.updated))
+        self.assertEqual(listener.calls[-1], ('cancelled',))
+
+    def test_dry_run_counts(self):
+        report_path = os.path.join(self.dir, 'report.json')
+        report = ApplyChangesEngine().dryRun(self.main, self.amendment, report_path)
+
+        tel = report['tables']['TEL']
+        self.assertEqual((tel['updated'], tel['inserted'], tel['deleted'], tel['unchanged']), (1, 2, 1, 1))
+        self.assertEqual(report['tables']['PAR']['updated'], 1)
+        self.assertEqual(report['total']['updated'], 2)
+
+        with open(report_path) as f:
+            self.assertEqual(json.load(f)['total'], report['total'])
+
+    def test_dry_run_does_not_modify_databases(self):
+        ApplyChangesEngine().dryRun(self.main, self.amendment)
+
+        conn = sqlite3.connect(self.amendment)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(TEL)')]
+        conn.close()
+        self.assertEqual(columns, ['ogr_fid'] + COLUMNS)
+        self.assertFalse(os.path.exists(self.updated))
+
+    def test_dry_run_of_missing_database(self):
+        with self.assertRaises(IOError):
+            ApplyChangesEngine().dryRun(os.path.join(self.dir, 'missing.db'), self.amendment)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            ApplyChangesEngine(profile='unknown')
+
+
+class TestVfkDateToIso(unittest.TestCase):
+
+    def test_conversion(self):
+        self.assertEqual(vfkDateToIso('02.01.2016 10:00:00'), '2016-01-02 10:00:00')
+        self.assertEqual(vfkDateToIso('2.1.2016'), '2016-01-02 00:00:00')
+
+    def test_invalid_date(self):
+        self.assertIsNone(vfkDateToIso('not a date'))
+        self.assertIsNone(vfkDateToIso(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
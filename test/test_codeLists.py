@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import sqlite3
+import os
+import shutil
+import tempfile
+import unittest
+
+from PyQt4.QtCore import QCoreApplication
+from PyQt4.QtSql import QSqlDatabase
+
+from codeLists import CodeLists
+
+# driver plugins of QtSql are loaded by the application
+APP = QCoreApplication.instance() or QCoreApplication([])
+
+CONNECTION_NAME = 'test_codeLists'
+
+# types of rights, (kod, nazev, sekce)
+TYPRAV = [
+    (u'20', u'Vlastnické právo', u'A'),
+    (u'50', u'Věcné břemeno', u'D'),
+    (u'90', u'Poznámka', None)
+]
+
+
+class TestCodeLists(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        dbname = os.path.join(self.dir, 'vfk.db')
+
+        conn = sqlite3.connect(dbname)
+        conn.execute('CREATE TABLE TYPRAV (ogr_fid INTEGER PRIMARY KEY, KOD TEXT, NAZEV TEXT, SEKCE TEXT)')
+        conn.executemany('INSERT INTO TYPRAV (KOD, NAZEV, SEKCE) VALUES (?, ?, ?)', TYPRAV)
+        conn.commit()
+        conn.close()
+
+        db = QSqlDatabase.addDatabase('QSQLITE', CONNECTION_NAME)
+        db.setDatabaseName(dbname)
+        db.open()
+
+    def tearDown(self):
+        CodeLists.clear(CONNECTION_NAME)
+        QSqlDatabase.database(CONNECTION_NAME).close()
+        QSqlDatabase.removeDatabase(CONNECTION_NAME)
+        shutil.rmtree(self.dir)
+
+    def test_rows_in_order_of_table(self):
+        rows = CodeLists.forConnection(CONNECTION_NAME).rows(u'typrav')
+        self.assertEqual([row[u'kod'] for row in rows], [u'20', u'50', u'90'])
+
+    def test_null_value_is_empty(self):
+        codeLists = CodeLists.forConnection(CONNECTION_NAME)
+        self.assertEqual(codeLists.value(u'typrav', u'90', u'sekce'), u'')
+        self.assertEqual([row[u'kod'] for row in codeLists.rows(u'typrav') if row.get(u'sekce')], [u'20', u'50'])
+
+    def test_missing_table_is_empty(self):
+        codeLists = CodeLists.forConnection(CONNECTION_NAME)
+        self.assertEqual(codeLists.rows(u'drupoz'), [])
+        self.assertEqual(codeLists.value(u'drupoz', u'2', u'nazev'), u'')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from queryLog import QueryLog
+
+
+class TestQueryLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_oldest_entries_are_dropped(self):
+        log = QueryLog(capacity=3)
+        for i in xrange(5):
+            log.record(u'conn', u'SELECT {}'.format(i), [], 0, 1)
+
+        self.assertEqual([entry['query'] for entry in log.entries()], [u'SELECT 2', u'SELECT 3', u'SELECT 4'])
+
+    def test_set_capacity_keeps_newest_entries(self):
+        log = QueryLog(capacity=5)
+        for i in xrange(5):
+            log.record(u'conn', u'SELECT {}'.format(i), [], 0, 1)
+
+        log.setCapacity(2)
+        self.assertEqual(log.capacity(), 2)
+        self.assertEqual([entry['query'] for entry in log.entries()], [u'SELECT 3', u'SELECT 4'])
+
+    def test_zero_capacity_disables_log(self):
+        log = QueryLog(capacity=0)
+        log.record(u'conn', u'SELECT 1', [], 0, 1)
+
+        self.assertFalse(log.isEnabled())
+        self.assertEqual(log.entries(), [])
+
+    def test_slow_entries(self):
+        log = QueryLog(slowQueryTime=100)
+        log.record(u'conn', u'SELECT 1', [], 1, 99)
+        log.record(u'conn', u'SELECT 2', [], 1, 100, plan=[u'SCAN par'])
+
+        self.assertEqual([entry['query'] for entry in log.slowEntries()], [u'SELECT 2'])
+        self.assertEqual(log.slowEntries()[0]['plan'], [u'SCAN par'])
+
+        log.setSlowQueryTime(50)
+        self.assertEqual(len(log.slowEntries()), 2)
+
+    def test_clear(self):
+        log = QueryLog()
+        log.record(u'conn', u'SELECT 1', [], 0, 1)
+        log.clear()
+
+        self.assertEqual(log.entries(), [])
+
+    def test_export_csv(self):
+        log = QueryLog()
+        log.record(u'conn', u'SELECT * FROM opsub WHERE prijmeni = ?', [u'Dvořák', 1], 2, 7,
+                   plan=[u'SEARCH opsub', u'USE TEMP B-TREE'])
+        fileName = os.path.join(self.dir, 'log.csv')
+        log.exportCsv(fileName)
+
+        with open(fileName, 'rb') as f:
+            rows = list(csv.reader(f))
+
+        self.assertEqual(rows[0], QueryLog.FIELDS)
+        row = dict(zip(rows[0], [value.decode('utf-8') for value in rows[1]]))
+        self.assertEqual(row['values'], u'Dvořák\n1')
+        self.assertEqual(row['plan'], u'SEARCH opsub\nUSE TEMP B-TREE')
+        self.assertEqual((row['rows'], row['elapsed']), (u'2', u'7'))
+
+    def test_export_json(self):
+        log = QueryLog()
+        log.record(u'conn', u'SELECT 1', [u'Dvořák'], 1, 3, error=u'chyba')
+        fileName = os.path.join(self.dir, 'log.json')
+        log.exportJson(fileName)
+
+        with open(fileName) as f:
+            entries = json.load(f)
+
+        self.assertEqual(entries, log.entries())
+        self.assertEqual(entries[0]['values'], [u'Dvořák'])
+        self.assertEqual(entries[0]['error'], u'chyba')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import sqlite3
+import os
+import shutil
+import tempfile
+import unittest
+
+from schemaOptimizer import SchemaOptimizer, OPSUB_SEARCH_TABLE, normalizeSearchText
+
+
+class TestNormalizeSearchText(unittest.TestCase):
+
+    def test_diacritics_and_case(self):
+        self.assertEqual(normalizeSearchText(u'Dvořák'), u'dvorak')
+        self.assertEqual(normalizeSearchText(u'ŽLUŤOUČKÝ KŮŇ'), u'zlutoucky kun')
+
+    def test_plain_text(self):
+        self.assertEqual(normalizeSearchText(u'novak 12'), u'novak 12')
+        self.assertEqual(normalizeSearchText(u''), u'')
+
+    def test_none(self):
+        self.assertIsNone(normalizeSearchText(None))
+
+    def test_non_text_value(self):
+        self.assertEqual(normalizeSearchText(105), u'105')
+
+
+class TestSchemaOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dbname = os.path.join(self.dir, 'vfk.db')
+
+        conn = sqlite3.connect(self.dbname)
+        conn.execute('CREATE TABLE OPSUB (ogr_fid INTEGER PRIMARY KEY, ID INTEGER, '
+                     'JMENO TEXT, PRIJMENI TEXT, NAZEV TEXT, RODNE_CISLO TEXT, ICO TEXT)')
+        conn.executemany('INSERT INTO OPSUB (ID, JMENO, PRIJMENI, NAZEV) VALUES (?, ?, ?, ?)',
+                         [(1, u'Jiří', u'Dvořák', None), (2, None, None, u'Obec Říčany')])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_search_table_is_normalized(self):
+        self.assertTrue(SchemaOptimizer(self.dbname).run())
+
+        conn = sqlite3.connect(self.dbname)
+        rows = conn.execute('SELECT jmeno, prijmeni, nazev FROM {} ORDER BY opsub_rowid'.format(
+            OPSUB_SEARCH_TABLE)).fetchall()
+        conn.close()
+        self.assertEqual(rows, [(u'jiri', u'dvorak', None), (None, None, u'obec ricany')])
+
+    def test_optimized_database_is_skipped(self):
+        self.assertTrue(SchemaOptimizer(self.dbname).run())
+        self.assertFalse(SchemaOptimizer(self.dbname).run())
+
+    def test_changed_data_are_optimized_again(self):
+        SchemaOptimizer(self.dbname).run()
+
+        conn = sqlite3.connect(self.dbname)
+        conn.execute('INSERT INTO OPSUB (ID, JMENO, PRIJMENI) VALUES (3, ?, ?)', (u'Jan', u'Novák'))
+        conn.commit()
+        conn.close()
+
+        self.assertTrue(SchemaOptimizer(self.dbname).run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ vfkPluginDialog
+                                 A QGIS plugin
+ Plugin umoznujici praci s daty katastru nemovitosti
+                             -------------------
+        begin                : 2015-06-11
+        git sha              : $Format:%H$
+        copyright            : (C) 2015 by Stepan Bambula
+        email                : stepan.bambula@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import sqlite3
+import os
+import shutil
+import tempfile
+import unittest
+
+from PyQt4.QtCore import QCoreApplication
+from PyQt4.QtSql import QSqlDatabase
+
+from schemaOptimizer import SchemaOptimizer
+from vfkTableModel import VfkTableModel
+
+# driver plugins of QtSql are loaded by the application
+APP = QCoreApplication.instance() or QCoreApplication([])
+
+CONNECTION_NAME = 'test_vfkTableModel'
+
+# owners, (id, opsub_type, jmeno, prijmeni, nazev, nazev_ulice, obec, cislo_tel)
+OWNERS = [
+    (1, 'OFO', u'Jan', u'Novák', None, u'Školní', u'Říčany', 1001),
+    (2, 'OFO', u'Petr', u'Janovský', None, u'Nádražní', u'Praha', 1002),
+    (3, 'OPO', None, None, u'Nová Ves', None, u'Nová Ves', 1002),
+    (4, 'OFO', u'Eva', u'Dvořáková', None, u'Školní', u'Brno', 1003),
+    (5, 'OFO', u'Karel', u'Malý', None, u'A@1', u'Kolín', 1004),
+    (6, 'OFO', u'Jana', u'Malá', None, u'A[1', u'Kolín', 1004)
+]
+
+
+class TestSearchOpsub(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        dbname = os.path.join(self.dir, 'vfk.db')
+
+        conn = sqlite3.connect(dbname)
+        conn.execute('CREATE TABLE OPSUB (ogr_fid INTEGER PRIMARY KEY, ID INTEGER, OPSUB_TYPE TEXT, '
+                     'JMENO TEXT, PRIJMENI TEXT, NAZEV TEXT, NAZEV_ULICE TEXT, OBEC TEXT, RODNE_CISLO TEXT, ICO TEXT)')
+        conn.execute('CREATE TABLE TEL (ogr_fid INTEGER PRIMARY KEY, ID INTEGER, CISLO_TEL INTEGER)')
+        conn.execute('CREATE TABLE VLA (ogr_fid INTEGER PRIMARY KEY, ID INTEGER, OPSUB_ID INTEGER, TEL_ID INTEGER)')
+        for id, opsubType, jmeno, prijmeni, nazev, ulice, obec, cisloTel in OWNERS:
+            conn.execute('INSERT INTO OPSUB (ID, OPSUB_TYPE, JMENO, PRIJMENI, NAZEV, NAZEV_ULICE, OBEC) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', (id, opsubType, jmeno, prijmeni, nazev, ulice, obec))
+            conn.execute('INSERT INTO TEL (ID, CISLO_TEL) VALUES (?, ?)', (id, cisloTel))
+            conn.execute('INSERT INTO VLA (ID, OPSUB_ID, TEL_ID) VALUES (?, ?, ?)', (id, id, id))
+        conn.commit()
+        conn.close()
+
+        SchemaOptimizer(dbname).run()
+
+        db = QSqlDatabase.addDatabase('QSQLITE', CONNECTION_NAME)
+        db.setDatabaseName(dbname)
+        db.open()
+        VfkTableModel.clearSearchTables(dbname)
+
+    def tearDown(self):
+        VfkTableModel.clearPreparedQueries(CONNECTION_NAME)
+        VfkTableModel.clearResultCache(CONNECTION_NAME)
+        QSqlDatabase.database(CONNECTION_NAME).close()
+        QSqlDatabase.removeDatabase(CONNECTION_NAME)
+        shutil.rmtree(self.dir)
+
+    def search(self, jmeno, identifikator=u'', sjm=u'1', opo=u'1', ofo=u'1', lv=u'', adresa=u''):
+        model = VfkTableModel(CONNECTION_NAME)
+        self.assertTrue(model.searchOpsub(jmeno, identifikator, sjm, opo, ofo, lv, adresa))
+        return sorted(int(model.value(i, u"opsub_id")) for i in xrange(model.rowCount()))
+
+    def test_names_starting_with_text(self):
+        self.assertEqual(self.search(u'nov'), [1, 3])
+        self.assertEqual(self.search(u'DVORAK'), [4])
+
+    def test_names_containing_text(self):
+        # no name starts with the text
+        self.assertEqual(self.search(u'ová'), [1, 3, 4])
+
+    def test_names_containing_text_on_lv(self):
+        # names of other owners start with the text, none of owners of the LV does
+        self.assertEqual(self.search(u'nov', ofo=u'1', opo=u'0', sjm=u'0', lv=u'1002'), [2])
+        self.assertEqual(self.search(u'nov', lv=u'1002'), [3])
+
+    def test_address(self):
+        self.assertEqual(self.search(u'', adresa=u'skol'), [1, 4])
+        self.assertEqual(self.search(u'', adresa=u'NOVÁ'), [3])
+        self.assertEqual(self.search(u'nov', adresa=u'říčany'), [1])
+
+    def test_address_before_upper_case_letters(self):
+        # 'A' follows '@', but it is folded to 'a' by NOCASE
+        self.assertEqual(self.search(u'', adresa=u'a@'), [5])
+
+    def test_names_containing_text_at_address(self):
+        self.assertEqual(self.search(u'nov', ofo=u'1', opo=u'0', sjm=u'0', adresa=u'praha'), [2])
+
+    def test_names_of_type(self):
+        self.assertEqual(self.search(u'nov', ofo=u'0'), [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
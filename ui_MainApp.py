@@ -229,6 +229,9 @@ class Ui_MainApp(object):
         self.pb_applyChanges = QtGui.QPushButton(self.widget_3)
         self.pb_applyChanges.setObjectName(_fromUtf8("pb_applyChanges"))
         self.horizontalLayout_5.addWidget(self.pb_applyChanges)
+        self.pb_cancelChanges = QtGui.QPushButton(self.widget_3)
+        self.pb_cancelChanges.setObjectName(_fromUtf8("pb_cancelChanges"))
+        self.horizontalLayout_5.addWidget(self.pb_cancelChanges)
         self.gridLayout_14.addLayout(self.horizontalLayout_5, 3, 0, 1, 1)
         self.gridLayout_16.addWidget(self.widget_3, 0, 0, 1, 1)
         self.scrollArea_6.setWidget(self.scrollAreaWidgetContents_6)
@@ -450,6 +453,7 @@ class Ui_MainApp(object):
         self.label_6.setText(_translate("MainApp", "Výstupní databáze:", None))
         self.pb_exportDb.setText(_translate("MainApp", "Procházet", None))
         self.pb_applyChanges.setText(_translate("MainApp", "Zpracovat změny", None))
+        self.pb_cancelChanges.setText(_translate("MainApp", "Zrušit", None))
         self.label_3.setText(_translate("MainApp", "Vyhledat:", None))
         self.searchButton.setText(_translate("MainApp", "Hledej", None))
         self.actionVyhledavani.setText(_translate("MainApp", "Vyhledávání", None))
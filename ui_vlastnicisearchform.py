@@ -29,7 +29,7 @@ class Ui_VlastniciSearchForm(object):
 
     def setupUi(self, VlastniciSearchForm):
         VlastniciSearchForm.setObjectName(_fromUtf8("VlastniciSearchForm"))
-        VlastniciSearchForm.resize(238, 208)
+        VlastniciSearchForm.resize(238, 234)
         self.gridLayout = QtGui.QGridLayout(VlastniciSearchForm)
         self.gridLayout.setObjectName(_fromUtf8("gridLayout"))
         self.label = QtGui.QLabel(VlastniciSearchForm)
@@ -82,7 +82,7 @@ class Ui_VlastniciSearchForm(object):
         self.gridLayout.addWidget(self.rcIcoLineEdit, 4, 1, 1, 1)
         spacerItem = QtGui.QSpacerItem(
             20, 40, QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Expanding)
-        self.gridLayout.addItem(spacerItem, 6, 1, 1, 1)
+        self.gridLayout.addItem(spacerItem, 7, 1, 1, 1)
         self.label_3 = QtGui.QLabel(VlastniciSearchForm)
         self.label_3.setObjectName(_fromUtf8("label_3"))
         self.gridLayout.addWidget(self.label_3, 5, 0, 1, 1)
@@ -90,6 +90,12 @@ class Ui_VlastniciSearchForm(object):
         self.lvVlastniciLineEdit.setObjectName(
             _fromUtf8("lvVlastniciLineEdit"))
         self.gridLayout.addWidget(self.lvVlastniciLineEdit, 5, 1, 1, 1)
+        self.label_5 = QtGui.QLabel(VlastniciSearchForm)
+        self.label_5.setObjectName(_fromUtf8("label_5"))
+        self.gridLayout.addWidget(self.label_5, 6, 0, 1, 1)
+        self.adresaLineEdit = QtGui.QLineEdit(VlastniciSearchForm)
+        self.adresaLineEdit.setObjectName(_fromUtf8("adresaLineEdit"))
+        self.gridLayout.addWidget(self.adresaLineEdit, 6, 1, 1, 1)
 
         self.retranslateUi(VlastniciSearchForm)
         QtCore.QMetaObject.connectSlotsByName(VlastniciSearchForm)
@@ -109,3 +115,5 @@ class Ui_VlastniciSearchForm(object):
         self.label_2.setText(
             _translate("VlastniciSearchForm", "RČ/IČO:", None))
         self.label_3.setText(_translate("VlastniciSearchForm", "LV:", None))
+        self.label_5.setText(
+            _translate("VlastniciSearchForm", "Adresa:", None))
@@ -21,8 +21,93 @@
  ***************************************************************************/
 """
 
-from PyQt4.QtSql import QSqlQueryModel, QSqlRecord, QSqlField, QSqlDatabase
-from PyQt4.QtCore import qDebug, QTime, QObject
+import re
+import threading
+from collections import OrderedDict
+
+from PyQt4.QtSql import QSqlQueryModel, QSqlRecord, QSqlField, QSqlDatabase, QSqlQuery
+from PyQt4.QtCore import qDebug, QTime, QObject, QModelIndex
+
+from queryLog import QueryLog
+from schemaOptimizer import OPSUB_FTS_TABLE, OPSUB_SEARCH_TABLE, PAR_SEARCH_TABLE, normalizeSearchText
+
+
+class VfkResult(object):
+    """
+    Rows of an evaluated query, cells are accessed by row index and column name or index.
+    """
+
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns=None, rows=None):
+        """
+
+        :param columns: column name -> column index
+        :type columns: dict
+        :param rows: tuples of values
+        :type rows: list
+        """
+        self.columns = columns if columns is not None else {}
+        self.rows = rows if rows is not None else []
+
+    @classmethod
+    def fetch(cls, sqlQuery, limit=0):
+        """
+        Reads rows of the executed query.
+
+        :type sqlQuery: QSqlQuery
+        :param limit: maximal number of read rows, 0 reads all rows
+        :type limit: int
+        :return: VfkResult
+        """
+        record = sqlQuery.record()
+        # first column of the name is used, as by QSqlRecord
+        result = cls(dict((record.fieldName(i), i) for i in reversed(xrange(record.count()))))
+        result.fetchRows(sqlQuery, limit)
+
+        return result
+
+    def fetchRows(self, sqlQuery, limit=0):
+        """
+        Appends next rows of the executed query.
+
+        :type sqlQuery: QSqlQuery
+        :param limit: maximal number of read rows, 0 reads all rows
+        :type limit: int
+        :return: True if the limit was reached, so the query may have more rows
+        """
+        count = sqlQuery.record().count()
+        fetched = 0
+        while (not limit or fetched < limit) and sqlQuery.next():
+            self.rows.append(tuple(sqlQuery.value(i) for i in xrange(count)))
+            fetched += 1
+
+        return bool(limit) and fetched == limit
+
+    def rowCount(self):
+        """
+
+        :return: int
+        """
+        return len(self.rows)
+
+    def value(self, row, column):
+        """
+
+        :type row: int
+        :param column: column name or index
+        :return: str
+        """
+        index = column if isinstance(column, int) else self.columns.get(column)
+        if index is None or not 0 <= row < len(self.rows):
+            return u''
+
+        value = unicode(self.rows[row][index])
+
+        if value == u"NULL" or value == u'None':
+            return u''
+        else:
+            return value
 
 
 class VfkTableModel(QSqlQueryModel):
@@ -42,6 +127,38 @@ class VfkTableModel(QSqlQueryModel):
         Opravneni = 0
         Povinnost = 1
 
+    # maximal number of prepared queries, each of them holds a statement of SQLite
+    PREPARED_QUERY_CACHE_SIZE = 200
+
+    # prepared queries shared by all models, (connection name, query) -> QSqlQuery
+    __preparedQueries = OrderedDict()
+
+    # default number of cached results of lookups
+    RESULT_CACHE_SIZE = 2000
+
+    # results of lookups shared by all models, (method, arguments, connection name) -> VfkResult
+    __resultCache = OrderedDict()
+    __resultCacheSize = RESULT_CACHE_SIZE
+
+    # maximal number of values bound to one query, SQLite limit in versions older than 3.32
+    MAX_BOUND_VALUES = 999
+
+    # lengths of IN lists of batch queries, chunks of ids are padded to one of them,
+    # so only a few distinct queries are prepared
+    BATCH_SIZES = [10, 100, MAX_BOUND_VALUES]
+
+    # queries evaluated by all models
+    __queryLog = QueryLog()
+
+    # (database file, table) -> True if the search table can be queried
+    __searchTables = {}
+
+    # guards the caches shared by all models, models may be used outside of the GUI thread
+    __cacheLock = threading.RLock()
+
+    # names of owners selected by searchOpsub, matched by opsubNameMatcher
+    OPSUB_NAME_COLUMNS = [u'opsub_jmeno', u'opsub_prijmeni', u'opsub_nazev']
+
     def __init__(self, connectionName='', parent=None):
         """
 
@@ -52,6 +169,16 @@ class VfkTableModel(QSqlQueryModel):
         QSqlQueryModel.__init__(self, parent)
 
         self.__mConnectionName = connectionName
+        # result of the last lookup, None if the query is held by the model (code lists)
+        self.__mResult = None
+        # row indexes of batch result grouped by id, id -> [row, ...]
+        self.__mGroups = {}
+        # number of rows read at once, 0 reads all rows of the lookup
+        self.__mPageSize = 0
+        # query with rows not read yet
+        self.__mPendingQuery = None
+        # (query, values) of lookups recorded instead of evaluated, None if lookups are evaluated
+        self.__mRecordedQueries = None
 
     def telesa(self):
         """
@@ -79,8 +206,8 @@ class VfkTableModel(QSqlQueryModel):
             "JOIN katuze ON tel.katuze_kod = katuze.kod " \
             "JOIN obce ON katuze.obce_kod = obce.kod " \
             "JOIN okresy ON obce.okresy_kod = okresy.kod " \
-            "WHERE tel.id = {};".format(id)
-        return self.__evaluate(query)
+            "WHERE tel.id = ?;"
+        return self.__evaluateCached('telesoHlavicka', (id,), query, [id])
 
     def telesoParcely(self, cisloTel, extended):
         """
@@ -95,8 +222,8 @@ class VfkTableModel(QSqlQueryModel):
                 "JOIN par ON par.tel_id = tel.id " \
                 "LEFT JOIN drupoz ON par.drupoz_kod = drupoz.kod " \
                 "LEFT JOIN zpvypo ON par.zpvypa_kod = zpvypo.kod " \
-                "WHERE tel.id = {};".format(columns, cisloTel)
-        return self.__evaluate(query)
+                "WHERE tel.id = ?;".format(columns)
+        return self.__evaluate(query, [cisloTel])
 
     def vlastnikParcely(self, opsubId, extended):
         """
@@ -113,8 +240,8 @@ class VfkTableModel(QSqlQueryModel):
                 "JOIN par ON par.tel_id = tel.id " \
                 "LEFT JOIN drupoz ON par.drupoz_kod = drupoz.kod " \
                 "LEFT JOIN zpvypo ON par.zpvypa_kod = zpvypo.kod " \
-                "WHERE opsub.id = {};".format(columns, opsubId)
-        return self.__evaluate(query)
+                "WHERE opsub.id = ?;".format(columns)
+        return self.__evaluate(query, [opsubId])
 
     def telesoBudovy(self, cisloTel, extended):
         """
@@ -127,13 +254,12 @@ class VfkTableModel(QSqlQueryModel):
         query = "SELECT {} " \
                 "FROM tel " \
                 "JOIN bud ON bud.tel_id = tel.id " \
-                "JOIN typbud ON typbud.kod = bud.typbud_kod " \
                 "JOIN par ON par.bud_id = bud.id " \
                 "LEFT JOIN zpvybu ON zpvybu.kod = bud.zpvybu_kod " \
                 "LEFT JOIN casobc ON casobc.kod = bud.caobce_kod " \
                 "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
-                "WHERE tel.id = {};".format(columns, cisloTel)
-        return self.__evaluate(query)
+                "WHERE tel.id = ?;".format(columns)
+        return self.__evaluate(query, [cisloTel])
 
     def vlastnikBudovy(self, opsubId, extended):
         """
@@ -148,13 +274,12 @@ class VfkTableModel(QSqlQueryModel):
                 "JOIN vla ON vla.tel_id = tel.id " \
                 "JOIN opsub ON vla.opsub_id = opsub.id " \
                 "JOIN bud ON bud.tel_id = tel.id " \
-                "JOIN typbud ON typbud.kod = bud.typbud_kod " \
                 "JOIN par ON par.bud_id = bud.id " \
                 "LEFT JOIN zpvybu ON zpvybu.kod = bud.zpvybu_kod " \
                 "LEFT JOIN casobc ON casobc.kod = bud.caobce_kod " \
                 "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
-                "WHERE opsub.id = {};".format(columns, opsubId)
-        return self.__evaluate(query)
+                "WHERE opsub.id = ?;".format(columns)
+        return self.__evaluate(query, [opsubId])
 
     def telesoJednotky(self, cisloTel, extended):
         """
@@ -172,9 +297,9 @@ class VfkTableModel(QSqlQueryModel):
                 "LEFT JOIN zpvyje ON zpvyje.kod = jed.zpvyje_kod " \
                 "JOIN par ON par.bud_id = bud.id " \
                 "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
-                "WHERE tel.id = {};".format(columns, cisloTel)
+                "WHERE tel.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [cisloTel])
 
     def vlastnikJednotky(self, opsubId, extended):
         """
@@ -194,9 +319,9 @@ class VfkTableModel(QSqlQueryModel):
             "LEFT JOIN zpvyje ON zpvyje.kod = jed.zpvyje_kod " \
             "JOIN par ON par.bud_id = bud.id " \
             "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
-            "WHERE opsub.id = {};".format(columns, opsubId)
+            "WHERE opsub.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [opsubId])
 
     def parcela(self, id, extended):
         """
@@ -215,10 +340,31 @@ class VfkTableModel(QSqlQueryModel):
                 "LEFT JOIN maplis ON par.maplis_kod = maplis.id " \
                 "JOIN katuze ON par.katuze_kod = katuze.kod " \
                 "LEFT JOIN bud ON par.bud_id = bud.id " \
-                "LEFT JOIN typbud ON bud.typbud_kod = typbud.kod " \
-                "WHERE par.id = {};".format(columns, id)
+                "WHERE par.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluateCached('parcela', (id, extended), query, [id])
+
+    def parcely(self, ids, extended):
+        """
+        Batch variant of parcela, rows of each id are returned by groupRows.
+
+        :type ids: list
+        :type extended: bool
+        :return: bool
+        """
+        columns = ", ".join(self.parColumns(extended))
+        query = "SELECT DISTINCT {}, par.id batch_id " \
+                "FROM par " \
+                "LEFT JOIN tel ON par.tel_id = tel.id " \
+                "LEFT JOIN zpurvy ON par.zpurvy_kod = zpurvy.kod " \
+                "LEFT JOIN drupoz ON par.drupoz_kod = drupoz.kod " \
+                "LEFT JOIN zpvypo ON par.zpvypa_kod = zpvypo.kod " \
+                "LEFT JOIN maplis ON par.maplis_kod = maplis.id " \
+                "JOIN katuze ON par.katuze_kod = katuze.kod " \
+                "LEFT JOIN bud ON par.bud_id = bud.id " \
+                "WHERE par.id IN ({{}});".format(columns)
+
+        return self.__evaluateBatch(query, ids)
 
     def budova(self, id, extended):
         """
@@ -230,16 +376,36 @@ class VfkTableModel(QSqlQueryModel):
         columns = ", ".join(self.budColumns(extended))
         query = "SELECT {} " \
                 "FROM bud " \
-                "JOIN typbud ON typbud.kod = bud.typbud_kod " \
                 "JOIN par ON par.bud_id = bud.id " \
                 "LEFT JOIN tel ON bud.tel_id = tel.id " \
                 "LEFT JOIN zpvybu ON zpvybu.kod = bud.zpvybu_kod " \
                 "LEFT JOIN casobc ON casobc.kod = bud.caobce_kod " \
                 "JOIN katuze ON par.katuze_kod = katuze.kod " \
                 "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
-                "WHERE bud.id = {};".format(columns, id)
+                "WHERE bud.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluateCached('budova', (id, extended), query, [id])
+
+    def budovy(self, ids, extended):
+        """
+        Batch variant of budova, rows of each id are returned by groupRows.
+
+        :type ids: list
+        :type extended: bool
+        :return: bool
+        """
+        columns = ", ".join(self.budColumns(extended))
+        query = "SELECT {}, bud.id batch_id " \
+                "FROM bud " \
+                "JOIN par ON par.bud_id = bud.id " \
+                "LEFT JOIN tel ON bud.tel_id = tel.id " \
+                "LEFT JOIN zpvybu ON zpvybu.kod = bud.zpvybu_kod " \
+                "LEFT JOIN casobc ON casobc.kod = bud.caobce_kod " \
+                "JOIN katuze ON par.katuze_kod = katuze.kod " \
+                "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
+                "WHERE bud.id IN ({{}});".format(columns)
+
+        return self.__evaluateBatch(query, ids)
 
     def jednotka(self, id, extended):
         """
@@ -254,14 +420,35 @@ class VfkTableModel(QSqlQueryModel):
                 "JOIN typjed ON typjed.kod = jed.typjed_kod " \
                 "LEFT JOIN zpvyje ON zpvyje.kod = jed.zpvyje_kod " \
                 "LEFT JOIN bud ON bud.id = jed.bud_id " \
-                "JOIN typbud ON typbud.kod = bud.typbud_kod " \
                 "JOIN par on par.bud_id = bud.id " \
                 "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
                 "JOIN katuze ON par.katuze_kod = katuze.kod " \
                 "JOIN tel ON tel.id = jed.tel_id " \
-                "WHERE jed.id = {};".format(columns, id)
+                "WHERE jed.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluateCached('jednotka', (id, extended), query, [id])
+
+    def jednotky(self, ids, extended):
+        """
+        Batch variant of jednotka, rows of each id are returned by groupRows.
+
+        :type ids: list
+        :type extended: bool
+        :return: bool
+        """
+        columns = ", ".join(self.jedColumns(extended))
+        query = "SELECT {}, jed.id batch_id " \
+                "FROM jed " \
+                "JOIN typjed ON typjed.kod = jed.typjed_kod " \
+                "LEFT JOIN zpvyje ON zpvyje.kod = jed.zpvyje_kod " \
+                "LEFT JOIN bud ON bud.id = jed.bud_id " \
+                "JOIN par on par.bud_id = bud.id " \
+                "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
+                "JOIN katuze ON par.katuze_kod = katuze.kod " \
+                "JOIN tel ON tel.id = jed.tel_id " \
+                "WHERE jed.id IN ({{}});".format(columns)
+
+        return self.__evaluateBatch(query, ids)
 
     def budovaJednotky(self, id):
         """
@@ -274,9 +461,9 @@ class VfkTableModel(QSqlQueryModel):
                 "bud.cislo_domovni bud_cislo_domovni " \
                 "FROM bud " \
                 "JOIN jed ON bud.id = jed.bud_id " \
-                "WHERE bud.id = {};".format(id)
+                "WHERE bud.id = ?;"
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id])
 
     def sousedniParcely(self, id):
         """
@@ -287,10 +474,10 @@ class VfkTableModel(QSqlQueryModel):
         query = "SELECT DISTINCT hp.par_id_1 hp_par_id_1, " \
                 "hp.par_id_2 hp_par_id_2 " \
                 "FROM hp " \
-                "WHERE hp.par_id_1 = {} " \
-                "OR hp.par_id_2 = {};".format(id, id)
+                "WHERE hp.par_id_1 = ? " \
+                "OR hp.par_id_2 = ?;"
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id, id])
 
     def opravnenySubjekt(self, id, extended):
         """
@@ -302,10 +489,24 @@ class VfkTableModel(QSqlQueryModel):
         columns = ", ".join(self.opsubColumns(extended))
         query = "SELECT {} " \
                 "FROM opsub " \
-                "JOIN charos ON charos.kod = opsub.charos_kod " \
-                "WHERE opsub.id = {};".format(columns, id)
+                "WHERE opsub.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluateCached('opravnenySubjekt', (id, extended), query, [id])
+
+    def opravneneSubjekty(self, ids, extended):
+        """
+        Batch variant of opravnenySubjekt, rows of each id are returned by groupRows.
+
+        :type ids: list
+        :type extended: bool
+        :return: bool
+        """
+        columns = ", ".join(self.opsubColumns(extended))
+        query = "SELECT {}, opsub.id batch_id " \
+                "FROM opsub " \
+                "WHERE opsub.id IN ({{}});".format(columns)
+
+        return self.__evaluateBatch(query, ids)
 
     def nemovitostTeleso(self, id, nemovitost):
         """
@@ -318,9 +519,9 @@ class VfkTableModel(QSqlQueryModel):
         query = "SELECT tel.id tel_id, tel.cislo_tel tel_cislo_tel " \
                 "FROM tel " \
                 "JOIN {} ON {}.tel_id = tel.id " \
-                "WHERE {}.id = {};".format(table, table, table, id)
+                "WHERE {}.id = ?;".format(table, table, table)
 
-        return self.__evaluate(query)
+        return self.__evaluateCached('nemovitostTeleso', (id, nemovitost), query, [id])
 
     def telesoVlastnici(self, id):
         """
@@ -338,25 +539,41 @@ class VfkTableModel(QSqlQueryModel):
                 "FROM vla " \
                 "JOIN tel ON vla.tel_id = tel.id " \
                 "JOIN typrav ON typrav.kod = vla.typrav_kod " \
-                "WHERE tel.id = {} ORDER BY typrav.sekce;".format(id)
+                "WHERE tel.id = ? ORDER BY typrav.sekce;"
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id])
 
     def nemovitostOchrana(self, id, nemovitost):
         """
+        Names of codes of zpusob ochrany are in CodeLists.
 
         :type id: str
         :type nemovitost: Nemovitost
         :return:
         """
         table = self.nemovitost2TableName(nemovitost)
-        query = "SELECT zpochn.nazev zpochn_nazev " \
-                "FROM zpochn " \
+        query = "SELECT rzo.zpochr_kod zpochn_kod " \
+                "FROM rzo " \
                 "JOIN {} ON rzo.{}_id = {}.id " \
-                "JOIN rzo ON rzo.zpochr_kod = zpochn.kod " \
-                "WHERE {}.id = {};".format(table, table, table, table, id)
+                "WHERE {}.id = ?;".format(table, table, table, table)
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id])
+
+    def nemovitostiOchrana(self, ids, nemovitost):
+        """
+        Batch variant of nemovitostOchrana, rows of each id are returned by groupRows.
+
+        :type ids: list
+        :type nemovitost: Nemovitost
+        :return: bool
+        """
+        table = self.nemovitost2TableName(nemovitost)
+        query = "SELECT rzo.zpochr_kod zpochn_kod, {}.id batch_id " \
+                "FROM rzo " \
+                "JOIN {} ON rzo.{}_id = {}.id " \
+                "WHERE {}.id IN ({{}});".format(table, table, table, table, table)
+
+        return self.__evaluateBatch(query, ids)
 
     def vlastnikNemovitosti(self, id):
         """
@@ -375,9 +592,9 @@ class VfkTableModel(QSqlQueryModel):
                 "LEFT JOIN par ON par.tel_id = tel.id " \
                 "LEFT JOIN bud ON bud.tel_id = tel.id " \
                 "LEFT JOIN jed ON jed.tel_id = tel.id " \
-                "WHERE opsub.id = {};".format(id)
+                "WHERE opsub.id = ?;"
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id])
 
     def parcelaBpej(self, id):
         """
@@ -390,9 +607,25 @@ class VfkTableModel(QSqlQueryModel):
                 "FROM bdp " \
                 "JOIN par ON bdp.par_id = par.id " \
                 "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
-                "WHERE par.id = {};".format(columns, id)
+                "WHERE par.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id])
+
+    def parcelyBpej(self, ids):
+        """
+        Batch variant of parcelaBpej, rows of each id are returned by groupRows.
+
+        :type ids: list
+        :return: bool
+        """
+        columns = ", ".join(self.bpejColumns())
+        query = "SELECT {}, par.id batch_id " \
+                "FROM bdp " \
+                "JOIN par ON bdp.par_id = par.id " \
+                "LEFT JOIN drupoz ON drupoz.kod = par.drupoz_kod " \
+                "WHERE par.id IN ({{}});".format(columns)
+
+        return self.__evaluateBatch(query, ids)
 
     def nemovitostJpv(self, id, op, pravo, where):
         """
@@ -409,11 +642,31 @@ class VfkTableModel(QSqlQueryModel):
         query = "SELECT {} " \
                 "FROM jpv " \
                 "JOIN {} ON {}.id = jpv.{}_id_{} " \
-                "JOIN typrav ON typrav.kod = jpv.typrav_kod " \
-                "WHERE {}.id = {}{};".format(columns, table, table, table, columnNameSuffix,
-                                             table, id, "" if not where else " AND {}".format(where))
+                "WHERE {}.id = ?{};".format(columns, table, table, table, columnNameSuffix,
+                                            table, "" if not where else " AND {}".format(where))
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id])
+
+    def nemovitostiJpv(self, ids, op, pravo, where):
+        """
+        Batch variant of nemovitostJpv, rows of each id are returned by groupRows.
+
+        :type ids: list
+        :type op: str
+        :type pravo: Pravo
+        :type where: str
+        :return: bool
+        """
+        table = self.opravnenyPovinny2TableName(op)
+        columnNameSuffix = self.pravo2ColumnSuffix(pravo)
+        columns = ", ".join(self.jpvColumns(False))
+        query = "SELECT {}, {}.id batch_id " \
+                "FROM jpv " \
+                "JOIN {} ON {}.id = jpv.{}_id_{} " \
+                "WHERE {}.id IN ({{}}){};".format(columns, table, table, table, table, columnNameSuffix,
+                                                 table, "" if not where else " AND {}".format(where))
+
+        return self.__evaluateBatch(query, ids)
 
     def jpvListiny(self, id):
         """
@@ -429,9 +682,9 @@ class VfkTableModel(QSqlQueryModel):
                 "JOIN ldu ON ldu.listin_id=listin.id " \
                 "join dul ON dul.kod = ldu.dul_kod " \
                 "JOIN typlis ON typlis.kod=listin.typlist_kod " \
-                "WHERE jpv.id = {};".format(columns, id)
+                "WHERE jpv.id = ?;".format(columns)
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, [id])
 
     def nabyvaciListiny(self, parIds, budIds, jedIds):
         """
@@ -469,9 +722,8 @@ class VfkTableModel(QSqlQueryModel):
         columns = ", ".join(self.opsubColumns(extended))
         query = "SELECT {} " \
                 "FROM opsub " \
-                "JOIN charos ON opsub.charos_kod = charos.kod " \
-                "WHERE opsub.id = {};".format(columns, id)
-        return self.__evaluate(query)
+                "WHERE opsub.id = ?;".format(columns)
+        return self.__evaluateCached('vlastnik', (id, extended), query, [id])
 
     def dveRadyCislovani(self):
         """
@@ -479,7 +731,7 @@ class VfkTableModel(QSqlQueryModel):
         :return: bool
         """
         query = "SELECT 1 FROM doci WHERE druh_cislovani_par = 1"
-        self.setQuery(query, QSqlDatabase.database(self.__mConnectionName))
+        self.__evaluate(query)
 
         if self.rowCount() > 0:
             return True
@@ -497,10 +749,10 @@ class VfkTableModel(QSqlQueryModel):
         query = "SELECT obdebo.souradnice_x obdebo_souradnice_x, " \
                 "obdebo.souradnice_y obdebo_souradnice_y " \
                 "FROM obdebo " \
-                "WHERE {}_id = {};".format(tableName, id)
-        return self.__evaluate(query)
+                "WHERE {}_id = ?;".format(tableName)
+        return self.__evaluate(query, [id])
 
-    def searchOpsub(self, jmeno, identifikator, sjm, opo, ofo, lv):
+    def searchOpsub(self, jmeno, identifikator, sjm, opo, ofo, lv, adresa=u''):
         """
 
         :type jmeno: str
@@ -509,26 +761,19 @@ class VfkTableModel(QSqlQueryModel):
         :type opo: bool
         :type ofo: bool
         :type lv: str
+        :param adresa: start of the street or municipality of the owner
+        :type adresa: str
         :return:
         """
-        whereJmeno = u''
-        join = u''
-
-        if jmeno:
-            if ofo:
-                whereJmeno += u"opsub.jmeno LIKE ('%{}%') OR opsub.prijmeni LIKE ('%{}%') OR ".format(
-                    jmeno, jmeno)
-            if sjm or opo:
-                whereJmeno += u"opsub.nazev LIKE ('%{}%') OR ".format(jmeno)
-            whereJmeno += u"0 "
-
         whereIdent = u''
+        identValues = []
         if identifikator:
             if ofo:
-                whereIdent += u"opsub.rodne_cislo = {} OR ".format(
-                    identifikator)
+                whereIdent += u"opsub.rodne_cislo = ? OR "
+                identValues.append(identifikator)
             if opo:
-                whereIdent += u"opsub.ico = {} OR ".format(identifikator)
+                whereIdent += u"opsub.ico = ? OR "
+                identValues.append(identifikator)
             whereIdent += u'0 '
 
         opsubType = []
@@ -538,23 +783,252 @@ class VfkTableModel(QSqlQueryModel):
             opsubType.append("'OPO'")
         if sjm == u'1':
             opsubType.append("'BSM'")
-        where = u"WHERE "
-        if whereJmeno:
-            where += u"({}) AND ".format(whereJmeno)
+
+        # conditions other than the name, they apply to owners matched by prefix too
+        join = u''
+        filters = u''
+        filterValues = []
         if whereIdent:
-            where += u"({}) AND ".format(whereIdent)
+            filters += u"({}) AND ".format(whereIdent)
+            filterValues += identValues
+
+        if adresa:
+            if self.__hasSearchTable(OPSUB_SEARCH_TABLE):
+                # case and diacritics are ignored
+                where, adresaValues = self.__prefixWhere(normalizeSearchText(adresa), [u"nazev_ulice", u"obec"])
+                filters += u"opsub.rowid IN (SELECT opsub_rowid FROM {} WHERE {}) AND ".format(
+                    OPSUB_SEARCH_TABLE, where)
+            else:
+                filters += u"(opsub.nazev_ulice LIKE (? || '%') OR opsub.obec LIKE (? || '%')) AND "
+                adresaValues = [adresa, adresa]
+            filterValues += adresaValues
 
         if lv:
-            where += u"tel.cislo_tel = {} AND ".format(lv)
+            filters += u"tel.cislo_tel = ? AND "
+            filterValues.append(lv)
             join += u"JOIN vla ON vla.opsub_id = opsub.id " \
                     u"JOIN tel ON vla.tel_id = tel.id "
 
-        where += u"opsub.opsub_type IN ({}) ".format(", ".join(opsubType))
-        query = u"SELECT DISTINCT opsub.id opsub_id " \
+        filters += u"opsub.opsub_type IN ({}) ".format(", ".join(opsubType))
+
+        whereJmeno = u''
+        values = []
+
+        if jmeno:
+            columns = []
+            if ofo:
+                columns += [u"jmeno", u"prijmeni"]
+            if sjm or opo:
+                columns.append(u"nazev")
+            match = self.__opsubFtsMatch(jmeno, columns)
+            prefix = None
+
+            if match and self.__hasSearchTable(OPSUB_FTS_TABLE):
+                # words of the name are matched as prefixes, case and diacritics are ignored
+                prefix = u"SELECT rowid FROM {0} WHERE {0} MATCH ?".format(OPSUB_FTS_TABLE)
+                prefixValues = [match]
+            elif columns and self.__hasSearchTable(OPSUB_SEARCH_TABLE):
+                # names are matched as prefixes, case and diacritics are ignored
+                where, prefixValues = self.__prefixWhere(normalizeSearchText(jmeno), columns)
+                prefix = u"SELECT opsub_rowid FROM {} WHERE {}".format(OPSUB_SEARCH_TABLE, where)
+
+            if prefix:
+                # names containing the text are searched only if no owner passing the other conditions
+                # has a name starting with it
+                substring, substringValues = self.__opsubSubstringQuery(jmeno, columns)
+                whereJmeno += u"opsub.rowid IN ({0}) OR opsub.rowid IN ({1}) AND NOT EXISTS (" \
+                              u"SELECT 1 FROM opsub {2}WHERE opsub.rowid IN ({0}) AND {3}) OR ".format(
+                                  prefix, substring, join, filters)
+                values += prefixValues + substringValues + prefixValues + filterValues
+            else:
+                if ofo:
+                    whereJmeno += u"opsub.jmeno LIKE ('%' || ? || '%') OR opsub.prijmeni LIKE ('%' || ? || '%') OR "
+                    values += [jmeno, jmeno]
+                if sjm or opo:
+                    whereJmeno += u"opsub.nazev LIKE ('%' || ? || '%') OR "
+                    values.append(jmeno)
+            whereJmeno += u"0 "
+
+        where = u"WHERE "
+        if whereJmeno:
+            where += u"({}) AND ".format(whereJmeno)
+        where += filters
+        values += filterValues
+
+        query = u"SELECT DISTINCT opsub.id opsub_id, " \
+                u"opsub.jmeno opsub_jmeno, opsub.prijmeni opsub_prijmeni, opsub.nazev opsub_nazev " \
                 u"FROM opsub " \
                 u"{} {} " \
                 u"ORDER BY opsub.prijmeni, opsub.nazev;".format(join, where)
-        return self.__evaluate(query)
+        return self.__evaluate(query, values)
+
+    def opsubNameMatcher(self, jmeno, sjm, opo, ofo):
+        """
+        Returns function telling whether an owner found by searchOpsub matches the name the same way
+        as searchOpsub does, so found owners can be narrowed without evaluating the search again.
+        The function gets dict of values of OPSUB_NAME_COLUMNS.
+        If searchOpsub matches names as prefixes and no owner is matched, the search is evaluated again,
+        because searchOpsub then looks for names containing the text.
+
+        :type jmeno: str
+        :type sjm: bool
+        :type opo: bool
+        :type ofo: bool
+        :return: function, None if the name cannot be matched outside of the database
+        """
+        if not jmeno:
+            return lambda values: True
+
+        columns = []
+        if ofo:
+            columns += [u"jmeno", u"prijmeni"]
+        if sjm or opo:
+            columns.append(u"nazev")
+        if not columns:
+            return lambda values: False
+        columns = [u"opsub_{}".format(column) for column in columns]
+
+        if self.__opsubFtsMatch(jmeno, columns) and self.__hasSearchTable(OPSUB_FTS_TABLE):
+            phrases = [self.__searchTokens(word) for word in jmeno.split()]
+            if not all(phrases):
+                return None
+
+            def matches(values):
+                tokens = [self.__searchTokens(values[column]) for column in columns]
+                return all(any(self.__phraseMatches(phrase, t) for t in tokens) for phrase in phrases)
+            return matches
+
+        if u"%" in jmeno or u"_" in jmeno:
+            # LIKE wildcards
+            return None
+
+        if self.__hasSearchTable(OPSUB_SEARCH_TABLE):
+            text = normalizeSearchText(jmeno)
+            return lambda values: any(normalizeSearchText(values[column]).startswith(text) for column in columns)
+
+        # LIKE ignores case of ASCII letters only
+        text = self.__asciiLower(jmeno)
+        return lambda values: any(text in self.__asciiLower(values[column]) for column in columns)
+
+    @staticmethod
+    def __searchTokens(text):
+        """
+        Splits text to words the way the full-text index of owners does.
+
+        :type text: str
+        :return: list
+        """
+        return re.findall(u"[^\\W_]+", normalizeSearchText(text), re.UNICODE)
+
+    @staticmethod
+    def __phraseMatches(phrase, tokens):
+        """
+        Matches full-text phrase query, the last word of the phrase is a prefix.
+
+        :param phrase: words of the phrase
+        :type phrase: list
+        :type tokens: list
+        :return: bool
+        """
+        n = len(phrase)
+        for i in xrange(len(tokens) - n + 1):
+            if tokens[i:i + n - 1] == phrase[:-1] and tokens[i + n - 1].startswith(phrase[-1]):
+                return True
+
+        return False
+
+    @staticmethod
+    def __asciiLower(text):
+        """
+
+        :type text: str
+        :return: str
+        """
+        return re.sub(u"[A-Z]+", lambda m: m.group(0).lower(), unicode(text))
+
+    def __hasSearchTable(self, table):
+        """
+        Search tables are built by SchemaOptimizer, a table can not be queried if it was not
+        built or, for full-text index, if SQLite of the connection is compiled without FTS5.
+
+        :type table: str
+        :return: bool
+        """
+        db = QSqlDatabase.database(self.__mConnectionName)
+        key = (db.databaseName(), table)
+        with self.__cacheLock:
+            available = self.__searchTables.get(key)
+        if available is None:
+            if table == OPSUB_FTS_TABLE:
+                query = u"SELECT rowid FROM {0} WHERE {0} MATCH '\"a\"' LIMIT 1;".format(table)
+            else:
+                query = u"SELECT * FROM {} LIMIT 1;".format(table)
+            sqlQuery = QSqlQuery(db)
+            available = sqlQuery.exec_(query)
+            sqlQuery.finish()
+            with self.__cacheLock:
+                self.__searchTables[key] = available
+
+        return available
+
+    def __opsubSubstringQuery(self, jmeno, columns):
+        """
+        Query of rowids of owners with any of the columns containing the text.
+
+        :type jmeno: str
+        :type columns: list
+        :return: (query, values)
+        """
+        if self.__hasSearchTable(OPSUB_SEARCH_TABLE):
+            # case and diacritics are ignored
+            table, rowid, text = OPSUB_SEARCH_TABLE, u"opsub_rowid", normalizeSearchText(jmeno)
+        else:
+            table, rowid, text = u"opsub", u"rowid", jmeno
+
+        where = u" OR ".join(u"{}.{} LIKE ('%' || ? || '%')".format(table, column) for column in columns)
+        return u"SELECT {} FROM {} WHERE ({})".format(rowid, table, where), [text] * len(columns)
+
+    @staticmethod
+    def __prefixWhere(text, columns):
+        """
+        Conditions matching columns of the search table of owners starting with the text.
+        LIKE with a bound pattern cannot use an index, so the prefix is matched as a range
+        of the index, the text is normalized, so the range follows the order of the index.
+        Columns are compared with NOCASE, which folds upper case ASCII letters, so the upper
+        bound skips them.
+
+        :param text: normalized text
+        :type text: str
+        :type columns: list
+        :return: (conditions, values)
+        """
+        if not text or u"%" in text or u"_" in text or text[-1] == unichr(0xffff):
+            # LIKE wildcards
+            return u" OR ".join(u"{} LIKE ?".format(c) for c in columns), [text + u"%"] * len(columns)
+
+        upper = unichr(ord(text[-1]) + 1)
+        if u"A" <= upper <= u"Z":
+            # e.g. '@' is followed by '[' among folded values
+            upper = u"["
+        upper = text[:-1] + upper
+        where = u" OR ".join(u"({0} >= ? AND {0} < ?)".format(c) for c in columns)
+        return where, [text, upper] * len(columns)
+
+    @staticmethod
+    def __opsubFtsMatch(text, columns):
+        """
+        Builds full-text query matching all words of the text as prefixes in any of the columns.
+
+        :type text: str
+        :type columns: list
+        :return: str, None if there is nothing to match
+        """
+        words = text.split()
+        if not words or not columns:
+            return None
+
+        columnFilter = u"{{{}}}".format(u" ".join(columns))
+        return u" AND ".join(u'{} : "{}"*'.format(columnFilter, word.replace(u'"', u'""')) for word in words)
 
     def searchPar(self, parcelniCislo, typIndex, druhKod, lv):
         """
@@ -565,20 +1039,20 @@ class VfkTableModel(QSqlQueryModel):
         :type lv: str
         :return:
         """
+        if self.__hasSearchTable(PAR_SEARCH_TABLE):
+            return self.__searchParTable(parcelniCislo, typIndex, druhKod, lv)
+
         where = u"WHERE "
         join = u''
+        values = []
 
         if parcelniCislo:
-            kmenAPoddeleni = parcelniCislo.split('/')
-            where += u"par.kmenove_cislo_par = {} AND ".format(
-                kmenAPoddeleni[0])
-
-            if len(kmenAPoddeleni) == 2 and kmenAPoddeleni[1] != u"":
-                where += u"par.poddeleni_cisla_par = {} AND ".format(
-                    kmenAPoddeleni[1])
+            whereCislo, values = self.__parcelniCisloWhere(parcelniCislo, u"par")
+            where += whereCislo
 
         if druhKod:
-            where += u"drupoz.zkratka = '{}' AND ".format(druhKod)
+            where += u"drupoz.zkratka = ? AND "
+            values.append(druhKod)
 
         if typIndex == u'1':
             where += u"drupoz.stavebni_parcela = 'n' AND "
@@ -587,11 +1061,12 @@ class VfkTableModel(QSqlQueryModel):
 
         if druhKod:
             # where += u"par.drupoz_kod = '{}' AND ".format(druhKod)
-            where += u"par.drupoz_kod = (SELECT kod FROM drupoz WHERE zkratka='{}') AND ".format(
-                druhKod)
+            where += u"par.drupoz_kod = (SELECT kod FROM drupoz WHERE zkratka = ?) AND "
+            values.append(druhKod)
 
         if lv:
-            where += u"tel.cislo_tel = {} AND ".format(lv)
+            where += u"tel.cislo_tel = ? AND "
+            values.append(lv)
             join += u"JOIN tel ON tel.id = par.tel_id "
 
         where += u'1 '
@@ -600,7 +1075,82 @@ class VfkTableModel(QSqlQueryModel):
                 u"FROM par " \
                 u"JOIN drupoz ON par.drupoz_kod = drupoz.kod " \
                 u"{} {};".format(join, where)
-        return self.__evaluate(query)
+        return self.__evaluate(query, values)
+
+    def __searchParTable(self, parcelniCislo, typIndex, druhKod, lv):
+        """
+        Variant of searchPar using the denormalized search table of parcels.
+
+        :type parcelniCislo: str
+        :type typIndex: str
+        :type druhKod: str
+        :type lv: str
+        :return:
+        """
+        where = u"WHERE "
+        values = []
+
+        if parcelniCislo:
+            whereCislo, values = self.__parcelniCisloWhere(parcelniCislo, PAR_SEARCH_TABLE)
+            where += whereCislo
+
+        if typIndex == u'1':
+            where += u"stavebni_parcela = 'n' AND "
+        elif typIndex == u'2':
+            where += u"stavebni_parcela = 'a' AND "
+
+        if druhKod:
+            where += u"drupoz_zkratka = ? AND "
+            values.append(druhKod)
+
+        if lv:
+            where += u"cislo_tel = ? AND "
+            values.append(lv)
+
+        # parcels without known druh pozemku are not found, as by the join in searchPar
+        where += u"drupoz_kod IS NOT NULL "
+
+        query = u"SELECT DISTINCT par_id " \
+                u"FROM {} " \
+                u"{};".format(PAR_SEARCH_TABLE, where)
+        return self.__evaluate(query, values)
+
+    def __parcelniCisloWhere(self, parcelniCislo, table):
+        """
+        Conditions on number of parcel in the form 'kmenove cislo/poddeleni'.
+
+        :type parcelniCislo: str
+        :param table: par or the search table of parcels
+        :type table: str
+        :return: (conditions, values)
+        """
+        kmenAPoddeleni = unicode(parcelniCislo).split(u"/")
+        where = u"{}.kmenove_cislo_par = ? AND ".format(table)
+        values = [kmenAPoddeleni[0]]
+
+        if len(kmenAPoddeleni) == 2 and kmenAPoddeleni[1] != u"":
+            where += u"{}.poddeleni_cisla_par = ? AND ".format(table)
+            values.append(kmenAPoddeleni[1])
+
+        return where, values
+
+    def __naParceleWhere(self, naParcele, budTable):
+        """
+        Conditions on number of parcel under the building and the join they need.
+
+        :type naParcele: str
+        :param budTable: table of buildings in the query
+        :type budTable: str
+        :return: (conditions, values, join)
+        """
+        if self.__hasSearchTable(PAR_SEARCH_TABLE):
+            whereCislo, values = self.__parcelniCisloWhere(naParcele, PAR_SEARCH_TABLE)
+            where = u"{}.id IN (SELECT bud_id FROM {} WHERE {}1) AND ".format(
+                budTable, PAR_SEARCH_TABLE, whereCislo)
+            return where, values, u''
+
+        where, values = self.__parcelniCisloWhere(naParcele, u"par")
+        return where, values, u"JOIN par ON {}.id = par.bud_id ".format(budTable)
 
     def searchBud(self, domovniCislo, naParcele, zpusobVyuzitiKod, lv):
         """
@@ -613,28 +1163,26 @@ class VfkTableModel(QSqlQueryModel):
         """
         where = u"WHERE "
         join = u""
+        values = []
 
         if domovniCislo:
-            where += u"bud.cislo_domovni = {} AND ".format(domovniCislo)
+            where += u"bud.cislo_domovni = ? AND "
+            values.append(domovniCislo)
 
         if naParcele:
-            kmenAPoddeleni = str(naParcele).split("/")
-            where += u"par.kmenove_cislo_par = {} AND ".format(
-                kmenAPoddeleni[0])
-
-            if len(kmenAPoddeleni) == 2 and kmenAPoddeleni[1] != u"":
-                where += u"par.poddeleni_cisla_par = {} AND ".format(
-                    kmenAPoddeleni[1])
-
-            join += u"JOIN par ON bud.id = par.bud_id "
+            whereParcela, valuesParcela, joinParcela = self.__naParceleWhere(naParcele, u"bud")
+            where += whereParcela
+            values += valuesParcela
+            join += joinParcela
 
         if lv:
-            where += u"tel.cislo_tel = {} AND ".format(lv)
+            where += u"tel.cislo_tel = ? AND "
+            values.append(lv)
             join += u"JOIN tel ON tel.id = bud.tel_id "
 
         if zpusobVyuzitiKod:
-            where += u"zpvybu.kod = (SELECT kod FROM zpvybu WHERE zkratka='{}') AND ".format(
-                zpusobVyuzitiKod)
+            where += u"zpvybu.kod = (SELECT kod FROM zpvybu WHERE zkratka = ?) AND "
+            values.append(zpusobVyuzitiKod)
             join += u"JOIN zpvybu ON zpvybu.kod = bud.zpvybu_kod "
 
         where += u"1 "
@@ -643,7 +1191,7 @@ class VfkTableModel(QSqlQueryModel):
                 u"FROM bud " \
                 u"{} {};".format(join, where)
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, values)
 
     def searchJed(self, cisloJednotky, domovniCislo, naParcele, zpusobVyuzitiKod, lv):
         """
@@ -657,30 +1205,30 @@ class VfkTableModel(QSqlQueryModel):
         """
         where = u"WHERE "
         join = u''
+        values = []
 
         if cisloJednotky:
-            where += u"jed.cislo_jednotky = {} AND ".format(cisloJednotky)
+            where += u"jed.cislo_jednotky = ? AND "
+            values.append(cisloJednotky)
 
         if domovniCislo:
-            where += u"bud.cislo_domovni = {} AND ".format(domovniCislo)
+            where += u"bud.cislo_domovni = ? AND "
+            values.append(domovniCislo)
 
         if naParcele:
-            kmenAPoddeleni = str(naParcele).split(u"/")
-            where += u"par.kmenove_cislo_par = {} AND ".format(
-                kmenAPoddeleni[0])
-
-            if len(kmenAPoddeleni) == 2 and kmenAPoddeleni[1] != u"":
-                where += u"par.poddeleni_cisla_par = {} AND ".format(
-                    kmenAPoddeleni[1])
-
-            join += u"JOIN par ON bud.id = par.bud_id "
+            whereParcela, valuesParcela, joinParcela = self.__naParceleWhere(naParcele, u"bud")
+            where += whereParcela
+            values += valuesParcela
+            join += joinParcela
 
         if lv:
-            where += u"tel.cislo_tel = {} AND ".format(lv)
+            where += u"tel.cislo_tel = ? AND "
+            values.append(lv)
             join += u"JOIN tel ON tel.id = jed.tel_id "
 
         if zpusobVyuzitiKod:
-            where += u"zpvyje.nazev = '{}' AND ".format(zpusobVyuzitiKod)
+            where += u"zpvyje.nazev = ? AND "
+            values.append(zpusobVyuzitiKod)
             join += u"JOIN zpvyje ON zpvyje.kod = jed.zpvyje_kod "
 
         where += u"1 "
@@ -690,7 +1238,25 @@ class VfkTableModel(QSqlQueryModel):
                 u"JOIN bud ON bud.id = jed.bud_id " \
                 u"{} {};".format(join, where)
 
-        return self.__evaluate(query)
+        return self.__evaluate(query, values)
+
+    def searchQuery(self, search, args):
+        """
+        Returns query of the search with values bound to it, the query is not evaluated,
+        so it can be evaluated by another connection to the database.
+
+        :param search: name of search method
+        :type search: str
+        :param args: arguments of the search method
+        :type args: tuple
+        :return: (query, values)
+        """
+        self.__mRecordedQueries = []
+        try:
+            getattr(self, search)(*args)
+            return self.__mRecordedQueries[-1]
+        finally:
+            self.__mRecordedQueries = None
 
     def parColumns(self, extended):
         """
@@ -715,8 +1281,7 @@ class VfkTableModel(QSqlQueryModel):
             columns.append(u"par.cena_nemovitosti par_cena_nemovitosti")
             columns.append(u"bud_id bud_id")
             columns.append(u"bud.cislo_domovni bud_cislo_domovni")
-            columns.append(u"typbud.nazev typbud_nazev")
-            columns.append(u"typbud.zkratka typbud_zkratka")
+            columns.append(u"bud.typbud_kod bud_typbud_kod")
 
         return columns
 
@@ -731,8 +1296,7 @@ class VfkTableModel(QSqlQueryModel):
                    u"casobc.kod casobc_kod", u"bud.cislo_domovni bud_cislo_domovni", u"par.id par_id", u"tel.id tel_id",
                    u"tel.cislo_tel tel_cislo_tel", u"par.kmenove_cislo_par par_kmenove_cislo_par",
                    u"par.poddeleni_cisla_par par_poddeleni_cisla_par", u"drupoz.stavebni_parcela drupoz_stavebni_parcela",
-                   u"zpvybu.kod zpvybu_kod", u"zpvybu.nazev zpvybu_nazev", u"typbud.nazev typbud_nazev",
-                   u"typbud.zkratka typbud_zkratka", u"typbud.zadani_cd typbud_zadani_cd"]
+                   u"zpvybu.kod zpvybu_kod", u"zpvybu.nazev zpvybu_nazev"]
 
         if extended:
             columns.append(u"bud.cena_nemovitosti bud_cena_nemovitosti")
@@ -756,7 +1320,7 @@ class VfkTableModel(QSqlQueryModel):
         if extended:
             columns.append(u"jed.cena_nemovitosti jed_cena_nemovitosti")
             columns.append(u"jed.popis jed_popis")
-            columns.append(u"typbud.zkratka typbud_zkratka")
+            columns.append(u"bud.typbud_kod bud_typbud_kod")
             columns.append(u"par.katuze_kod par_katuze_kod")
             columns.append(u"par.id par_id")
             columns.append(u"drupoz.stavebni_parcela drupoz_stavebni_parcela")
@@ -775,8 +1339,8 @@ class VfkTableModel(QSqlQueryModel):
         :return: []
         """
         columns = [
-            u"opsub.opsub_type opsub_opsub_type", u"opsub.id opsub_id", u"charos.zkratka charos_zkratka",
-                   u"charos.nazev charos_nazev", u"opsub.nazev opsub_nazev",
+            u"opsub.opsub_type opsub_opsub_type", u"opsub.id opsub_id", u"opsub.charos_kod opsub_charos_kod",
+                   u"opsub.nazev opsub_nazev",
                    u"opsub.titul_pred_jmenem opsub_titul_pred_jmenem", u"opsub.jmeno opsub_jmeno",
                    u"opsub.prijmeni opsub_prijmeni", u"opsub.titul_za_jmenem opsub_titul_za_jmenem"]
 
@@ -802,7 +1366,7 @@ class VfkTableModel(QSqlQueryModel):
         :return: []
         """
         columns = [
-            u"typrav.nazev typrav_nazev", u"jpv.id jpv_id", u"jpv.popis_pravniho_vztahu jpv_popis_pravniho_vztahu",
+            u"jpv.typrav_kod jpv_typrav_kod", u"jpv.id jpv_id", u"jpv.popis_pravniho_vztahu jpv_popis_pravniho_vztahu",
                    u"jpv.par_id_k jpv_par_id_k", u"jpv.par_id_pro jpv_par_id_pro", u"jpv.bud_id_k jpv_bud_id_k",
                    u"jpv.bud_id_pro jpv_bud_id_pro", u"jpv.jed_id_k jpv_jed_id_k", u"jpv.jed_id_pro jpv_jed_id_pro",
                    u"jpv.opsub_id_k jpv_opsub_id_k", u"jpv.opsub_id_pro jpv_opsub_id_pro"]
@@ -927,7 +1491,7 @@ class VfkTableModel(QSqlQueryModel):
         query = "SELECT drupoz.kod drupoz_kod, drupoz.zkratka drupoz_zkratka " \
                 "FROM drupoz " \
                 "{};".format(where)
-        return self.__evaluate(query)
+        return self.__evaluateView(query)
 
     def zpusobVyuzitiBudov(self):
         """
@@ -936,7 +1500,7 @@ class VfkTableModel(QSqlQueryModel):
         """
         query = "SELECT zpvybu.kod zpvybu_kod, zpvybu.zkratka zpvybu_zkratka " \
                 "FROM zpvybu; "
-        return self.__evaluate(query)
+        return self.__evaluateView(query)
 
     def zpusobVyuzitiJednotek(self):
         """
@@ -945,16 +1509,241 @@ class VfkTableModel(QSqlQueryModel):
         """
         query = "SELECT zpvyje.kod zpvyje_kod, zpvyje.zkratka zpvyje_zkratka " \
                 "FROM zpvyje; "
-        return self.__evaluate(query)
+        return self.__evaluateView(query)
+
+    @classmethod
+    def clearPreparedQueries(cls, connectionName=None):
+        """
+        Drops prepared queries of given connection, all prepared queries if it is not given.
+        Queries have to be dropped before the connection is closed.
+
+        :type connectionName: str
+        """
+        with cls.__cacheLock:
+            for key in list(cls.__preparedQueries):
+                if connectionName is None or key[0] == connectionName:
+                    del cls.__preparedQueries[key]
+
+    @classmethod
+    def clearSearchTables(cls, dbName=None):
+        """
+        Drops known availability of search tables of given database file, of all files if it is not given.
+        Availability has to be dropped when search tables of the database are built again.
+
+        :type dbName: str
+        """
+        with cls.__cacheLock:
+            for key in list(cls.__searchTables):
+                if dbName is None or key[0] == dbName:
+                    del cls.__searchTables[key]
 
-    def __evaluate(self, query):
+    @classmethod
+    def queryLog(cls):
         """
+        Returns log of queries evaluated by all models.
+
+        :return: QueryLog
+        """
+        return cls.__queryLog
+
+    @classmethod
+    def setResultCacheSize(cls, size):
+        """
+        Sets maximal number of cached results of lookups, 0 disables the cache.
+
+        :type size: int
+        """
+        with cls.__cacheLock:
+            cls.__resultCacheSize = max(0, size)
+
+            while len(cls.__resultCache) > cls.__resultCacheSize:
+                cls.__resultCache.popitem(last=False)
+
+    @classmethod
+    def clearResultCache(cls, connectionName=None):
+        """
+        Drops cached results of given connection, all cached results if it is not given.
+        Cache has to be cleared when data of the connection are changed.
+
+        :type connectionName: str
+        """
+        with cls.__cacheLock:
+            if connectionName is None:
+                cls.__resultCache.clear()
+                return
+
+            for key in list(cls.__resultCache):
+                if key[2] == connectionName:
+                    del cls.__resultCache[key]
 
+    def __evaluateCached(self, method, args, query, values):
+        """
+        Result of the lookup is read from the cache shared by all models, the query is evaluated
+        only if the result is not cached yet. The least recently used results are dropped.
+
+        :type method: str
+        :type args: tuple
+        :type query: str
+        :type values: list
+        :return: bool
+        """
+        key = (method, args, self.__mConnectionName)
+        with self.__cacheLock:
+            result = self.__resultCache.pop(key, None)
+
+        if result is None:
+            if not self.__evaluate(query, values):
+                return False
+
+            while self.canFetchMore():
+                self.fetchMore()
+            result = self.__mResult
+
+        self.__mPendingQuery = None
+        with self.__cacheLock:
+            if self.__resultCacheSize > 0:
+                self.__resultCache[key] = result
+                if len(self.__resultCache) > self.__resultCacheSize:
+                    self.__resultCache.popitem(last=False)
+
+        self.__mResult = result
+        return True
+
+    def __evaluateBatch(self, query, ids):
+        """
+        Query is evaluated for chunks of ids bound to its IN list, rows of all chunks are joined
+        to one result. Query has to select id of the row as batch_id column.
+
+        :param query: query with {} in place of the IN list
         :type query: str
+        :type ids: list
         :return: bool
         """
+        ids = list(OrderedDict.fromkeys(unicode(id) for id in ids if id))
+        result = VfkResult()
+
+        for i in xrange(0, len(ids), self.MAX_BOUND_VALUES):
+            chunk = ids[i:i + self.MAX_BOUND_VALUES]
+            # repeated id does not change the result of the IN list
+            size = min(size for size in self.BATCH_SIZES if size >= len(chunk))
+            chunk += chunk[-1:] * (size - len(chunk))
+            if not self.__evaluate(query.format(", ".join("?" * size)), chunk):
+                return False
+
+            while self.canFetchMore():
+                self.fetchMore()
+            result.columns = self.__mResult.columns
+            result.rows.extend(self.__mResult.rows)
+
+        self.__mResult = result
+
+        if result.rows:
+            index = result.columns[u"batch_id"]
+            for row, values in enumerate(result.rows):
+                self.__mGroups.setdefault(unicode(values[index]), []).append(row)
+
+        return True
+
+    def groupRows(self, id):
+        """
+        Returns indexes of rows of given id from the result of a batch query.
+
+        :type id: str
+        :return: list
+        """
+        return self.__mGroups.get(unicode(id), [])
+
+    def __preparedQuery(self, query):
+        """
+        Query is prepared only once per connection and reused by following calls.
+        The least recently used queries are dropped.
+
+        :type query: str
+        :return: QSqlQuery
+        """
+        key = (self.__mConnectionName, query)
+        with self.__cacheLock:
+            sqlQuery = self.__preparedQueries.pop(key, None)
+            if sqlQuery is not None:
+                self.__preparedQueries[key] = sqlQuery
+                return sqlQuery
+
+        sqlQuery = QSqlQuery(QSqlDatabase.database(self.__mConnectionName))
+        sqlQuery.setForwardOnly(True)
+        if sqlQuery.prepare(query):
+            with self.__cacheLock:
+                self.__preparedQueries[key] = sqlQuery
+                while len(self.__preparedQueries) > self.PREPARED_QUERY_CACHE_SIZE:
+                    self.__preparedQueries.popitem(last=False)[1].finish()
+
+        return sqlQuery
+
+    def __evaluate(self, query, values=None):
+        """
+        Query is evaluated and all its rows are read to the result of the model.
+
+        :type query: str
+        :param values: values bound to placeholders of the query
+        :type values: list
+        :return: bool
+        """
+        if self.__mRecordedQueries is not None:
+            self.__mRecordedQueries.append((query, list(values or [])))
+            return True
+
         t = QTime()
         t.start()
+        self.__mResult = VfkResult()
+        self.__mGroups = {}
+        self.__mPendingQuery = None
+
+        if values is None:
+            qDebug("\n(VFK) SQL: {}\n".format(query))
+            sqlQuery = QSqlQuery(QSqlDatabase.database(self.__mConnectionName))
+            sqlQuery.setForwardOnly(True)
+            sqlQuery.exec_(query)
+        else:
+            qDebug("\n(VFK) SQL: {}\n(VFK) Values: {}\n".format(query, values))
+            if self.__mPageSize:
+                # paged query stays open, so it cannot be shared
+                sqlQuery = QSqlQuery(QSqlDatabase.database(self.__mConnectionName))
+                sqlQuery.setForwardOnly(True)
+                sqlQuery.prepare(query)
+            else:
+                sqlQuery = self.__preparedQuery(query)
+            for i, value in enumerate(values):
+                sqlQuery.bindValue(i, value)
+            sqlQuery.exec_()
+
+        if sqlQuery.lastError().isValid():
+            #qDebug('\n(VFK) SQL ERROR: {}'.format(sqlQuery.lastError().text()))
+            self.__logQuery(query, values, 0, t.elapsed(), sqlQuery.lastError().text())
+            return False
+
+        self.__mResult = VfkResult.fetch(sqlQuery, self.__mPageSize)
+        if self.__mPageSize and len(self.__mResult.rows) == self.__mPageSize:
+            self.__mPendingQuery = sqlQuery
+        else:
+            sqlQuery.finish()
+
+        if t.elapsed() > 500:
+            qDebug("\n(VFK) Time elapsed: {} ms\n".format(t.elapsed()))
+
+        self.__logQuery(query, values, len(self.__mResult.rows), t.elapsed())
+        return True
+
+    def __evaluateView(self, query):
+        """
+        Query is held by the model, so it can be used by views.
+
+        :type query: str
+        :return: bool
+        """
+        t = QTime()
+        t.start()
+        self.__mResult = None
+        self.__mGroups = {}
+        self.__mPendingQuery = None
 
         qDebug("\n(VFK) SQL: {}\n".format(query))
         self.setQuery(query, QSqlDatabase.database(self.__mConnectionName))
@@ -967,10 +1756,125 @@ class VfkTableModel(QSqlQueryModel):
 
         if self.lastError().isValid():
             #qDebug('\n(VFK) SQL ERROR: {}'.format(self.lastError().text()))
+            self.__logQuery(query, None, 0, t.elapsed(), self.lastError().text())
             return False
 
+        self.__logQuery(query, None, QSqlQueryModel.rowCount(self), t.elapsed())
         return True
 
+    def __logQuery(self, query, values, rows, elapsed, error=u''):
+        """
+        Records the query to the query log, plan of a slow query is recorded too.
+
+        :type query: str
+        :type values: list
+        :type rows: int
+        :param elapsed: time in ms
+        :type elapsed: int
+        :type error: str
+        """
+        if not self.__queryLog.isEnabled():
+            return
+
+        plan = None
+        if self.__queryLog.isSlow(elapsed):
+            plan = self.__queryPlan(query, values)
+
+        self.__queryLog.record(self.__mConnectionName, query, values, rows, elapsed, error, plan)
+
+    def __queryPlan(self, query, values):
+        """
+
+        :type query: str
+        :type values: list
+        :return: lines of EXPLAIN QUERY PLAN output
+        """
+        sqlQuery = QSqlQuery(QSqlDatabase.database(self.__mConnectionName))
+        sqlQuery.setForwardOnly(True)
+        if not sqlQuery.prepare(u"EXPLAIN QUERY PLAN {}".format(query)):
+            return []
+
+        for i, value in enumerate(values or []):
+            sqlQuery.bindValue(i, value)
+        if not sqlQuery.exec_():
+            return []
+
+        # detail is the last column in all SQLite versions
+        detail = sqlQuery.record().count() - 1
+        plan = []
+        while sqlQuery.next():
+            plan.append(unicode(sqlQuery.value(detail)))
+
+        return plan
+
+    def setPageSize(self, pageSize):
+        """
+        Sets number of rows read by following lookups at once, next rows are read by fetchMore.
+        0 reads all rows of the lookup.
+
+        :type pageSize: int
+        """
+        self.__mPageSize = max(0, pageSize)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        """
+
+        :type parent: QModelIndex
+        :return: bool
+        """
+        if self.__mResult is not None:
+            return self.__mPendingQuery is not None
+
+        return QSqlQueryModel.canFetchMore(self, parent)
+
+    def fetchMore(self, parent=QModelIndex()):
+        """
+        Reads next page of rows of the lookup.
+
+        :type parent: QModelIndex
+        """
+        if self.__mResult is None:
+            QSqlQueryModel.fetchMore(self, parent)
+            return
+
+        if self.__mPendingQuery is None:
+            return
+
+        if not self.__mResult.fetchRows(self.__mPendingQuery, self.__mPageSize):
+            self.__mPendingQuery.finish()
+            self.__mPendingQuery = None
+
+    def finish(self):
+        """
+        Finishes the query with rows not read yet, so it does not hold the connection.
+        Following fetchMore reads no rows.
+        """
+        if self.__mPendingQuery is not None:
+            self.__mPendingQuery.finish()
+            self.__mPendingQuery = None
+
+    def result(self):
+        """
+        Returns rows of the last lookup, empty result for models used by views.
+
+        :return: VfkResult
+        """
+        if self.__mResult is None:
+            return VfkResult()
+
+        return self.__mResult
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+
+        :type parent: QModelIndex
+        :return: int
+        """
+        if self.__mResult is not None:
+            return len(self.__mResult.rows)
+
+        return QSqlQueryModel.rowCount(self, parent)
+
     def value(self, row, column):
         """
 
@@ -978,6 +1882,9 @@ class VfkTableModel(QSqlQueryModel):
         :type column:
         :return: str
         """
+        if self.__mResult is not None:
+            return self.__mResult.value(row, column)
+
         value = unicode(self.record(row).field(column).value())
 
         if value == u"NULL" or value == u'None':
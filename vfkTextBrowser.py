@@ -81,9 +81,13 @@ class VfkTextBrowser(QTextBrowser):
         self.__mDocumentBuilder = DocumentBuilder()
         self.__mUrlHistory = []     # list of history records
         self.__mHistoryOrder = -1      # saving current index in history list
+        self.__mPagedRecord = None     # record of the page rendered by pages
+        self.__mRunningSearchRecord = None     # record of the page of a search which is still running
+        self.__mReplaceRecord = False      # True if the current record is replaced instead of a new one
 
         self.connect(self, SIGNAL("anchorClicked(QUrl)"), self.onLinkClicked)
         self.connect(self, SIGNAL("updateHistory"), self.saveHistory)
+        self.connect(self.verticalScrollBar(), SIGNAL("valueChanged(int)"), self.onScrolled)
 
         self.emit(SIGNAL("currentParIdsChanged"), False)
         self.emit(SIGNAL("currentBudIdsChanged"), False)
@@ -134,8 +138,15 @@ class VfkTextBrowser(QTextBrowser):
 
         :type connectionName: str
         """
+        self.finishPendingContent()
         self.__mDocumentBuilder = DocumentBuilder(connectionName)
 
+    def finishPendingContent(self):
+        """
+        Rest of the paged document is not rendered any more, its query is finished.
+        """
+        self.__mDocumentBuilder.finishPendingContent()
+
     def __parseTask(self, task):
         """
 
@@ -166,7 +177,9 @@ class VfkTextBrowser(QTextBrowser):
             self.updateButtonEnabledState()
 
     def saveHistory(self, record):
-        if len(self.__mUrlHistory) == 0:
+        if self.__mReplaceRecord and self.__mUrlHistory:
+            self.__mUrlHistory[self.__mHistoryOrder] = record
+        elif len(self.__mUrlHistory) == 0:
             self.__mUrlHistory.append(record)
             self.__mHistoryOrder = 0
         else:
@@ -266,10 +279,9 @@ class VfkTextBrowser(QTextBrowser):
             QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
             t = QtCore.QTime()
             t.start()
-            html = self.__documentContent(taskMap, self.ExportFormat.RichText)
+            html = self.__documentContent(taskMap, self.ExportFormat.RichText, True)
             qDebug("Total time elapsed: {} ms".format(t.elapsed()))
             QApplication.restoreOverrideCursor()
-            self.setHtml(html)
 
             record = HistoryRecord()
             record.html = html
@@ -277,7 +289,9 @@ class VfkTextBrowser(QTextBrowser):
             record.budIds = self.__mDocumentBuilder.currentBudIds()
             record.definitionPoint = self.__mDocumentBuilder.currentDefinitionPoint(
             )
+            self.__mPagedRecord = record
 
+            self.setHtml(html)
             self.emit(SIGNAL("updateHistory"), record)
 
         elif taskMap[u"action"] == u"selectInMap":
@@ -293,17 +307,83 @@ class VfkTextBrowser(QTextBrowser):
         else:
             qDebug("..Jina akce")
 
-    def __documentContent(self, taskMap, format):
+    def showSearchResult(self, task, ids, complete=True):
+        """
+        Shows search page of the task with ids found by SearchThread, the search is not
+        evaluated again.
+
+        :type task: QUrl
+        :type ids: list
+        :param complete: False if ids are found so far only, the search is still running
+        :type complete: bool
+        """
+        self.__mDocumentBuilder.setSearchResult(self.__parseTask(task), ids, complete)
+        self.__showSearchPage(task, complete)
+
+    def showSearchError(self, task, message):
+        """
+        Shows error of SearchThread on search page of the task.
+
+        :type task: QUrl
+        :type message: str
+        """
+        self.__mDocumentBuilder.setSearchError(self.__parseTask(task), message)
+        self.__showSearchPage(task, True)
+
+    def __showSearchPage(self, task, complete):
+        """
+        Page of a running search is replaced in history by the next page of the search,
+        unless another page was shown meanwhile.
+
+        :type task: QUrl
+        :type complete: bool
+        """
+        self.__mReplaceRecord = self.__mRunningSearchRecord is not None and \
+            self.__mCurrentRecord is self.__mRunningSearchRecord
+        try:
+            self.processAction(task)
+        finally:
+            self.__mReplaceRecord = False
+
+        self.__mRunningSearchRecord = None if complete else self.__mCurrentRecord
+
+    def onScrolled(self, value):
+        """
+        Next page of the paged document is appended when the view is scrolled to its end.
+
+        :type value: int
+        """
+        scrollBar = self.verticalScrollBar()
+        if value < scrollBar.maximum() - scrollBar.pageStep():
+            return
+
+        if self.__mCurrentRecord is not self.__mPagedRecord or not self.__mDocumentBuilder.hasMoreContent():
+            return
+
+        doc = self.documentFactory(self.ExportFormat.RichText)
+        self.__mDocumentBuilder.buildMore(doc)
+        text = doc.toString()
+
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertHtml(text)
+
+        html = self.__mCurrentRecord.html
+        end = html.rfind(u"</body>")
+        self.__mCurrentRecord.html = html[:end] + text + html[end:]
+
+    def __documentContent(self, taskMap, format, paged=False):
         """
 
         :type taskMap: dict
         :type format: VfkTextBrowser.ExportFormat
+        :type paged: bool
         :return:
         """
         doc = self.documentFactory(format)
         if not doc:
             return u''
 
-        self.__mDocumentBuilder.buildHtml(doc, taskMap)
+        self.__mDocumentBuilder.buildHtml(doc, taskMap, paged)
         text = doc.toString()
         return u'{}'.format(text)
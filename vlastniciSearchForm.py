@@ -31,6 +31,7 @@ from ui_vlastnicisearchform import *
 class VlastniciSearchForm(QWidget):
     # signals
     searchEnabled = pyqtSignal(bool)
+    searchChanged = pyqtSignal()
 
     def __init__(self, parent=None):
         super(VlastniciSearchForm, self).__init__(parent)
@@ -51,6 +52,21 @@ class VlastniciSearchForm(QWidget):
         self.connect(self.ui.sjmCheckBox, SIGNAL(
             "clicked()"), self.__vlastniciSearchEnabled)
 
+        self.connect(self.ui.jmenoLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.rcIcoLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.lvVlastniciLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.adresaLineEdit, SIGNAL(
+            "textEdited(QString)"), self.__searchChanged)
+        self.connect(self.ui.ofoCheckBox, SIGNAL(
+            "clicked()"), self.__searchChanged)
+        self.connect(self.ui.opoCheckBox, SIGNAL(
+            "clicked()"), self.__searchChanged)
+        self.connect(self.ui.sjmCheckBox, SIGNAL(
+            "clicked()"), self.__searchChanged)
+
     def jmeno(self):
         return unicode(self.ui.jmenoLineEdit.text().strip())
 
@@ -69,6 +85,9 @@ class VlastniciSearchForm(QWidget):
     def lv(self):
         return self.ui.lvVlastniciLineEdit.text().strip()
 
+    def adresa(self):
+        return unicode(self.ui.adresaLineEdit.text().strip())
+
     def __vlastniciSearchEnabled(self):
         if self.ui.ofoCheckBox.isChecked() or self.ui.opoCheckBox.isChecked() or self.ui.sjmCheckBox.isChecked():
             self.emit(SIGNAL("searchEnabled"), True)
@@ -80,3 +99,6 @@ class VlastniciSearchForm(QWidget):
             self.ui.rcIcoLineEdit.setEnabled(True)
         else:
             self.ui.rcIcoLineEdit.setEnabled(False)
+
+    def __searchChanged(self):
+        self.searchChanged.emit()